@@ -0,0 +1,128 @@
+# core/alert_manager.py
+import threading
+from database.db import Database
+from database.query_cache import QueryCache
+
+# Transitions publiées aux abonnés
+LEVEE = "levee"
+RESOLUE = "resolue"
+
+# Tables dont découlent les alertes (soldes et seuils) : le journal ne bouge qu'avec elles
+SOURCES_ALERTES = ("Articles", "Mouvements", "Reservations")
+
+class AlertManager:
+    """Alertes de stock ouvertes et diffusion de leurs transitions.
+
+    Les alertes sont tenues à jour par trigger à chaque variation de solde ou
+    de seuil ; ce gestionnaire ne fait que lire la table Alertes et relayer
+    les événements du journal AlertesEvenements aux abonnés.
+    """
+
+    # Abonnés et position dans le journal, partagés par toutes les instances
+    _abonnes = []
+    _dernier_evenement = None
+    # Versions des tables sources lors de la dernière lecture du journal
+    _versions_sources = None
+    _verrou = threading.Lock()
+
+    def __init__(self, db_name="stock_app.db"):
+        self.db = Database(db_name)
+
+    @classmethod
+    def abonner(cls, callback):
+        """Abonne ``callback(evenements)`` aux transitions ; retourne la fonction de désabonnement.
+
+        Chaque publication transmet en une fois la liste des nouveaux événements.
+        """
+        with cls._verrou:
+            cls._abonnes.append(callback)
+
+        def desabonner():
+            with cls._verrou:
+                if callback in cls._abonnes:
+                    cls._abonnes.remove(callback)
+        return desabonner
+
+    def publier(self):
+        """Transmet aux abonnés les transitions survenues depuis le dernier appel.
+
+        Retourne la liste des événements {id, alerte_id, code_article,
+        transition, date_evenement} transmis.
+        """
+        evenements = self.lire_evenements()
+        self.diffuser(evenements)
+        return evenements
+
+    def lire_evenements(self):
+        """Retourne les transitions survenues depuis le dernier appel, sans les diffuser.
+
+        Le premier appel ne fait que fixer la position de départ dans le journal.
+        Tant qu'aucune transaction n'a été validée, seul PRAGMA data_version est lu
+        (sentinelle du cache de requêtes) : un poste inactif ne relit pas le journal.
+        """
+        cls = type(self)
+        # Versions lues avant le journal : une écriture concurrente provoque au pire une relecture de trop
+        versions = QueryCache.pour(self.db).versions(SOURCES_ALERTES)
+        with cls._verrou:
+            if cls._dernier_evenement is not None and versions == cls._versions_sources:
+                return []
+            cls._versions_sources = versions
+            with self.db.get_connection() as conn:
+                if cls._dernier_evenement is None:
+                    # Premier appel : seules les transitions à venir sont publiées
+                    cls._dernier_evenement = conn.execute(
+                        "SELECT IFNULL(MAX(id), 0) FROM AlertesEvenements"
+                    ).fetchone()[0]
+                    return []
+                rows = conn.execute("""
+                    SELECT id, alerte_id, code_article, transition, date_evenement
+                    FROM AlertesEvenements
+                    WHERE id > ?
+                    ORDER BY id
+                """, (cls._dernier_evenement,)).fetchall()
+            evenements = [dict(row) for row in rows]
+            if evenements:
+                cls._dernier_evenement = evenements[-1]["id"]
+            return evenements
+
+    def diffuser(self, evenements):
+        """Transmet des événements aux abonnés, dans le thread appelant (le thread Tk pour l'interface)"""
+        if not evenements:
+            return
+        with type(self)._verrou:
+            abonnes = list(type(self)._abonnes)
+        for callback in abonnes:
+            try:
+                callback(evenements)
+            except Exception as e:
+                print(f"Erreur dans un abonné aux alertes: {e}")
+
+    def alertes_ouvertes(self):
+        """Retourne les alertes ouvertes avec la quantité actuelle, la plus critique en premier"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT al.id, al.code_article, a.designation, a.seuil_alerte,
+                       IFNULL(s.quantite, 0) AS quantite, al.date_levee
+                FROM Alertes al
+                JOIN Articles a ON a.code_article = al.code_article
+                LEFT JOIN StockSolde s ON s.code_article = al.code_article
+                WHERE al.date_resolution IS NULL
+                ORDER BY IFNULL(s.quantite, 0)
+            """).fetchall()
+            return [dict(row) for row in rows]
+
+    def nombre_alertes(self):
+        """Retourne le nombre d'alertes ouvertes"""
+        with self.db.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL").fetchone()[0]
+
+    def historique(self, code_article=None, limite=100):
+        """Retourne les dernières alertes, ouvertes ou résolues"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT * FROM Alertes
+                WHERE ? IS NULL OR code_article = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (code_article, code_article, limite)).fetchall()
+            return [dict(row) for row in rows]
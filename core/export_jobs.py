@@ -0,0 +1,324 @@
+# core/export_jobs.py
+"""Exports en arrière-plan : file de tâches, progression et annulation.
+
+Un export soumis est enregistré dans TachesExport puis confié à un pool
+borné : les formats à dessiner (PDF, Excel), gourmands en calcul, à des
+processus de priorité abaissée ; CSV et Parquet, limités par la lecture et
+l'écriture, à des threads. Les tâches lisent par leur propre pool de
+connexions (profil « reporting ») dans des transactions de lecture : en WAL,
+elles ne bloquent pas la saisie des mouvements.
+
+La table sert de canal entre l'interface et les tâches, même dans un autre
+processus : la tâche y écrit sa progression au plus une fois par seconde,
+et une demande d'annulation (statut « annulation ») l'interrompt à sa
+prochaine écriture. Le fichier est écrit à côté puis renommé : il n'existe
+sous son nom que complet.
+"""
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from core.export_manager import JEUX_EXPORT, ExportManager
+from database.db import Database
+
+# Statuts d'une tâche d'export
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+ANNULATION = "annulation"
+TERMINEE = "terminee"
+ECHEC = "echec"
+ANNULEE = "annulee"
+ACTIFS = (EN_ATTENTE, EN_COURS, ANNULATION)
+
+# Format -> méthode d'ExportManager et options acceptées
+FORMATS = {
+    "csv": ("export_csv", {"colonnes", "debut", "fin", "depuis", "separateur"}),
+    "parquet": ("export_parquet", {"colonnes", "debut", "fin", "depuis"}),
+    "excel": ("export_excel", {"colonnes"}),
+    "pdf": ("export_pdf", {"colonnes", "titre"}),
+}
+# Formats rendus dans un processus : le dessin des pages et des cellules tient le GIL
+FORMATS_PROCESSUS = {"pdf", "excel"}
+
+THREADS_EXPORT = 2
+# Un cœur reste à l'interface et aux écritures des postes
+PROCESSUS_EXPORT = max(1, min(2, (os.cpu_count() or 1) - 1))
+# Priorité (nice) des processus d'export
+PRIORITE_PROCESSUS = 10
+# Tâches actives au plus par poste ; au-delà, une soumission est refusée
+MAX_TACHES_ACTIVES = 20
+# Intervalle minimal entre deux écritures de la progression (s)
+INTERVALLE_PROGRESSION = 1.0
+# Une tâche en cours dont la progression n'a pas bougé depuis ce délai a été interrompue
+DELAI_ABANDON = timedelta(minutes=5)
+
+POSTE = socket.gethostname()
+
+
+class ExportAnnule(Exception):
+    """Levée dans la tâche quand son annulation a été demandée"""
+
+
+def _initialiser_processus():
+    if hasattr(os, "nice"):
+        os.nice(PRIORITE_PROCESSUS)
+
+
+def _provisoire(fichier, tache_id):
+    """Chemin d'écriture de la tâche, renommé en ``fichier`` une fois l'export terminé"""
+    racine, extension = os.path.splitext(fichier)
+    return f"{racine}.tache{tache_id}{extension}"
+
+
+def executer_tache(db_name, tache_id):
+    """Exécute la tâche ``tache_id`` (thread ou processus d'export) et retourne son statut final"""
+    # Le statut s'écrit par le pool par défaut : la connexion de lecture de l'export (pool « reporting »)
+    # tient une transaction ouverte, dans laquelle une écriture échouerait
+    db = Database(db_name)
+    maintenant = datetime.now()
+    with db.get_connection() as conn:
+        # Une tâche annulée avant son début, ou déjà prise par un autre exécuteur, est laissée
+        pris = conn.execute(
+            "UPDATE TachesExport SET statut = ?, date_debut = ?, date_maj = ? WHERE id = ? AND statut = ?",
+            (EN_COURS, maintenant, maintenant, tache_id, EN_ATTENTE)
+        ).rowcount
+        conn.commit()
+        if not pris:
+            return None
+        tache = conn.execute("SELECT jeu, format, fichier, options FROM TachesExport WHERE id = ?",
+                             (tache_id,)).fetchone()
+
+    compte = {"lignes": 0, "total": None, "ecrit": 0.0}
+
+    def progression(lignes, total):
+        compte["lignes"], compte["total"] = lignes, total
+        if time.monotonic() - compte["ecrit"] < INTERVALLE_PROGRESSION:
+            return
+        compte["ecrit"] = time.monotonic()
+        with db.get_connection() as conn:
+            en_cours = conn.execute(
+                "UPDATE TachesExport SET lignes = ?, total = ?, date_maj = ? WHERE id = ? AND statut = ?",
+                (lignes, total, datetime.now(), tache_id, EN_COURS)
+            ).rowcount
+            conn.commit()
+        if not en_cours:
+            raise ExportAnnule()
+
+    methode, _ = FORMATS[tache["format"]]
+    provisoire = _provisoire(tache["fichier"], tache_id)
+    resultat = None
+    try:
+        resultat = getattr(ExportManager(db_name, profile="reporting"), methode)(
+            tache["jeu"], provisoire, progression=progression, **json.loads(tache["options"]))
+        os.replace(provisoire, tache["fichier"])
+        statut = TERMINEE
+        unite = "pages" if tache["format"] == "pdf" else "lignes"
+        message = f"{resultat:,} {unite}".replace(",", " ")
+    except ExportAnnule:
+        statut, message = ANNULEE, "Export annulé"
+    except Exception as e:
+        statut, message = ECHEC, str(e) or type(e).__name__
+    if statut != TERMINEE:
+        try:
+            os.remove(provisoire)
+        except OSError:
+            pass
+
+    with db.get_connection() as conn:
+        conn.execute("""
+            UPDATE TachesExport
+            SET statut = ?, message = ?, resultat = ?, lignes = ?, total = ?, date_fin = ?, date_maj = ?
+            WHERE id = ?
+        """, (statut, message, resultat, compte["lignes"], compte["total"], datetime.now(), datetime.now(),
+              tache_id))
+        conn.commit()
+    return statut
+
+
+def pourcentage(tache):
+    """Progression d'une tâche (ligne de TachesExport) en pour cent ; None tant que le total est inconnu"""
+    if tache["statut"] == TERMINEE:
+        return 100.0
+    if not tache["total"]:
+        return 0.0 if tache["statut"] == EN_ATTENTE else None
+    return min(100.0, tache["lignes"] * 100.0 / tache["total"])
+
+
+class ExportJobs:
+    """File des exports d'une base ; les pools d'exécution sont partagés par toutes les instances"""
+
+    _executeurs = {}
+    _verrou = threading.Lock()
+
+    def __init__(self, db_name="stock_app.db"):
+        self.db_name = os.path.abspath(db_name)
+        self.db = Database(db_name)
+
+    @classmethod
+    def _executeur(cls, processus):
+        with cls._verrou:
+            executeur = cls._executeurs.get(processus)
+            if executeur is None:
+                if processus:
+                    executeur = ProcessPoolExecutor(
+                        max_workers=PROCESSUS_EXPORT, mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_initialiser_processus)
+                else:
+                    executeur = ThreadPoolExecutor(max_workers=THREADS_EXPORT, thread_name_prefix="export")
+                cls._executeurs[processus] = executeur
+            return executeur
+
+    @classmethod
+    def arreter(cls):
+        """Arrête les pools (fermeture de l'application) : les tâches en attente seront reprises au démarrage"""
+        with cls._verrou:
+            executeurs = list(cls._executeurs.values())
+            cls._executeurs.clear()
+        for executeur in executeurs:
+            executeur.shutdown(wait=False, cancel_futures=True)
+
+    def _lancer(self, tache_id, format_):
+        processus = format_ in FORMATS_PROCESSUS
+        executeur = self._executeur(processus)
+        try:
+            future = executeur.submit(executer_tache, self.db_name, tache_id)
+        except (BrokenProcessPool, RuntimeError):
+            # Pool cassé (processus tué) ou arrêté : un neuf le remplace
+            self._oublier(processus, executeur)
+            executeur = self._executeur(processus)
+            future = executeur.submit(executer_tache, self.db_name, tache_id)
+        future.add_done_callback(lambda f: self._terminee(f, tache_id, processus, executeur))
+
+    @classmethod
+    def _oublier(cls, processus, executeur):
+        with cls._verrou:
+            if cls._executeurs.get(processus) is executeur:
+                del cls._executeurs[processus]
+
+    def _terminee(self, future, tache_id, processus, executeur):
+        """Une tâche sortie en erreur de son exécuteur (processus tué...) passe en échec"""
+        if future.cancelled() or future.exception() is None:
+            return
+        if isinstance(future.exception(), BrokenProcessPool):
+            self._oublier(processus, executeur)
+        self._echouer(tache_id, f"Export interrompu : {future.exception()}")
+
+    def _echouer(self, tache_id, message):
+        maintenant = datetime.now()
+        with self.db.get_connection() as conn:
+            conn.execute(f"""
+                UPDATE TachesExport SET statut = ?, message = ?, date_fin = ?, date_maj = ?
+                WHERE id = ? AND statut IN ({', '.join('?' * len(ACTIFS))})
+            """, (ECHEC, message, maintenant, maintenant, tache_id, *ACTIFS))
+            conn.commit()
+
+    def soumettre(self, jeu, format_, fichier, user_id=None, **options):
+        """Met un export en file et retourne (succès, message, id de la tâche).
+
+        ``options`` sont celles de la méthode d'ExportManager du format
+        (colonnes, période, export incrémental...).
+        """
+        if jeu not in JEUX_EXPORT:
+            return False, f"Jeu d'export inconnu : {jeu}", None
+        if format_ not in FORMATS:
+            return False, f"Format d'export inconnu : {format_}", None
+        donnees = JEUX_EXPORT[jeu]
+        inconnues = set(options) - FORMATS[format_][1]
+        if inconnues:
+            return False, f"Options non prises en charge par l'export {format_} : {', '.join(sorted(inconnues))}", None
+        try:
+            donnees.selection(options.get("colonnes"))
+        except ValueError as e:
+            return False, str(e), None
+        if (options.get("debut") or options.get("fin")) and donnees.date is None:
+            return False, f"L'export {donnees.titre} ne se restreint pas à une période", None
+        if options.get("depuis") and donnees.repere is None:
+            return False, f"L'export {donnees.titre} ne peut pas être incrémental", None
+        fichier = os.path.abspath(fichier)
+        if not os.path.isdir(os.path.dirname(fichier)):
+            return False, f"Dossier introuvable : {os.path.dirname(fichier)}", None
+
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                actives = conn.execute(f"""
+                    SELECT COUNT(*), SUM(fichier = ?) FROM TachesExport
+                    WHERE statut IN ({', '.join('?' * len(ACTIFS))}) AND poste = ?
+                """, (fichier, *ACTIFS, POSTE)).fetchone()
+                if actives[0] >= MAX_TACHES_ACTIVES:
+                    conn.rollback()
+                    return False, f"Trop d'exports en cours ({actives[0]}) : attendez la fin de l'un d'eux", None
+                if actives[1]:
+                    conn.rollback()
+                    return False, f"Un export vers {os.path.basename(fichier)} est déjà en cours", None
+                tache_id = conn.execute("""
+                    INSERT INTO TachesExport (jeu, format, fichier, options, statut, user_id, poste, date_creation)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (jeu, format_, fichier, json.dumps(options), EN_ATTENTE, user_id, POSTE,
+                      datetime.now())).lastrowid
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._lancer(tache_id, format_)
+        return True, f"Export n°{tache_id} mis en file", tache_id
+
+    def annuler(self, tache_id):
+        """Annule une tâche en attente, ou demande l'arrêt d'une tâche en cours ; retourne (succès, message)"""
+        maintenant = datetime.now()
+        with self.db.get_connection() as conn:
+            if conn.execute(
+                "UPDATE TachesExport SET statut = ?, message = ?, date_fin = ?, date_maj = ? WHERE id = ? AND statut = ?",
+                (ANNULEE, "Export annulé", maintenant, maintenant, tache_id, EN_ATTENTE)
+            ).rowcount:
+                conn.commit()
+                return True, f"Export n°{tache_id} annulé"
+            # La tâche s'arrête à sa prochaine écriture de progression
+            if conn.execute(
+                "UPDATE TachesExport SET statut = ?, date_maj = ? WHERE id = ? AND statut = ?",
+                (ANNULATION, maintenant, tache_id, EN_COURS)
+            ).rowcount:
+                conn.commit()
+                return True, f"Annulation de l'export n°{tache_id} demandée"
+            conn.rollback()
+        return False, f"L'export n°{tache_id} n'est plus en cours"
+
+    def tache(self, tache_id):
+        """Retourne la ligne de TachesExport d'une tâche, ou None"""
+        with self.db.get_connection() as conn:
+            return conn.execute("SELECT * FROM TachesExport WHERE id = ?", (tache_id,)).fetchone()
+
+    def taches(self, limite=50, user_id=None):
+        """Retourne les dernières tâches, de la plus récente à la plus ancienne"""
+        filtre, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        with self.db.get_connection() as conn:
+            return conn.execute(f"SELECT * FROM TachesExport {filtre} ORDER BY id DESC LIMIT ?",
+                                (*params, limite)).fetchall()
+
+    def reprendre(self):
+        """Au démarrage : relance les tâches en attente du poste, clôt celles interrompues en cours.
+
+        Retourne (tâches relancées, tâches passées en échec). Une tâche
+        relancée alors qu'un autre exécuteur la tient encore n'est exécutée
+        qu'une fois : seul le premier à la passer en cours l'exécute.
+        """
+        abandon = datetime.now() - DELAI_ABANDON
+        with self.db.get_connection() as conn:
+            actives = conn.execute(f"""
+                SELECT id, format, statut, date_maj FROM TachesExport
+                WHERE statut IN ({', '.join('?' * len(ACTIFS))}) AND poste = ?
+            """, (*ACTIFS, POSTE)).fetchall()
+        relancees = echouees = 0
+        for tache in actives:
+            if tache["statut"] == EN_ATTENTE:
+                self._lancer(tache["id"], tache["format"])
+                relancees += 1
+            elif datetime.fromisoformat(tache["date_maj"]) < abandon:
+                self._echouer(tache["id"], "Export interrompu par la fermeture de l'application")
+                echouees += 1
+        return relancees, echouees
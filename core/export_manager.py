@@ -1,25 +1,402 @@
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+# core/export_manager.py
+import csv
+import os
+from datetime import date, datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 from database.db import Database
+from reporting.pdf_report import RapportPDF
+
+# Lignes lues à la fois dans le curseur d'un export : la mémoire ne dépend pas du volume exporté
+TAILLE_LOT = 5000
+# Lignes par groupe de lignes Parquet (un lot converti en colonnes à la fois)
+TAILLE_LOT_PARQUET = 50_000
+
+# Lignes de données d'une feuille Excel (1 048 576 lignes, en-tête compris) ; au-delà, l'export continue
+# sur une nouvelle feuille
+LIGNES_FEUILLE = 1_048_575
+
+# Types de colonne -> format de nombre Excel (None : format standard)
+FORMATS_EXCEL = {
+    "texte": None,
+    "entier": "#,##0",
+    "decimal": "#,##0.00",
+    "date": "yyyy-mm-dd hh:mm:ss",
+    "jour": "yyyy-mm-dd",
+}
+
+
+def _date(valeur):
+    """Date enregistrée (texte ISO) en datetime, pour une cellule de date ; inchangée si illisible"""
+    if isinstance(valeur, str):
+        try:
+            return datetime.fromisoformat(valeur)
+        except ValueError:
+            return valeur
+    return valeur
+
+
+def _jour(valeur):
+    """Jour enregistré (AAAA-MM-JJ) en date ; inchangé si illisible"""
+    if isinstance(valeur, str):
+        try:
+            return date.fromisoformat(valeur)
+        except ValueError:
+            return valeur
+    return valeur
+
+
+# Types de colonne -> conversion de la valeur lue (None : valeur écrite telle quelle)
+CONVERSIONS = {"texte": None, "entier": None, "decimal": None, "date": _date, "jour": _jour}
+
+
+class ColonneExport:
+    """Colonne exportée : en-tête, expression SQL, type (clé de FORMATS_EXCEL) et largeur"""
+
+    def __init__(self, titre, expression, type_="texte", largeur=14, somme=False):
+        self.titre = titre
+        self.expression = expression
+        self.type_ = type_
+        self.largeur = largeur
+        # Totalisée en pied de page des rapports PDF
+        self.somme = somme
+
+
+class JeuExport:
+    """Données exportables : colonnes par nom, tables lues et ordre de lecture.
+
+    ``date`` est l'expression filtrée par une période ; ``repere`` celle d'un
+    export incrémental, croissante avec les écritures. Un repère ``inclusif``
+    réexporte les lignes de son dernier repère, qui ont pu changer depuis.
+    """
+
+    def __init__(self, titre, from_, colonnes, ordre, date=None, repere=None, inclusif=False):
+        self.titre = titre
+        self.from_ = from_
+        self.colonnes = colonnes
+        # Ordre d'un index : les lignes sont lues au fil de l'index, sans tri préalable
+        self.ordre = ordre
+        self.date = date
+        self.repere = repere
+        self.inclusif = inclusif
+
+    def selection(self, noms=None):
+        """Retourne les colonnes choisies (toutes sans ``noms``), dans l'ordre demandé"""
+        if noms is None:
+            return list(self.colonnes.values())
+        inconnues = [nom for nom in noms if nom not in self.colonnes]
+        if inconnues:
+            raise ValueError(f"Colonnes inconnues pour l'export {self.titre} : {', '.join(inconnues)}")
+        return [self.colonnes[nom] for nom in noms]
+
+    def requete(self, colonnes, where=None):
+        filtre = f" WHERE {where}" if where else ""
+        return (f"SELECT {', '.join(colonne.expression for colonne in colonnes)}"
+                f" FROM {self.from_}{filtre} ORDER BY {self.ordre}")
+
+    def comptage(self, where=None):
+        filtre = f" WHERE {where}" if where else ""
+        return f"SELECT COUNT(*) FROM {self.from_}{filtre}"
+
+
+JEUX_EXPORT = {
+    # Catalogue
+    "articles": JeuExport("Articles", "Articles a", {
+        "code_article": ColonneExport("Code article", "a.code_article"),
+        "designation": ColonneExport("Désignation", "a.designation", largeur=40),
+        "categorie": ColonneExport("Catégorie", "a.categorie", largeur=20),
+        "prix_achat": ColonneExport("Prix d'achat", "a.prix_achat", "decimal", 12),
+        "prix_vente": ColonneExport("Prix de vente", "a.prix_vente", "decimal", 12),
+        "seuil_alerte": ColonneExport("Seuil d'alerte", "a.seuil_alerte", "entier", 12),
+    }, "a.code_article"),
+    # Stock par article et emplacement (index Stock(code_article))
+    "stock": JeuExport("Stock", "Stock s JOIN Articles a ON a.code_article = s.code_article", {
+        "code_article": ColonneExport("Code article", "s.code_article"),
+        "designation": ColonneExport("Désignation", "a.designation", largeur=40),
+        "categorie": ColonneExport("Catégorie", "a.categorie", largeur=20),
+        "emplacement": ColonneExport("Emplacement", "s.emplacement", largeur=18),
+        "quantite": ColonneExport("Quantité", "s.quantite", "entier", 12, somme=True),
+        "prix_achat": ColonneExport("Prix d'achat", "a.prix_achat", "decimal", 12),
+        "prix_vente": ColonneExport("Prix de vente", "a.prix_vente", "decimal", 12),
+        "valeur": ColonneExport("Valeur", "s.quantite * a.prix_vente", "decimal", 14, somme=True),
+    }, "s.code_article, s.emplacement"),
+    # Historique des mouvements, dans l'ordre d'enregistrement (clé primaire)
+    "mouvements": JeuExport("Mouvements", "Mouvements m LEFT JOIN Articles a ON a.code_article = m.code_article", {
+        "id": ColonneExport("N°", "m.id", "entier", 10),
+        "date_mvt": ColonneExport("Date", "m.date_mvt", "date", 20),
+        "type": ColonneExport("Type", "m.type", largeur=12),
+        "code_article": ColonneExport("Code article", "m.code_article"),
+        "designation": ColonneExport("Désignation", "a.designation", largeur=40),
+        "quantite": ColonneExport("Quantité", "m.quantite", "entier", 12),
+        "emplacement": ColonneExport("Emplacement", "m.emplacement", largeur=18),
+        "destination": ColonneExport("Destination", "m.destination", largeur=18),
+        "user_id": ColonneExport("Utilisateur", "m.user_id", "entier", 12),
+    }, "m.id", date="m.date_mvt", repere="m.id"),
+    # Cumuls journaliers par article ; ceux du dernier jour exporté évoluent jusqu'à la fin de la journée
+    "cumuls": JeuExport("Cumuls journaliers", "MouvementsJour j", {
+        "jour": ColonneExport("Jour", "j.jour", "jour", 12),
+        "code_article": ColonneExport("Code article", "j.code_article"),
+        "quantite_entree": ColonneExport("Entrées", "j.quantite_entree", "entier", 12, somme=True),
+        "quantite_sortie": ColonneExport("Sorties", "j.quantite_sortie", "entier", 12, somme=True),
+        "quantite_ajustement": ColonneExport("Ajustements", "j.quantite_ajustement", "entier", 12, somme=True),
+        "nombre": ColonneExport("Mouvements", "j.nombre", "entier", 12, somme=True),
+        "valeur_entree": ColonneExport("Valeur des entrées", "j.valeur_entree", "decimal", 16, somme=True),
+        "valeur_sortie": ColonneExport("Valeur des sorties", "j.valeur_sortie", "decimal", 16, somme=True),
+    }, "j.jour, j.code_article", date="j.jour", repere="j.jour", inclusif=True),
+}
+
+# Colonnes du listing de stock imprimé (portrait A4)
+COLONNES_PDF_STOCK = ("code_article", "designation", "emplacement", "quantite", "prix_vente", "valeur")
+
+
+# Types de colonne -> type Arrow d'une colonne Parquet
+TYPES_PARQUET = {"texte": "string", "entier": "int64", "decimal": "float64", "date": "timestamp[us]", "jour": "date32"}
+
 
 class ExportManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db_name="stock_app.db", profile=None):
+        self.db = Database(db_name, profile=profile)
+
+    def _lots(self, conn, donnees, colonnes, where, params, progression, total=None, taille=TAILLE_LOT):
+        """Lit les lignes par lots de ``taille`` et signale la progression après chaque lot"""
+        if progression and total is None:
+            total = conn.execute(donnees.comptage(where), params).fetchone()[0]
+        curseur = conn.execute(donnees.requete(colonnes, where), params)
+        ecrites = 0
+        while True:
+            lot = curseur.fetchmany(taille)
+            if not lot:
+                return
+            yield lot
+            ecrites += len(lot)
+            if progression:
+                progression(ecrites, total)
+
+    def export_excel(self, jeu, filename, colonnes=None, progression=None, where=None, params=()):
+        """Écrit le jeu ``jeu`` (clé de JEUX_EXPORT) dans un classeur Excel et retourne le nombre de lignes.
+
+        Les lignes sont lues par lots de TAILLE_LOT et écrites au fil de l'eau
+        (classeur en écriture seule) : la mémoire reste la même quel que soit
+        le volume. ``colonnes`` choisit et ordonne les colonnes ;
+        ``progression(lignes_ecrites, total)`` est appelée après chaque lot.
+        """
+        donnees = JEUX_EXPORT[jeu]
+        choisies = donnees.selection(colonnes)
+        classeur = Workbook(write_only=True)
+        feuille, cellules = self._feuille_excel(classeur, donnees.titre, choisies)
+
+        ecrites = dans_feuille = 0
+        try:
+            with self.db.get_connection() as conn:
+                # Comptage et lignes lus dans une même transaction de lecture
+                conn.execute("BEGIN")
+                try:
+                    for lot in self._lots(conn, donnees, choisies, where, params, progression):
+                        for ligne in lot:
+                            if dans_feuille == LIGNES_FEUILLE:
+                                feuille, cellules = self._feuille_excel(
+                                    classeur, f"{donnees.titre} ({len(classeur.worksheets) + 1})", choisies)
+                                dans_feuille = 0
+                            dans_feuille += 1
+                            valeurs = []
+                            for valeur, (cellule, conversion) in zip(ligne, cellules):
+                                if valeur is not None and conversion is not None:
+                                    valeur = conversion(valeur)
+                                if cellule is not None and valeur is not None:
+                                    cellule.value = valeur
+                                    valeur = cellule
+                                valeurs.append(valeur)
+                            feuille.append(valeurs)
+                        ecrites += len(lot)
+                finally:
+                    conn.rollback()
+        except BaseException:
+            # Export interrompu (erreur, annulation) : les flux des feuilles sont refermés
+            for ouverte in classeur.worksheets:
+                if not ouverte.closed:
+                    ouverte.close()
+            raise
+        classeur.save(filename)
+        return ecrites
+
+    def _feuille_excel(self, classeur, titre, colonnes):
+        """Ajoute une feuille avec sa ligne d'en-tête ; retourne la feuille et la cellule de chaque colonne"""
+        feuille = classeur.create_sheet(titre)
+        for indice, colonne in enumerate(colonnes, 1):
+            feuille.column_dimensions[get_column_letter(indice)].width = colonne.largeur
+        feuille.freeze_panes = "A2"
+        gras = Font(bold=True)
+        entetes = []
+        for colonne in colonnes:
+            cellule = WriteOnlyCell(feuille, value=colonne.titre)
+            cellule.font = gras
+            entetes.append(cellule)
+        feuille.append(entetes)
+
+        # Une cellule mise en forme par colonne typée, réutilisée à chaque ligne :
+        # une ligne ajoutée est écrite aussitôt dans le fichier
+        cellules = []
+        for colonne in colonnes:
+            cellule = None
+            if FORMATS_EXCEL[colonne.type_] is not None:
+                cellule = WriteOnlyCell(feuille)
+                cellule.number_format = FORMATS_EXCEL[colonne.type_]
+            cellules.append((cellule, CONVERSIONS[colonne.type_]))
+        return feuille, cellules
+
+    def export_stock_excel(self, filename="stock_report.xlsx", colonnes=None, progression=None):
+        """Exporte le stock par article et emplacement ; retourne le nombre de lignes"""
+        return self.export_excel("stock", filename, colonnes, progression)
+
+    def export_mouvements_excel(self, filename="mouvements.xlsx", colonnes=None, progression=None):
+        """Exporte tout l'historique des mouvements ; retourne le nombre de lignes"""
+        return self.export_excel("mouvements", filename, colonnes, progression)
+
+    def export_pdf(self, jeu, filename, colonnes=None, progression=None, where=None, params=(), titre=None):
+        """Écrit le jeu ``jeu`` dans un rapport PDF paginé et retourne le nombre de pages.
+
+        Les lignes sont lues par lots et dessinées au fil de l'eau ; chaque page
+        répète les en-têtes et totalise les colonnes marquées ``somme``.
+        ``progression(lignes_ecrites, total)`` est appelée après chaque lot.
+        """
+        donnees = JEUX_EXPORT[jeu]
+        choisies = donnees.selection(colonnes)
+        with self.db.get_connection() as conn:
+            # Le nombre de pages annoncé vaut pour les lignes lues : même transaction de lecture
+            conn.execute("BEGIN")
+            try:
+                total = conn.execute(donnees.comptage(where), params).fetchone()[0]
+                rapport = RapportPDF(filename, titre or f"Rapport {donnees.titre}", choisies, total)
+                for lot in self._lots(conn, donnees, choisies, where, params, progression, total):
+                    rapport.ajouter(lot)
+            finally:
+                conn.rollback()
+        return rapport.terminer()
+
+    def export_stock_pdf(self, filename="stock_report.pdf", colonnes=COLONNES_PDF_STOCK, progression=None):
+        """Imprime le stock par article et emplacement ; retourne le nombre de pages"""
+        return self.export_pdf("stock", filename, colonnes, progression, titre="Rapport de Stock")
+
+    def export_csv(self, jeu, filename, colonnes=None, progression=None, debut=None, fin=None, depuis=None,
+                   separateur=","):
+        """Écrit le jeu ``jeu`` en CSV (UTF-8, en-tête des noms de colonnes) et retourne le nombre de lignes.
+
+        ``debut`` / ``fin`` (AAAA-MM-JJ, inclus) restreignent à une période ;
+        ``depuis`` nomme un export incrémental, qui ne reprend que les lignes
+        écrites après le précédent export de ce nom (voir ``_exporter``).
+        """
+        def ecrire(chemin, choisies, lots):
+            ecrites = 0
+            with open(chemin, "w", newline="", encoding="utf-8") as fichier:
+                writer = csv.writer(fichier, delimiter=separateur)
+                writer.writerow([self._nom_colonne(jeu, colonne) for colonne in choisies])
+                for lot in lots:
+                    writer.writerows(lot)
+                    ecrites += len(lot)
+            return ecrites
+        return self._exporter(jeu, filename, colonnes, progression, debut, fin, depuis, ecrire, TAILLE_LOT)
+
+    def export_parquet(self, jeu, filename, colonnes=None, progression=None, debut=None, fin=None, depuis=None):
+        """Écrit le jeu ``jeu`` en Parquet (colonnes typées, un groupe de lignes par lot) ; retourne le nombre de lignes.
+
+        Mêmes modes que ``export_csv``. Nécessite pyarrow.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("La bibliothèque pyarrow est requise pour l'export Parquet : pip install pyarrow")
+
+        def ecrire(chemin, choisies, lots):
+            schema = pa.schema([(self._nom_colonne(jeu, colonne), TYPES_PARQUET[colonne.type_]) for colonne in choisies])
+            ecrites = 0
+            with pq.ParquetWriter(chemin, schema, compression="zstd") as writer:
+                for lot in lots:
+                    # Les dates (texte ISO) sont converties par Arrow, colonne entière à la fois
+                    colonnes_lot = [pa.array(valeurs, pa.string()).cast(champ.type)
+                                    if pa.types.is_temporal(champ.type) else pa.array(valeurs, champ.type)
+                                    for valeurs, champ in zip(zip(*lot), schema)]
+                    writer.write_batch(pa.record_batch(colonnes_lot, schema=schema))
+                    ecrites += len(lot)
+            return ecrites
+        return self._exporter(jeu, filename, colonnes, progression, debut, fin, depuis, ecrire, TAILLE_LOT_PARQUET)
+
+    def _nom_colonne(self, jeu, colonne):
+        """Nom (clé de JEUX_EXPORT) d'une colonne : en-tête stable pour les imports automatiques"""
+        return next(nom for nom, candidate in JEUX_EXPORT[jeu].colonnes.items() if candidate is colonne)
+
+    def _exporter(self, jeu, filename, colonnes, progression, debut, fin, depuis, ecrire, taille):
+        """Export vers un fichier, complet, sur une période et/ou incrémental.
+
+        Le comptage, le repère atteint et les lignes sont lus dans une même
+        transaction de lecture : une écriture concurrente n'est ni exportée à
+        moitié ni perdue pour l'export suivant. Le fichier est écrit à côté puis
+        renommé, et le repère d'un export ``depuis`` n'avance qu'une fois le
+        fichier en place : une ligne est livrée au moins une fois.
+        """
+        donnees = JEUX_EXPORT[jeu]
+        choisies = donnees.selection(colonnes)
+        conditions, params = [], []
+        if debut is not None or fin is not None:
+            if donnees.date is None:
+                raise ValueError(f"L'export {donnees.titre} ne se restreint pas à une période")
+            if debut is not None:
+                conditions.append(f"{donnees.date} >= ?")
+                params.append(debut)
+            if fin is not None:
+                conditions.append(f"{donnees.date} < DATE(?, '+1 day')")
+                params.append(fin)
+        if depuis is not None and donnees.repere is None:
+            raise ValueError(f"L'export {donnees.titre} ne peut pas être incrémental")
 
-    def export_stock_excel(self, filename="stock_report.xlsx"):
+        provisoire = filename + ".tmp"
+        repere = None
         with self.db.get_connection() as conn:
-            df = pd.read_sql_query("SELECT * FROM Stock JOIN Articles ON Stock.code_article = Articles.code_article", conn)
-            df.to_excel(filename, index=False)
+            conn.execute("BEGIN")
+            try:
+                if depuis is not None:
+                    etat = conn.execute("SELECT jeu, repere FROM EtatsExport WHERE nom = ?", (depuis,)).fetchone()
+                    if etat is not None and etat[0] != jeu:
+                        raise ValueError(f"L'export incrémental '{depuis}' porte sur le jeu '{etat[0]}'")
+                    if etat is not None and etat[1] is not None:
+                        conditions.append(f"{donnees.repere} {'>=' if donnees.inclusif else '>'} ?")
+                        params.append(etat[1])
+                    # Les lignes écrites pendant l'export iront au suivant
+                    filtre = " AND ".join(conditions) or None
+                    repere = conn.execute(
+                        f"SELECT MAX({donnees.repere}) FROM {donnees.from_}{' WHERE ' + filtre if filtre else ''}",
+                        params).fetchone()[0]
+                    if repere is not None:
+                        conditions.append(f"{donnees.repere} <= ?")
+                        params.append(repere)
+                filtre = " AND ".join(conditions) or None
+                ecrites = ecrire(provisoire, choisies,
+                                 self._lots(conn, donnees, choisies, filtre, params, progression, taille=taille))
+            except BaseException:
+                try:
+                    os.remove(provisoire)
+                except OSError:
+                    pass
+                raise
+            finally:
+                conn.rollback()
+            os.replace(provisoire, filename)
+            if depuis is not None and repere is not None:
+                conn.execute("""
+                    INSERT INTO EtatsExport (nom, jeu, repere, date_export, lignes) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (nom) DO UPDATE SET
+                        repere = excluded.repere, date_export = excluded.date_export, lignes = excluded.lignes
+                """, (depuis, jeu, repere, datetime.now(), ecrites))
+                conn.commit()
+        return ecrites
 
-    def export_stock_pdf(self, filename="stock_report.pdf"):
-        c = canvas.Canvas(filename, pagesize=letter)
-        c.drawString(100, 750, "Rapport de Stock")
+    def reinitialiser_export(self, nom):
+        """Oublie le repère de l'export incrémental ``nom`` : le prochain export sera complet"""
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Stock JOIN Articles ON Stock.code_article = Articles.code_article")
-            y = 700
-            for row in cursor.fetchall():
-                c.drawString(100, y, f"{row['designation']}: {row['quantite']} unités")
-                y -= 20
-            c.save()
+            supprimes = conn.execute("DELETE FROM EtatsExport WHERE nom = ?", (nom,)).rowcount
+            conn.commit()
+        if not supprimes:
+            return False, f"Aucun export incrémental nommé '{nom}'"
+        return True, f"Export '{nom}' réinitialisé"
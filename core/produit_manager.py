@@ -1,9 +1,85 @@
 # core/produit_manager.py
+import sqlite3
+import string
 from database.db import Database
+from database import search_index
+from database.query_cache import QueryCache
+
+# Articles dont le code, la désignation ou la catégorie contient un motif (motif_contient),
+# recherche de repli quand SQLite n'offre pas FTS5
+ARTICLES_CONTENANT = (
+    "a.code_article LIKE ? ESCAPE '\\' OR a.designation LIKE ? ESCAPE '\\' OR a.categorie LIKE ? ESCAPE '\\'"
+)
+
+RECHERCHE_ARTICLES = f"""
+    SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock
+    FROM Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article
+    WHERE {ARTICLES_CONTENANT}
+    ORDER BY a.designation, a.code_article
+    LIMIT ?
+"""
+
+# Index plein texte : les résultats retenus sont choisis avant toute jointure,
+# les meilleurs (bm25) d'abord, ou dans l'ordre du catalogue quand ils sont trop nombreux
+_RECHERCHE_PLEIN_TEXTE = """
+    SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock
+    FROM (SELECT rowid, {ordre} AS ordre FROM ArticlesFTS WHERE ArticlesFTS MATCH ? ORDER BY {ordre} LIMIT ?) f
+    JOIN Articles a ON a.rowid = f.rowid
+    LEFT JOIN StockSolde s ON a.code_article = s.code_article
+    ORDER BY f.ordre
+"""
+RECHERCHE_CLASSEE = _RECHERCHE_PLEIN_TEXTE.format(ordre="rank")
+RECHERCHE_NON_CLASSEE = _RECHERCHE_PLEIN_TEXTE.format(ordre="rowid")
+
+NOMBRE_TROUVES = "SELECT COUNT(*) FROM ArticlesFTS WHERE ArticlesFTS MATCH ?"
+
+# Au-delà, les résultats ne sont pas classés : bm25 lit la taille de chaque article
+# trouvé (environ 1 ms pour 200), et un terme aussi large est précisé à la frappe
+CLASSEMENT_MAX = 2000
+
+ARTICLES_TROUVES = "a.rowid IN (SELECT rowid FROM ArticlesFTS WHERE ArticlesFTS MATCH ?)"
+
+# Un code scanné est d'abord cherché parmi les codes-barres enregistrés, puis comme
+# code article (étiquettes Code128 générées) : deux recherches par clé primaire
+ARTICLE_DU_CODE_BARRE = """
+    SELECT code_article FROM CodesBarres WHERE code = ?
+    UNION ALL
+    SELECT code_article FROM Articles WHERE code_article = ?
+    LIMIT 1
+"""
+
+# Codes scannés gardés en mémoire ; invalidés par toute écriture dans Articles ou CodesBarres
+TAILLE_CACHE_CODES = 4096
+
+_MINUSCULES_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def motif_contient(terme):
+    """Motif LIKE « contient ``terme`` », jokers % et _ échappés"""
+    return "%" + terme.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def normaliser_code_barre(code):
+    """Forme enregistrée d'un code-barres : sans espaces ni tirets, en majuscules, GTIN d'unité sur 13 chiffres"""
+    code = "".join(str(code).split()).replace("-", "").upper()
+    if code.isascii() and code.isdigit():
+        if len(code) == 12:
+            # UPC-A lu par un scanner américain : même article que l'EAN-13 précédé de 0
+            code = "0" + code
+        elif len(code) == 14 and code.startswith("0"):
+            code = code[1:]
+    return code
+
+
+def _plier_ascii(texte):
+    """Casse repliée comme le fait LIKE : lettres ASCII seulement"""
+    return texte.translate(_MINUSCULES_ASCII)
+
 
 class ProduitManager:
     def __init__(self):
         self.db = Database()
+        self._plein_texte = None
 
     def ajouter_article(self, code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte):
         with self.db.get_connection() as conn:
@@ -35,3 +111,108 @@ class ProduitManager:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM Articles")
             return [dict(row) for row in cursor.fetchall()]
+
+    def plein_texte(self):
+        """Vrai si la recherche passe par l'index ArticlesFTS, faux en repli LIKE"""
+        if self._plein_texte is None:
+            with self.db.get_connection() as conn:
+                self._plein_texte = search_index.fts_available(conn)
+        return self._plein_texte
+
+    def rechercher_articles(self, terme, limite=50):
+        """Retourne (code, désignation, catégorie, stock) des ``limite`` articles correspondant le mieux à ``terme``.
+
+        Avec l'index plein texte, chaque mot saisi est un préfixe de mot du code,
+        de la désignation ou de la catégorie, sans égard aux accents ni à la
+        casse, et les articles sont classés par pertinence (dans l'ordre du
+        catalogue au-delà de CLASSEMENT_MAX trouvés). En repli, le terme est
+        cherché tel quel (LIKE) et les articles classés par désignation.
+        """
+        with self.db.get_connection() as conn:
+            if self.plein_texte():
+                expression = search_index.match_expression(terme)
+                if expression is None:
+                    return []
+                # Compter ne lit que l'index : nettement moins cher que classer
+                classer = conn.execute(NOMBRE_TROUVES, (expression,)).fetchone()[0] <= CLASSEMENT_MAX
+                rows = conn.execute(RECHERCHE_CLASSEE if classer else RECHERCHE_NON_CLASSEE, (expression, limite))
+            else:
+                motif = motif_contient(terme)
+                rows = conn.execute(RECHERCHE_ARTICLES, (motif, motif, motif, limite))
+            return [tuple(row) for row in rows.fetchall()]
+
+    def filtre_articles(self, terme):
+        """Condition SQL (alias ``a`` pour Articles) et paramètres retenant les articles trouvés par ``terme``"""
+        if self.plein_texte():
+            expression = search_index.match_expression(terme)
+            return (ARTICLES_TROUVES, (expression,)) if expression else ("0", ())
+        motif = motif_contient(terme)
+        return ARTICLES_CONTENANT, (motif, motif, motif)
+
+    def plier_recherche(self, texte):
+        """Texte replié pour comparer en mémoire comme le fait la recherche"""
+        return search_index.fold(texte) if self.plein_texte() else _plier_ascii(texte)
+
+    def critere_recherche(self, terme_plie):
+        """Prédicat sur un texte replié : vrai si la recherche du terme replié le retiendrait"""
+        if self.plein_texte():
+            return search_index.matcher(terme_plie)
+        return lambda texte: terme_plie in texte
+
+    def resolve_barcode(self, code):
+        """Retourne le code article d'un code-barres scanné, ou None s'il n'est pas connu.
+
+        Un code déjà scanné est résolu en mémoire, sans requête, tant que ni le
+        catalogue ni les codes-barres n'ont été modifiés.
+        """
+        normalise = normaliser_code_barre(code)
+        if not normalise:
+            return None
+        cache = QueryCache.pour(self.db, "codes_barres", TAILLE_CACHE_CODES)
+        return cache.get(
+            ("code_barre", normalise, code), ("CodesBarres", "Articles"),
+            lambda conn: (conn.execute(ARTICLE_DU_CODE_BARRE, (normalise, code)).fetchone() or (None,))[0]
+        )
+
+    def ajouter_code_barre(self, code_article, code):
+        """Associe un code-barres (EAN, code fournisseur...) à un article et retourne (succès, message)"""
+        normalise = normaliser_code_barre(code)
+        if not normalise:
+            return False, "Le code-barres est vide"
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM Articles WHERE code_article = ?", (code_article,)).fetchone() is None:
+                    conn.rollback()
+                    return False, f"L'article '{code_article}' n'existe pas"
+                # Un code égal au code d'un autre article rendrait le scan ambigu
+                autre = conn.execute(ARTICLE_DU_CODE_BARRE, (normalise, code)).fetchone()
+                if autre is not None and autre[0] != code_article:
+                    conn.rollback()
+                    return False, f"Le code-barres '{normalise}' désigne déjà l'article '{autre[0]}'"
+                conn.execute("INSERT INTO CodesBarres (code, code_article) VALUES (?, ?)", (normalise, code_article))
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False, f"Le code-barres '{normalise}' est déjà associé à cet article"
+            except Exception:
+                conn.rollback()
+                raise
+        return True, f"Code-barres '{normalise}' associé à l'article '{code_article}'"
+
+    def supprimer_code_barre(self, code):
+        """Retire un code-barres enregistré et retourne (succès, message)"""
+        normalise = normaliser_code_barre(code)
+        with self.db.get_connection() as conn:
+            supprimes = conn.execute("DELETE FROM CodesBarres WHERE code = ?", (normalise,)).rowcount
+            conn.commit()
+        if not supprimes:
+            return False, f"Le code-barres '{normalise}' n'est associé à aucun article"
+        return True, f"Code-barres '{normalise}' retiré"
+
+    def codes_barres(self, code_article):
+        """Retourne les codes-barres enregistrés d'un article"""
+        with self.db.get_connection() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT code FROM CodesBarres WHERE code_article = ? ORDER BY date_ajout, code", (code_article,)
+            )]
@@ -0,0 +1,88 @@
+# core/stats_manager.py
+from datetime import date
+from database.db import Database
+from database.query_cache import QueryCache
+
+# Articles, unités, alertes et valeur du stock : une ligne tenue à jour par trigger
+# (recalculée en un parcours par database.ledger.rebuild_statistics)
+STATISTIQUES = """
+    SELECT nombre_articles, quantite_totale, nombre_alertes, valeur_stock
+    FROM StatistiquesStock WHERE id = 1
+"""
+
+# Taille du catalogue, tenue dans la même ligne
+NOMBRE_ARTICLES = "SELECT nombre_articles FROM StatistiquesStock WHERE id = 1"
+
+# Un seul parcours des lignes de stock de l'emplacement (index Stock(emplacement, ...))
+SYNTHESE_EMPLACEMENT = """
+    SELECT COUNT(*),
+           IFNULL(SUM(s.quantite), 0),
+           IFNULL(SUM(s.quantite <= a.seuil_alerte), 0),
+           IFNULL(SUM(s.quantite * a.prix_vente), 0)
+    FROM Stock s
+    JOIN Articles a ON a.code_article = s.code_article
+    WHERE s.emplacement = ?
+"""
+
+# Une ligne de cumul par article du jour : parcours d'un intervalle de la clé primaire
+MOUVEMENTS_DU_JOUR = "SELECT IFNULL(SUM(nombre), 0) FROM MouvementsJour WHERE jour = ?"
+
+MOUVEMENTS_DU_JOUR_EMPLACEMENT = """
+    SELECT COUNT(*) FROM Mouvements
+    WHERE (emplacement = ? OR destination = ?)
+      AND date_mvt >= ? AND date_mvt < DATE(?, '+1 day')
+"""
+
+# MAX sur une colonne indexée : une seule descente dans l'index
+DERNIERE_ACTIVITE = "SELECT MAX(date_mvt) FROM Mouvements"
+
+DERNIERE_ACTIVITE_EMPLACEMENT = """
+    SELECT MAX(date_mvt) FROM (
+        SELECT MAX(date_mvt) AS date_mvt FROM Mouvements WHERE emplacement = ?
+        UNION ALL
+        SELECT MAX(date_mvt) FROM Mouvements WHERE destination = ?
+    )
+"""
+
+class StatsManager:
+    """Indicateurs du tableau de bord, lus via le cache de requêtes"""
+
+    def __init__(self, db_name="stock_app.db"):
+        self.db = Database(db_name)
+        self.cache = QueryCache.pour(self.db)
+
+    def statistiques(self, emplacement=None):
+        """Retourne les indicateurs du stock, de tout le magasin ou d'un emplacement.
+
+        Clés : total_articles, total_stock, rupture_stock, valeur_stock,
+        mouvements_today, last_activity (None sans mouvement).
+        """
+        cache = self.cache
+        jour = date.today().isoformat()
+        if emplacement is None:
+            total_articles, total_stock, rupture_stock, valeur_stock = cache.fetchone(
+                STATISTIQUES, tables=("Articles", "Mouvements")
+            )
+            mouvements_today = cache.fetchone(MOUVEMENTS_DU_JOUR, (jour,), tables=("Mouvements",))[0]
+            last_activity = cache.fetchone(DERNIERE_ACTIVITE, tables=("Mouvements",))[0]
+        else:
+            # Le nombre d'articles reste celui du catalogue
+            total_articles = cache.fetchone(NOMBRE_ARTICLES, tables=("Articles",))[0]
+            _, total_stock, rupture_stock, valeur_stock = cache.fetchone(
+                SYNTHESE_EMPLACEMENT, (emplacement,), tables=("Articles", "Stock")
+            )
+            mouvements_today = cache.fetchone(
+                MOUVEMENTS_DU_JOUR_EMPLACEMENT, (emplacement, emplacement, jour, jour), tables=("Mouvements",)
+            )[0]
+            last_activity = cache.fetchone(
+                DERNIERE_ACTIVITE_EMPLACEMENT, (emplacement, emplacement), tables=("Mouvements",)
+            )[0]
+
+        return {
+            'total_articles': total_articles,
+            'total_stock': total_stock,
+            'rupture_stock': rupture_stock,
+            'valeur_stock': valeur_stock,
+            'mouvements_today': mouvements_today,
+            'last_activity': last_activity,
+        }
@@ -1,49 +1,426 @@
 # core/stock_manager.py
-from datetime import datetime
+from datetime import datetime, timedelta
 from database.db import Database
+from database.query_cache import signaler_modification
+from core.alert_manager import AlertManager
+from database.ledger import (EMPLACEMENT_DEFAUT, ENTREE, SORTIE, TRANSFERT, balances_as_of, rebuild_balances,
+                             rebuild_reservations, rebuild_statistics, rebuild_stock, snapshot_if_due, verify_balances,
+                             verify_reservations, verify_stock)
+
+# Modes d'application d'un document de mouvements
+TOUT_OU_RIEN = "tout_ou_rien"
+AU_MIEUX = "au_mieux"
+
+# Statuts d'une réservation
+RESERVATION_ACTIVE = "active"
+RESERVATION_CONVERTIE = "convertie"
+RESERVATION_ANNULEE = "annulee"
+RESERVATION_EXPIREE = "expiree"
+
+# Durée de validité par défaut d'une réservation
+DUREE_RESERVATION = timedelta(hours=24)
+
+# Limite du nombre de paramètres d'une requête IN (...)
+_TAILLE_IN = 500
 
 class StockManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db_name="stock_app.db"):
+        self.db = Database(db_name)
 
-    def ajouter_stock(self, code_article, quantite, emplacement):
+    def ajouter_stock(self, code_article, quantite, emplacement=None, user_id=None):
+        """Enregistre une entrée en stock et retourne (succès, message)"""
+        if quantite <= 0:
+            return False, "La quantité doit être supérieure à 0"
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO Stock (code_article, quantite, emplacement)
-                VALUES (?, ?, ?)
-            """, (code_article, quantite, emplacement))
-            conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Les triggers du registre tiennent StockSolde et Stock à jour
+                cursor = conn.execute("""
+                    INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id, emplacement)
+                    SELECT ?, code_article, ?, ?, ?, ?
+                    FROM Articles
+                    WHERE code_article = ?
+                """, (ENTREE, quantite, datetime.now(), user_id, emplacement or EMPLACEMENT_DEFAUT, code_article))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False, f"L'article '{code_article}' n'existe pas"
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True, "Entrée de stock enregistrée"
+
+    def sortie_stock(self, code_article, quantite, user_id=None, emplacement=None):
+        """Enregistre une sortie de stock et retourne (succès, message).
 
-    def sortie_stock(self, code_article, quantite, user_id):
+        Le contrôle du stock et l'écriture du mouvement forment une seule
+        instruction, exécutée sous verrou d'écriture (BEGIN IMMEDIATE) : deux
+        postes qui vendent les dernières unités ne peuvent pas passer tous les deux.
+        Sans emplacement, la sortie se fait sur le mieux pourvu.
+        """
+        if quantite <= 0:
+            return False, "La quantité doit être supérieure à 0"
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT quantite FROM Stock WHERE code_article = ?", (code_article,))
-            result = cursor.fetchone()
-            if result and result["quantite"] >= quantite:
-                cursor.execute("""
-                    UPDATE Stock
-                    SET quantite = quantite - ?
-                    WHERE code_article = ?
-                """, (quantite, code_article))
-                cursor.execute("""
-                    INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id)
-                    VALUES (?, ?, ?, ?, ?)
-                """, ("SORTIE", code_article, quantite, datetime.now(), user_id))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._inserer_sortie(conn, code_article, quantite, user_id, emplacement):
+                    conn.rollback()
+                    return False, self._motif_refus(conn, code_article, quantite, emplacement)
                 conn.commit()
-                return True
-            return False
+            except Exception:
+                conn.rollback()
+                raise
+        return True, "Sortie de stock enregistrée"
 
-    def verifier_alertes(self):
+    def _inserer_sortie(self, conn, code_article, quantite, user_id=None, emplacement=None):
+        """Insère une sortie si l'emplacement la couvre et si le disponible de l'article,
+        réservations déduites, le permet ; retourne True si elle a été enregistrée"""
+        cursor = conn.execute("""
+            INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id, emplacement)
+            SELECT :type, code_article, :quantite, :date, :user_id, emplacement
+            FROM Stock
+            WHERE code_article = :code AND quantite >= :quantite
+              AND (:emplacement IS NULL OR emplacement = :emplacement)
+              AND EXISTS (
+                  SELECT 1 FROM StockSolde
+                  WHERE code_article = :code AND quantite - quantite_reservee >= :quantite
+              )
+            ORDER BY quantite DESC
+            LIMIT 1
+        """, {"type": SORTIE, "quantite": quantite, "date": datetime.now(), "user_id": user_id,
+              "code": code_article, "emplacement": emplacement})
+        return cursor.rowcount > 0
+
+    def transferer_stock(self, code_article, quantite, source, destination, user_id=None):
+        """Déplace du stock d'un emplacement à un autre et retourne (succès, message).
+
+        Le transfert est un seul mouvement : le trigger du registre retire la
+        quantité de la source et l'ajoute à la destination dans la même instruction.
+        """
+        if quantite <= 0:
+            return False, "La quantité doit être supérieure à 0"
+        if not source or not destination or source == destination:
+            return False, "La source et la destination doivent être deux emplacements différents"
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT a.code_article, a.designation, a.seuil_alerte, s.quantite
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id, emplacement, destination)
+                    SELECT ?, code_article, ?, ?, ?, emplacement, ?
+                    FROM Stock
+                    WHERE code_article = ? AND emplacement = ? AND quantite >= ?
+                """, (TRANSFERT, quantite, datetime.now(), user_id, destination, code_article, source, quantite))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False, self._motif_refus(conn, code_article, quantite, source)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True, f"Transfert de {source} vers {destination} enregistré"
+
+    def _motif_refus(self, conn, code_article, quantite, emplacement=None):
+        """Explique pourquoi une sortie a été refusée"""
+        row = conn.execute("""
+            SELECT a.code_article, IFNULL(SUM(s.quantite), 0) AS total, IFNULL(MAX(s.quantite), 0) AS meilleur
+            FROM Articles a
+            LEFT JOIN Stock s ON a.code_article = s.code_article AND (? IS NULL OR s.emplacement = ?)
+            WHERE a.code_article = ?
+            GROUP BY a.code_article
+        """, (emplacement, emplacement, code_article)).fetchone()
+        if row is None:
+            return f"L'article '{code_article}' n'existe pas"
+        solde = conn.execute(
+            "SELECT quantite, quantite_reservee FROM StockSolde WHERE code_article = ?", (code_article,)
+        ).fetchone()
+        if solde and solde["quantite_reservee"] and solde["quantite"] - solde["quantite_reservee"] < quantite:
+            return (f"Stock réservé : {solde['quantite'] - solde['quantite_reservee']} disponible(s) "
+                    f"sur {solde['quantite']} ({solde['quantite_reservee']} réservé(s)), {quantite} demandé(s)")
+        if emplacement:
+            return f"Stock insuffisant à {emplacement} : {row['total']} disponible(s), {quantite} demandé(s)"
+        if row["total"] >= quantite:
+            return (f"Aucun emplacement ne couvre la sortie : {row['meilleur']} au plus "
+                    f"sur un emplacement, {quantite} demandé(s)")
+        return f"Stock insuffisant : {row['total']} disponible(s), {quantite} demandé(s)"
+
+    def apply_movements(self, lines, mode=TOUT_OU_RIEN, user_id=None):
+        """Applique un document (réception, vente, transfert...) en une seule transaction.
+
+        ``lines`` est une suite de dictionnaires {type, code_article, quantite,
+        emplacement (optionnel), destination (transferts)}. En mode TOUT_OU_RIEN, une seule ligne refusée
+        annule le document ; en mode AU_MIEUX, seules les lignes valides sont
+        appliquées. Retourne (succès, résultats) : succès vaut True si toutes les
+        lignes ont été appliquées, résultats donne pour chaque ligne
+        {ligne, code_article, type, quantite, succes, message}.
+        """
+        if mode not in (TOUT_OU_RIEN, AU_MIEUX):
+            raise ValueError(f"Mode inconnu : {mode}")
+        lines = list(lines)
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Sous le verrou d'écriture, le stock lu ne peut plus changer
+                articles, stock = self._stock_articles(conn, {line.get("code_article") for line in lines})
+                resultats, acceptees = self._valider_lignes(lines, articles, stock)
+                refus = len(acceptees) < len(lines)
+                if not acceptees or (refus and mode == TOUT_OU_RIEN):
+                    conn.rollback()
+                    if refus and mode == TOUT_OU_RIEN:
+                        for resultat in resultats:
+                            if resultat["succes"]:
+                                resultat["succes"] = False
+                                resultat["message"] = "Document annulé : une autre ligne est refusée"
+                    return not refus, resultats
+
+                maintenant = datetime.now()
+                conn.executemany("""
+                    INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id, emplacement, destination)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [(type_mvt, code_article, quantite, maintenant, user_id, emplacement, destination)
+                      for type_mvt, code_article, quantite, emplacement, destination in acceptees])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return not refus, resultats
+
+    def _stock_articles(self, conn, codes):
+        """Retourne le disponible des articles existants parmi ``codes`` et leur stock par emplacement"""
+        codes = [code for code in codes if code]
+        articles, stock = {}, {}
+        for debut in range(0, len(codes), _TAILLE_IN):
+            tranche = codes[debut:debut + _TAILLE_IN]
+            rows = conn.execute(f"""
+                SELECT a.code_article, s.emplacement, s.quantite,
+                       IFNULL(t.quantite - t.quantite_reservee, 0) AS disponible
                 FROM Articles a
-                JOIN Stock s ON a.code_article = s.code_article
-                WHERE s.quantite <= a.seuil_alerte
-            """)
-            return [dict(row) for row in cursor.fetchall()]
+                LEFT JOIN Stock s ON a.code_article = s.code_article
+                LEFT JOIN StockSolde t ON a.code_article = t.code_article
+                WHERE a.code_article IN ({", ".join("?" * len(tranche))})
+            """, tranche).fetchall()
+            for row in rows:
+                articles[row["code_article"]] = row["disponible"]
+                if row["emplacement"] is not None:
+                    stock[(row["code_article"], row["emplacement"])] = row["quantite"]
+        return articles, stock
+
+    def _valider_lignes(self, lines, articles, stock):
+        """Contrôle les lignes dans l'ordre du document en tenant le stock à jour.
+
+        Retourne les résultats par ligne et les mouvements acceptés sous forme
+        de tuples (type, code_article, quantite, emplacement, destination).
+        """
+        resultats, acceptees = [], []
+        for numero, line in enumerate(lines, 1):
+            code_article = line.get("code_article")
+            type_mvt = line.get("type")
+            quantite = line.get("quantite")
+            emplacement = line.get("emplacement")
+            destination = line.get("destination")
+            resultat = {"ligne": numero, "code_article": code_article, "type": type_mvt,
+                        "quantite": quantite, "succes": False, "message": ""}
+            resultats.append(resultat)
+            if type_mvt not in (ENTREE, SORTIE, TRANSFERT):
+                resultat["message"] = f"Type de mouvement inconnu : {type_mvt}"
+                continue
+            if type_mvt == TRANSFERT and (not emplacement or not destination or emplacement == destination):
+                resultat["message"] = "La source et la destination doivent être deux emplacements différents"
+                continue
+            if not isinstance(quantite, int) or quantite <= 0:
+                resultat["message"] = "La quantité doit être un entier supérieur à 0"
+                continue
+            if code_article not in articles:
+                resultat["message"] = f"L'article '{code_article}' n'existe pas"
+                continue
+            if type_mvt == ENTREE:
+                emplacement = emplacement or EMPLACEMENT_DEFAUT
+                destination = None
+                stock[(code_article, emplacement)] = stock.get((code_article, emplacement), 0) + quantite
+                articles[code_article] += quantite
+            else:
+                if type_mvt == SORTIE and articles[code_article] < quantite:
+                    resultat["message"] = (f"Stock réservé ou insuffisant : {articles[code_article]} "
+                                           f"disponible(s), {quantite} demandé(s)")
+                    continue
+                if emplacement is None:
+                    # Même règle que sortie_stock : l'emplacement le mieux pourvu
+                    candidats = [(q, e) for (c, e), q in stock.items() if c == code_article]
+                    emplacement = max(candidats)[1] if candidats else EMPLACEMENT_DEFAUT
+                disponible = stock.get((code_article, emplacement), 0)
+                if disponible < quantite:
+                    resultat["message"] = (f"Stock insuffisant à {emplacement} : {disponible} "
+                                           f"disponible(s), {quantite} demandé(s)")
+                    continue
+                stock[(code_article, emplacement)] = disponible - quantite
+                if type_mvt == TRANSFERT:
+                    stock[(code_article, destination)] = stock.get((code_article, destination), 0) + quantite
+                else:
+                    articles[code_article] -= quantite
+                    destination = None
+            resultat["succes"] = True
+            resultat["message"] = "Mouvement enregistré"
+            acceptees.append((type_mvt, code_article, quantite, emplacement, destination))
+        return resultats, acceptees
+
+    def reserver(self, code_article, quantite, reference=None, duree=DUREE_RESERVATION, user_id=None):
+        """Réserve une quantité pour une commande et retourne (succès, message, id).
+
+        La réservation n'est acceptée que si le disponible de l'article (stock
+        moins réservations actives) la couvre ; le contrôle et l'insertion forment
+        une seule instruction sous verrou d'écriture.
+        """
+        if quantite <= 0:
+            return False, "La quantité doit être supérieure à 0", None
+        maintenant = datetime.now()
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expirer(conn, maintenant)
+                cursor = conn.execute("""
+                    INSERT INTO Reservations (code_article, quantite, reference, statut,
+                                              date_creation, date_expiration, user_id)
+                    SELECT code_article, :quantite, :reference, :statut, :maintenant, :expiration, :user_id
+                    FROM StockSolde
+                    WHERE code_article = :code AND quantite - quantite_reservee >= :quantite
+                """, {"quantite": quantite, "reference": reference, "statut": RESERVATION_ACTIVE,
+                      "maintenant": maintenant, "expiration": maintenant + duree, "user_id": user_id,
+                      "code": code_article})
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False, self._motif_refus(conn, code_article, quantite), None
+                reservation_id = cursor.lastrowid
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True, "Réservation enregistrée", reservation_id
+
+    def convertir_reservation(self, reservation_id, user_id=None, emplacement=None):
+        """Transforme une réservation active en sortie de stock ; retourne (succès, message)"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expirer(conn, datetime.now())
+                reservation = conn.execute(
+                    "SELECT code_article, quantite, statut FROM Reservations WHERE id = ?", (reservation_id,)
+                ).fetchone()
+                if reservation is None or reservation["statut"] != RESERVATION_ACTIVE:
+                    conn.rollback()
+                    return False, self._motif_reservation(conn, reservation_id)
+                # Libère d'abord la quantité réservée (trigger), puis l'enregistre en sortie
+                self._cloturer(conn, reservation_id, RESERVATION_CONVERTIE)
+                if not self._inserer_sortie(conn, reservation["code_article"], reservation["quantite"],
+                                            user_id, emplacement):
+                    conn.rollback()
+                    return False, self._motif_refus(conn, reservation["code_article"],
+                                                    reservation["quantite"], emplacement)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True, "Réservation convertie en sortie de stock"
+
+    def annuler_reservation(self, reservation_id):
+        """Libère une réservation active ; retourne (succès, message)"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._cloturer(conn, reservation_id, RESERVATION_ANNULEE):
+                    conn.rollback()
+                    return False, self._motif_reservation(conn, reservation_id)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True, "Réservation annulée"
+
+    def expirer_reservations(self):
+        """Libère les réservations arrivées à échéance et retourne leur nombre"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                nombre = self._expirer(conn, datetime.now())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return nombre
+
+    def disponible(self, code_article):
+        """Retourne la quantité encore promettable d'un article (stock moins réservations)"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT quantite - quantite_reservee FROM StockSolde WHERE code_article = ?", (code_article,)
+            ).fetchone()
+            return row[0] if row else 0
+
+    def reservations_actives(self, code_article=None):
+        """Liste les réservations actives, éventuellement pour un seul article"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT * FROM Reservations
+                WHERE statut = ? AND (? IS NULL OR code_article = ?)
+                ORDER BY date_expiration
+            """, (RESERVATION_ACTIVE, code_article, code_article)).fetchall()
+            return [dict(row) for row in rows]
+
+    def _cloturer(self, conn, reservation_id, statut):
+        """Clôt une réservation active ; le trigger libère sa quantité"""
+        cursor = conn.execute("""
+            UPDATE Reservations SET statut = ?, date_cloture = ?
+            WHERE id = ? AND statut = ?
+        """, (statut, datetime.now(), reservation_id, RESERVATION_ACTIVE))
+        return cursor.rowcount > 0
+
+    def _expirer(self, conn, maintenant):
+        cursor = conn.execute("""
+            UPDATE Reservations SET statut = ?, date_cloture = ?
+            WHERE statut = ? AND date_expiration <= ?
+        """, (RESERVATION_EXPIREE, maintenant, RESERVATION_ACTIVE, maintenant))
+        return cursor.rowcount
+
+    def _motif_reservation(self, conn, reservation_id):
+        row = conn.execute("SELECT statut FROM Reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if row is None:
+            return f"La réservation n°{reservation_id} n'existe pas"
+        return f"La réservation n°{reservation_id} n'est plus active (statut : {row['statut']})"
+
+    def emplacements(self):
+        """Retourne la liste des emplacements connus, triée"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT emplacement FROM Stock
+                UNION
+                SELECT ?
+                ORDER BY 1
+            """, (EMPLACEMENT_DEFAUT,)).fetchall()
+            return [row[0] for row in rows]
+
+    def stock_emplacement(self, emplacement):
+        """Retourne le stock d'un emplacement, article par article"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT s.code_article, a.designation, s.quantite, a.seuil_alerte
+                FROM Stock s
+                JOIN Articles a ON a.code_article = s.code_article
+                WHERE s.emplacement = ? AND s.quantite != 0
+                ORDER BY a.designation
+            """, (emplacement,)).fetchall()
+            return [dict(row) for row in rows]
+
+    def stock_au(self, instant, code_article=None):
+        """Retourne {code_article: quantité} à une date donnée (instantané + mouvements)"""
+        with self.db.get_connection() as conn:
+            return balances_as_of(conn, instant, code_article)
+
+    def instantane_periodique(self):
+        """Prend un instantané des soldes si le dernier est trop ancien"""
+        with self.db.get_connection() as conn:
+            return snapshot_if_due(conn)
+
+    def verifier_alertes(self):
+        """Retourne les articles en alerte (table Alertes, tenue à jour par trigger)"""
+        return AlertManager(self.db.db_name).alertes_ouvertes()
 
     def historique_mouvements(self, date_debut=None, date_fin=None):
         with self.db.get_connection() as conn:
@@ -55,3 +432,24 @@ class StockManager:
                 params = [date_debut, date_fin]
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
+
+    def reconstruire_soldes(self):
+        """Recalcule soldes, stock par emplacement et indicateurs en rejouant le registre des mouvements"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rebuild_balances(conn)
+                rebuild_reservations(conn)
+                rebuild_stock(conn)
+                rebuild_statistics(conn)
+                # Soldes réécrits hors des triggers : les résultats en cache sont périmés
+                signaler_modification(conn, "Mouvements")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def verifier_soldes(self):
+        """Retourne les écarts entre le registre des mouvements et ses projections"""
+        with self.db.get_connection() as conn:
+            return verify_balances(conn) + verify_stock(conn) + verify_reservations(conn)
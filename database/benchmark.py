@@ -0,0 +1,1383 @@
+# database/benchmark.py
+"""Mesures de performance de la couche base de données.
+
+Usage : python -m database.benchmark <commande> [options]
+Chaque commande travaille sur une base temporaire, jamais sur stock_app.db.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from database.db import Database
+
+
+def _base_temporaire():
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_stock_")
+    os.close(fd)
+    return path
+
+
+def _supprimer_base(path):
+    Database.close_all()
+    for suffixe in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffixe)
+        except OSError:
+            pass
+
+
+def _chronometre(fonction, iterations):
+    debut = time.perf_counter()
+    for i in range(iterations):
+        fonction(i)
+    duree = time.perf_counter() - debut
+    return duree, duree / iterations * 1_000_000
+
+
+def _charger_mouvements(conn, lignes):
+    """Charge en masse des mouvements (type, code, quantité, date) puis recalcule les projections.
+
+    Les triggers du registre sont retirés le temps du chargement et recréés à
+    l'identique : les soldes, le stock et les cumuls sont ensuite reconstruits
+    en une passe, comme le ferait ``python -m database.ledger reconstruire``.
+    """
+    from database.ledger import rebuild_balances, rebuild_rollups, rebuild_stock
+
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'Mouvements'"
+    ).fetchall()
+    for nom, _ in triggers:
+        conn.execute(f"DROP TRIGGER {nom}")
+    conn.executemany("INSERT INTO Mouvements (type, code_article, quantite, date_mvt) VALUES (?, ?, ?, ?)", lignes)
+    for _, sql in triggers:
+        conn.execute(sql)
+    rebuild_balances(conn)
+    rebuild_stock(conn)
+    rebuild_rollups(conn)
+    conn.commit()
+
+
+def bench_pool(iterations=5000):
+    """Compare une connexion neuve par opération et le pool partagé"""
+    path = _base_temporaire()
+    try:
+        db = Database(path)
+        db.initialize()
+        with db.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES ('B001', 'Article bench', 'Divers', 1.0, 2.0, 5)
+            """)
+            conn.commit()
+
+        requete = "SELECT * FROM Articles WHERE code_article = ?"
+
+        def sans_pool(_):
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            try:
+                conn.execute(requete, ("B001",)).fetchone()
+            finally:
+                conn.close()
+
+        def avec_pool(_):
+            with db.get_connection() as conn:
+                conn.execute(requete, ("B001",)).fetchone()
+
+        duree_sans, unitaire_sans = _chronometre(sans_pool, iterations)
+        duree_avec, unitaire_avec = _chronometre(avec_pool, iterations)
+
+        print(f"Lecture par clé primaire, {iterations} opérations")
+        print(f"  connexion neuve : {duree_sans:.3f}s ({unitaire_sans:.1f} µs/op)")
+        print(f"  pool partagé    : {duree_avec:.3f}s ({unitaire_avec:.1f} µs/op)")
+        print(f"  gain            : x{duree_sans / duree_avec:.1f}")
+        print(f"  statistiques du pool : {db.pool_stats()}")
+    finally:
+        _supprimer_base(path)
+
+
+def bench_sortie_concurrente(iterations=2000, postes=16, stock_initial=500):
+    """Sorties concurrentes d'un même article : vérifie l'absence de survente"""
+    from core.stock_manager import StockManager
+    from database.ledger import verify_balances
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, pool_size=postes)
+        db.initialize()
+        stock = StockManager(path)
+        with db.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES ('S001', 'Article stress', 'Divers', 1.0, 2.0, 5)
+            """)
+            conn.commit()
+        stock.ajouter_stock("S001", stock_initial, "Magasin")
+
+        resultats = {"acceptees": 0, "refusees": 0, "erreurs": 0}
+        verrou = threading.Lock()
+        depart = threading.Barrier(postes)
+
+        def poste(tentatives):
+            depart.wait()
+            for _ in range(tentatives):
+                try:
+                    succes, _ = stock.sortie_stock("S001", 1)
+                    cle = "acceptees" if succes else "refusees"
+                except Exception:
+                    cle = "erreurs"
+                with verrou:
+                    resultats[cle] += 1
+
+        threads = [threading.Thread(target=poste, args=(iterations // postes,)) for _ in range(postes)]
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duree = time.perf_counter() - debut
+
+        with db.get_connection() as conn:
+            solde = conn.execute("SELECT quantite FROM StockSolde WHERE code_article = 'S001'").fetchone()[0]
+            stock_lignes = conn.execute("SELECT SUM(quantite) FROM Stock WHERE code_article = 'S001'").fetchone()[0]
+            sorties = conn.execute(
+                "SELECT COUNT(*) FROM Mouvements WHERE code_article = 'S001' AND type = 'sortie'"
+            ).fetchone()[0]
+            ecarts = verify_balances(conn)
+
+        tentatives = postes * (iterations // postes)
+        print(f"Sorties concurrentes : {postes} postes, {tentatives} tentatives, stock initial {stock_initial}")
+        print(f"  durée           : {duree:.3f}s ({tentatives / duree:.0f} sorties/s)")
+        print(f"  acceptées       : {resultats['acceptees']}")
+        print(f"  refusées        : {resultats['refusees']}")
+        print(f"  erreurs         : {resultats['erreurs']}")
+        print(f"  solde final     : {solde} (Stock : {stock_lignes}, mouvements de sortie : {sorties})")
+        attendu = max(stock_initial - resultats["acceptees"], 0)
+        if (solde < 0 or solde != attendu or stock_lignes != solde
+                or sorties != resultats["acceptees"] or ecarts):
+            print("ÉCHEC : survente ou incohérence entre solde et registre")
+            raise SystemExit(1)
+        print("Aucune survente : le solde correspond au registre.")
+    finally:
+        _supprimer_base(path)
+
+
+def _memoire_export(path, mode, lignes, fichier):
+    """Exécuté dans un processus neuf : exporte ``lignes`` mouvements et retourne (secondes, pic de mémoire en Mo)"""
+    import resource
+    from core.export_manager import ExportManager, JEUX_EXPORT
+
+    manager = ExportManager(path)
+    debut = time.perf_counter()
+    if mode == "flux":
+        manager.export_excel("mouvements", fichier, where="m.id <= ?", params=(lignes,))
+    else:
+        # Comme l'export d'origine : tout le résultat en mémoire, puis un classeur complet
+        from openpyxl import Workbook
+        jeu = JEUX_EXPORT["mouvements"]
+        colonnes = jeu.selection()
+        with manager.db.get_connection() as conn:
+            resultat = conn.execute(jeu.requete(colonnes, "m.id <= ?"), (lignes,)).fetchall()
+        classeur = Workbook()
+        feuille = classeur.active
+        feuille.append([colonne.titre for colonne in colonnes])
+        for ligne in resultat:
+            feuille.append(list(ligne))
+        classeur.save(fichier)
+    duree = time.perf_counter() - debut
+    # ru_maxrss est en kio sous Linux
+    return duree, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_etiquettes(articles=5_000, modifies=50):
+    """Étiquettes Code128 du catalogue : rendu et UPDATE article par article contre generation_code (pool, empreintes)"""
+    import shutil
+    import barcode
+    from barcode.writer import ImageWriter
+    from database.generation_code import generer_codes_barres
+
+    path = _base_temporaire()
+    dossiers = {nom: f"{path}.{nom}" for nom in ("origine", "masse")}
+    try:
+        db = Database(path)
+        db.initialize()
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"A{i:05d}", f"Article {i}") for i in range(articles)])
+            conn.commit()
+
+        # Script d'origine : une image puis un UPDATE par article
+        os.makedirs(dossiers["origine"])
+        chrono = time.perf_counter()
+        with db.get_connection() as conn:
+            for (code_article,) in conn.execute("SELECT code_article FROM Articles").fetchall():
+                filename = barcode.get("code128", code_article, writer=ImageWriter()).save(
+                    os.path.join(dossiers["origine"], code_article))
+                conn.execute("UPDATE Articles SET code_barre = ? WHERE code_article = ?", (filename, code_article))
+            conn.commit()
+        origine = time.perf_counter() - chrono
+        print(f"Étiquettes de {articles} articles ({os.cpu_count()} cœurs) :")
+        print(f"  {'mode':<38} {'durée':>8} {'articles/s':>11} {'dessinées':>10} {'écrites':>8}")
+        print(f"  {'origine (séquentiel, UPDATE unitaires)':<38} {origine:>6.1f} s {articles / origine:>11,.0f} "
+              f"{articles:>10} {articles:>8}")
+
+        def mesurer(libelle, **options):
+            compteurs = generer_codes_barres(path, dossiers["masse"], **options)
+            print(f"  {libelle:<38} {compteurs['duree']:>6.1f} s {articles / compteurs['duree']:>11,.0f} "
+                  f"{compteurs['dessinees']:>10} {compteurs['reecrites']:>8}")
+            return compteurs
+
+        coherent = True
+        paliers = sorted({1, 2, 4, os.cpu_count() or 1})
+        for processus in paliers:
+            compteurs = mesurer(f"complet, {processus} processus", processus=processus, tout=True)
+            coherent = coherent and compteurs["dessinees"] == articles
+        # Relance : toutes les empreintes sont à jour, rien n'est dessiné
+        compteurs = mesurer("relance sans changement")
+        coherent = coherent and compteurs["dessinees"] == 0 and compteurs["inchangees"] == articles
+        # Quelques étiquettes périmées ou effacées : seules celles-là sont redessinées
+        with db.get_connection() as conn:
+            codes = [row[0] for row in conn.execute("SELECT code_article FROM Articles ORDER BY code_article LIMIT ?",
+                                                     (2 * modifies,))]
+            conn.executemany("UPDATE Articles SET empreinte_code_barre = NULL WHERE code_article = ?",
+                             [(code,) for code in codes[:modifies]])
+            conn.commit()
+        for code in codes[modifies:]:
+            os.remove(os.path.join(dossiers["masse"], f"{code}.png"))
+        compteurs = mesurer(f"{modifies} périmées, {modifies} effacées")
+        coherent = coherent and compteurs["dessinees"] == 2 * modifies and compteurs["reecrites"] == modifies
+
+        # Les images sont celles du script d'origine, octet pour octet
+        for code in codes[:10]:
+            with open(os.path.join(dossiers["origine"], f"{code}.png"), "rb") as a, \
+                    open(os.path.join(dossiers["masse"], f"{code}.png"), "rb") as b:
+                coherent = coherent and a.read() == b.read()
+        if not coherent:
+            print("ÉCHEC : étiquettes dessinées, ignorées ou écrites inattendues")
+            raise SystemExit(1)
+    finally:
+        for dossier in dossiers.values():
+            shutil.rmtree(dossier, ignore_errors=True)
+        _supprimer_base(path)
+
+
+def bench_export_excel(mouvements=1_000_000, articles=1_000, marge_mo=16):
+    """Export Excel de l'historique : classeur complet en mémoire contre ExportManager en écriture seule"""
+    import multiprocessing
+    import random
+    from concurrent.futures import ProcessPoolExecutor
+    from datetime import datetime, timedelta
+
+    path = _base_temporaire()
+    fichier = path + ".xlsx"
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(21)
+        debut = datetime(2024, 1, 1)
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"A{i:05d}", f"Article {i}") for i in range(articles)])
+            _charger_mouvements(conn, ((aleatoire.choice(("entrée", "entrée", "sortie")),
+                                        f"A{aleatoire.randrange(articles):05d}", aleatoire.randint(1, 20),
+                                        debut + timedelta(seconds=30 * i)) for i in range(mouvements)))
+        Database.close_all()
+
+        # Chaque mesure dans un processus neuf : le pic de mémoire est celui de l'export seul
+        # (modules chargés, cache SQLite et mmap du profil compris)
+        contexte = multiprocessing.get_context("spawn")
+        print(f"Export Excel de l'historique des mouvements ({mouvements} lignes au total) :")
+        print(f"  {'lignes':>9} {'mode':<22} {'durée':>9} {'pic mémoire':>12}")
+        pics = []
+        for mode, lignes in (("memoire", 50_000), ("flux", 50_000), ("flux", mouvements)):
+            with ProcessPoolExecutor(1, mp_context=contexte) as processus:
+                duree, pic = processus.submit(_memoire_export, path, mode, lignes, fichier).result()
+            if mode == "flux":
+                pics.append(pic)
+            libelle = "classeur en mémoire" if mode == "memoire" else "écriture seule"
+            print(f"  {lignes:>9} {libelle:<22} {duree:>7.1f} s {pic:>9.1f} Mo "
+                  f"({min(lignes, mouvements) / duree:,.0f} lignes/s)")
+        # Le plafond ne doit pas dépendre du volume exporté
+        if pics[1] - pics[0] > marge_mo:
+            print(f"ÉCHEC : la mémoire de l'export en écriture seule croît avec le volume (+{pics[1] - pics[0]:.1f} Mo)")
+            raise SystemExit(1)
+    finally:
+        try:
+            os.remove(fichier)
+        except OSError:
+            pass
+        _supprimer_base(path)
+
+
+def bench_export_fichiers(mouvements=1_000_000, articles=1_000, nouveaux=2_000):
+    """Export nocturne du registre : CSV et Parquet complets, puis incrémentaux (seules les lignes nouvelles)"""
+    import csv
+    import random
+    from datetime import datetime, timedelta
+    from core.export_manager import ExportManager
+
+    path = _base_temporaire()
+    fichiers = {"csv": path + ".csv", "parquet": path + ".parquet"}
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(23)
+        debut = datetime(2024, 1, 1)
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"A{i:05d}", f"Article {i}") for i in range(articles)])
+            _charger_mouvements(conn, ((aleatoire.choice(("entrée", "entrée", "sortie")),
+                                        f"A{aleatoire.randrange(articles):05d}", aleatoire.randint(1, 20),
+                                        debut + timedelta(seconds=30 * i)) for i in range(mouvements)))
+
+        manager = ExportManager(path)
+        try:
+            import pyarrow.parquet as pq
+            formats = {"csv": manager.export_csv, "parquet": manager.export_parquet}
+        except ImportError:
+            print("pyarrow absent : Parquet non mesuré.")
+            formats = {"csv": manager.export_csv}
+
+        def relire(format_):
+            if format_ == "csv":
+                with open(fichiers["csv"], newline="", encoding="utf-8") as fichier:
+                    return sum(1 for _ in csv.reader(fichier)) - 1
+            return pq.read_table(fichiers["parquet"]).num_rows
+
+        print(f"Export du registre ({mouvements} mouvements) :")
+        print(f"  {'format':<8} {'complet':>9} {'relecture':>10} {'taille':>9} {'incrémental':>12} {'lignes':>8}")
+        coherent = True
+        enregistres = mouvements
+        for format_, exporter in formats.items():
+            chrono = time.perf_counter()
+            lignes = exporter("mouvements", fichiers[format_], depuis=f"nuit_{format_}")
+            complet = time.perf_counter() - chrono
+            chrono = time.perf_counter()
+            relues = relire(format_)
+            relecture = time.perf_counter() - chrono
+            taille = os.path.getsize(fichiers[format_]) / 1_000_000
+
+            # Journée suivante : seules les lignes enregistrées depuis sont exportées
+            with db.get_connection() as conn:
+                conn.executemany("INSERT INTO Mouvements (type, code_article, quantite, date_mvt) VALUES ('sortie', ?, 1, ?)",
+                                 ((f"A{aleatoire.randrange(articles):05d}", datetime.now()) for _ in range(nouveaux)))
+                conn.commit()
+            enregistres += nouveaux
+            chrono = time.perf_counter()
+            increment = exporter("mouvements", fichiers[format_], depuis=f"nuit_{format_}")
+            incremental = time.perf_counter() - chrono
+            coherent = (coherent and lignes == relues == enregistres - nouveaux
+                        and increment == nouveaux and relire(format_) == nouveaux)
+            print(f"  {format_:<8} {complet:>7.2f} s {relecture:>8.2f} s {taille:>6.1f} Mo {incremental * 1000:>9.0f} ms "
+                  f"{increment:>8}")
+        if not coherent:
+            print("ÉCHEC : lignes exportées ou relues inattendues")
+            raise SystemExit(1)
+    finally:
+        for fichier in fichiers.values():
+            try:
+                os.remove(fichier)
+            except OSError:
+                pass
+        _supprimer_base(path)
+
+
+def bench_exports_concurrents(mouvements=200_000, articles=1_000, intervalle_ms=20):
+    """Exports en arrière-plan (ExportJobs) pendant la saisie de mouvements : latence, progression, annulation"""
+    import csv
+    import random
+    import statistics
+    from datetime import datetime, timedelta
+    from core.export_jobs import ACTIFS, ANNULEE, EN_COURS, TERMINEE, ExportJobs, pourcentage
+    from core.stock_manager import StockManager
+
+    path = _base_temporaire()
+    fichiers = {nom: f"{path}.{nom}" for nom in ("pdf", "xlsx", "csv", "parquet")}
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(24)
+        debut = datetime(2024, 1, 1)
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"A{i:05d}", f"Article {i}") for i in range(articles)])
+            _charger_mouvements(conn, ((aleatoire.choice(("entrée", "entrée", "sortie")),
+                                        f"A{aleatoire.randrange(articles):05d}", aleatoire.randint(1, 20),
+                                        debut + timedelta(seconds=30 * i)) for i in range(mouvements)))
+
+        stock = StockManager(path)
+
+        def saisir():
+            chrono = time.perf_counter()
+            succes, message = stock.ajouter_stock(f"A{aleatoire.randrange(articles):05d}", 1)
+            if not succes:
+                raise RuntimeError(message)
+            return (time.perf_counter() - chrono) * 1000
+
+        def resume(latences):
+            latences = sorted(latences)
+            return (f"médiane {statistics.median(latences):6.2f} ms, p95 {latences[int(len(latences) * 0.95)]:6.2f} ms, "
+                    f"max {latences[-1]:7.2f} ms")
+
+        reference = [saisir() for _ in range(200)]
+        print(f"Saisie d'une entrée de stock sans export : {resume(reference)}")
+
+        jobs = ExportJobs(path)
+        soumissions = [("pdf", "pdf", {}), ("excel", "xlsx", {}), ("csv", "csv", {}), ("parquet", "parquet", {})]
+        taches = {}
+        for format_, extension, options in soumissions:
+            succes, message, tache_id = jobs.soumettre("mouvements", format_, fichiers[extension], **options)
+            if not succes:
+                print(f"ÉCHEC : {message}")
+                raise SystemExit(1)
+            taches[tache_id] = format_
+        annulee = next(tache_id for tache_id, format_ in taches.items() if format_ == "excel")
+
+        # Saisie continue pendant les exports ; l'état des tâches est relu comme le fait l'interface
+        chrono = time.perf_counter()
+        pendant, progressions, demande = [], {tache_id: [] for tache_id in taches}, False
+        prochain_releve = 0.0
+        while True:
+            pendant.append(saisir())
+            time.sleep(intervalle_ms / 1000)
+            if time.perf_counter() < prochain_releve:
+                continue
+            prochain_releve = time.perf_counter() + 0.5
+            etats = {tache["id"]: tache for tache in jobs.taches()}
+            for tache_id in taches:
+                if etats[tache_id]["statut"] == EN_COURS:
+                    progressions[tache_id].append(pourcentage(etats[tache_id]) or 0.0)
+            # L'export Excel est annulé en cours de route
+            if not demande and etats[annulee]["statut"] == EN_COURS and etats[annulee]["lignes"]:
+                demande = jobs.annuler(annulee)[0]
+            if all(etats[tache_id]["statut"] not in ACTIFS for tache_id in taches):
+                break
+        duree = time.perf_counter() - chrono
+        ExportJobs.arreter()
+        print(f"Saisie pendant {len(taches)} exports simultanés ({duree:.1f} s) : {resume(pendant)}")
+
+        print(f"  {'n°':>3} {'format':<8} {'statut':<10} {'durée':>8} {'relevés':>8}  résultat")
+        coherent = demande
+        for tache_id, format_ in taches.items():
+            tache = jobs.tache(tache_id)
+            ecoulee = (datetime.fromisoformat(tache["date_fin"]) - datetime.fromisoformat(tache["date_debut"])).total_seconds()
+            releves = progressions[tache_id]
+            print(f"  {tache_id:>3} {format_:<8} {tache['statut']:<10} {ecoulee:>6.1f} s {len(releves):>8}  {tache['message']}")
+            fichier = tache["fichier"]
+            provisoires = [nom for nom in os.listdir(os.path.dirname(fichier))
+                           if nom.startswith(os.path.basename(path)) and ".tache" in nom]
+            if tache_id == annulee:
+                coherent = coherent and tache["statut"] == ANNULEE and not os.path.exists(fichier)
+            else:
+                coherent = coherent and tache["statut"] == TERMINEE and os.path.exists(fichier)
+                coherent = coherent and releves == sorted(releves)
+            coherent = coherent and not provisoires
+        with open(fichiers["csv"], newline="", encoding="utf-8") as fichier:
+            exportees = sum(1 for _ in csv.reader(fichier)) - 1
+        # Les entrées saisies avant la soumission sont exportées, celles saisies pendant ne le sont pas forcément
+        coherent = coherent and mouvements + len(reference) <= exportees <= mouvements + len(reference) + len(pendant)
+        if not coherent:
+            print("ÉCHEC : statut, progression ou fichier d'export inattendu")
+            raise SystemExit(1)
+    finally:
+        for fichier in fichiers.values():
+            try:
+                os.remove(fichier)
+            except OSError:
+                pass
+        _supprimer_base(path)
+
+
+def bench_lot(iterations=300):
+    """Compare une réception ligne par ligne et la même réception en un seul document"""
+    from core.stock_manager import StockManager
+
+    path = _base_temporaire()
+    try:
+        db = Database(path)
+        db.initialize()
+        stock = StockManager(path)
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"L{i:05d}", f"Article {i}") for i in range(iterations)])
+            conn.commit()
+        lignes = [{"type": "entrée", "code_article": f"L{i:05d}", "quantite": 10, "emplacement": "Magasin"}
+                  for i in range(iterations)]
+
+        debut = time.perf_counter()
+        for ligne in lignes:
+            stock.ajouter_stock(ligne["code_article"], ligne["quantite"], ligne["emplacement"])
+        duree_unitaire = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        succes, resultats = stock.apply_movements(lignes)
+        duree_lot = time.perf_counter() - debut
+        if not succes:
+            raise SystemExit(f"Document refusé : {[r for r in resultats if not r['succes']][:3]}")
+
+        print(f"Réception de {iterations} lignes (profil {db.profile})")
+        print(f"  ligne par ligne : {duree_unitaire:.3f}s")
+        print(f"  un seul document : {duree_lot:.3f}s")
+        print(f"  gain            : x{duree_unitaire / duree_lot:.1f}")
+    finally:
+        _supprimer_base(path)
+
+
+def bench_stock_au(iterations=200000, articles=200, annees=3):
+    """Stock à une date : instantané + mouvements contre relecture de tout l'historique"""
+    import random
+    from datetime import datetime, timedelta
+    from database.ledger import INTERVALLE_INSTANTANES, balances_as_of, signed_quantity, take_snapshot
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(42)
+        fin = datetime.now().replace(microsecond=0)
+        debut = fin - timedelta(days=365 * annees)
+        pas = (fin - debut) / iterations
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"H{i:04d}", f"Article {i}") for i in range(articles)])
+            conn.executemany("""
+                INSERT INTO Mouvements (type, code_article, quantite, date_mvt)
+                VALUES (?, ?, ?, ?)
+            """, ((aleatoire.choice(("entrée", "entrée", "sortie")), f"H{aleatoire.randrange(articles):04d}",
+                   aleatoire.randint(1, 20), debut + pas * i) for i in range(iterations)))
+            instant = debut + INTERVALLE_INSTANTANES
+            nb_instantanes = 0
+            while instant < fin:
+                take_snapshot(conn, instant)
+                instant += INTERVALLE_INSTANTANES
+                nb_instantanes += 1
+            conn.commit()
+
+            dates = [debut + (fin - debut) * aleatoire.random() for _ in range(50)]
+            def relecture(i):
+                conn.execute(f"""
+                    SELECT m.code_article, SUM({signed_quantity('m')})
+                    FROM Mouvements m NOT INDEXED
+                    WHERE m.date_mvt < ?
+                    GROUP BY m.code_article
+                """, (dates[i % len(dates)],)).fetchall()
+
+            def instantane_article(i):
+                balances_as_of(conn, dates[i % len(dates)], "H0007")
+
+            def instantane_tous(i):
+                balances_as_of(conn, dates[i % len(dates)])
+
+            _, unitaire_relecture = _chronometre(relecture, 10)
+            _, unitaire_article = _chronometre(instantane_article, 200)
+            _, unitaire_tous = _chronometre(instantane_tous, 50)
+            attendu = conn.execute(f"""
+                SELECT m.code_article, SUM({signed_quantity('m')}) FROM Mouvements m
+                WHERE m.date_mvt < ? GROUP BY m.code_article
+            """, (dates[0],)).fetchall()
+            obtenu = balances_as_of(conn, dates[0])
+            coherent = all(obtenu.get(code, 0) == quantite for code, quantite in attendu)
+            coherent = coherent and all(
+                balances_as_of(conn, dates[0], code).get(code, 0) == quantite for code, quantite in attendu
+            )
+
+        print(f"Stock à une date : {iterations} mouvements sur {annees} ans, {articles} articles, "
+              f"{nb_instantanes} instantanés")
+        print(f"  relecture complète      : {unitaire_relecture / 1000:.2f} ms")
+        print(f"  instantané, un article  : {unitaire_article / 1000:.2f} ms")
+        print(f"  instantané, tout le stock : {unitaire_tous / 1000:.2f} ms")
+        if not coherent:
+            print("ÉCHEC : les soldes à la date diffèrent de la relecture du registre")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+
+def bench_cumuls(iterations=200000, articles=500):
+    """Articles les plus vendus et synthèse d'un mois : registre brut contre cumuls journaliers"""
+    import random
+    from datetime import datetime, timedelta
+    from database.ledger import verify_rollups
+    from reporting import report_manager
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(7)
+        fin = datetime.now().replace(microsecond=0)
+        debut = fin - timedelta(days=365)
+        pas = (fin - debut) / iterations
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"V{i:04d}", f"Article {i}") for i in range(articles)])
+            conn.executemany("""
+                INSERT INTO Mouvements (type, code_article, quantite, date_mvt)
+                VALUES (?, ?, ?, ?)
+            """, ((aleatoire.choice(("entrée", "sortie", "sortie")), f"V{aleatoire.randrange(articles):04d}",
+                   aleatoire.randint(1, 20), debut + pas * i) for i in range(iterations)))
+            conn.commit()
+            jours = conn.execute("SELECT COUNT(*) FROM MouvementsJour").fetchone()[0]
+
+            mois_debut = (fin - timedelta(days=30)).strftime("%Y-%m-%d")
+            mois_fin = fin.strftime("%Y-%m-%d")
+
+            def plus_vendus_brut(_):
+                return conn.execute("""
+                    SELECT m.code_article, a.designation, SUM(m.quantite) AS total_vendu
+                    FROM Mouvements m
+                    JOIN Articles a ON m.code_article = a.code_article
+                    WHERE m.type = 'sortie'
+                    GROUP BY m.code_article
+                    ORDER BY total_vendu DESC
+                    LIMIT 10
+                """).fetchall()
+
+            def plus_vendus_cumuls(_):
+                return report_manager.get_articles_plus_vendus(conn)
+
+            def periode_brut(_):
+                return conn.execute("""
+                    SELECT DATE(date_mvt) AS jour, COUNT(*), SUM(quantite)
+                    FROM Mouvements
+                    WHERE date_mvt >= ? AND date_mvt < DATE(?, '+1 day')
+                    GROUP BY jour
+                """, (mois_debut, mois_fin)).fetchall()
+
+            def periode_cumuls(_):
+                return report_manager.get_mouvements_par_jour(conn, mois_debut, mois_fin)
+
+            _, unitaire_brut = _chronometre(plus_vendus_brut, 10)
+            _, unitaire_cumuls = _chronometre(plus_vendus_cumuls, 10)
+            _, unitaire_periode_brut = _chronometre(periode_brut, 20)
+            _, unitaire_periode_cumuls = _chronometre(periode_cumuls, 20)
+
+            attendu = [(row[0], row[2]) for row in plus_vendus_brut(0)]
+            obtenu = [(row[2], row[1]) for row in plus_vendus_cumuls(0)]
+            coherent = attendu == obtenu and not verify_rollups(conn)
+
+        print(f"Cumuls journaliers : {iterations} mouvements sur un an, {articles} articles, "
+              f"{jours} lignes de cumul")
+        print(f"  plus vendus, registre : {unitaire_brut / 1000:.2f} ms")
+        print(f"  plus vendus, cumuls   : {unitaire_cumuls / 1000:.2f} ms "
+              f"({unitaire_brut / unitaire_cumuls:.1f}x)")
+        print(f"  synthèse d'un mois, registre : {unitaire_periode_brut / 1000:.2f} ms")
+        print(f"  synthèse d'un mois, cumuls   : {unitaire_periode_cumuls / 1000:.2f} ms "
+              f"({unitaire_periode_brut / unitaire_periode_cumuls:.1f}x)")
+        if not coherent:
+            print("ÉCHEC : les cumuls journaliers diffèrent du registre")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+
+def bench_cache(iterations=1000, mouvements=100000, articles=500):
+    """Rafraîchissement des indicateurs du tableau de bord : requêtes directes contre QueryCache"""
+    import random
+    from datetime import date, datetime, timedelta
+    from database.query_cache import QueryCache
+    from reporting import report_manager
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(3)
+        fin = datetime.now().replace(microsecond=0)
+        pas = timedelta(days=365) / mouvements
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"C{i:04d}", f"Article {i}") for i in range(articles)])
+            conn.executemany("""
+                INSERT INTO Mouvements (type, code_article, quantite, date_mvt)
+                VALUES (?, ?, ?, ?)
+            """, ((aleatoire.choice(("entrée", "entrée", "sortie")), f"C{aleatoire.randrange(articles):04d}",
+                   aleatoire.randint(1, 20), fin - pas * i) for i in range(mouvements)))
+            conn.commit()
+
+        aujourdhui = date.today().isoformat()
+        # Indicateurs du tableau de bord (MainUI.get_stats_data) et tables dont ils dépendent
+        indicateurs = [
+            ("SELECT COUNT(*) FROM Articles", (), ("Articles",)),
+            ("SELECT IFNULL(SUM(quantite), 0) FROM StockSolde", (), ("Mouvements",)),
+            ("SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL", (), ("Articles", "Mouvements")),
+            ("""SELECT IFNULL(SUM(IFNULL(s.quantite, 0) * a.prix_vente), 0)
+                FROM Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article""",
+             (), ("Articles", "Mouvements")),
+            ("SELECT IFNULL(SUM(nombre), 0) FROM MouvementsJour WHERE jour = ?", (aujourdhui,), ("Mouvements",)),
+            ("SELECT date_mvt FROM Mouvements ORDER BY date_mvt DESC LIMIT 1", (), ("Mouvements",)),
+        ]
+        cache = QueryCache(db)
+
+        def direct(_):
+            with db.get_connection() as conn:
+                return [conn.execute(sql, params).fetchone()[0] for sql, params, _ in indicateurs]
+
+        def en_cache(_):
+            return [cache.fetchone(sql, params, tables)[0] for sql, params, tables in indicateurs]
+
+        _, unitaire_direct = _chronometre(direct, iterations)
+        en_cache(0)
+        _, unitaire_cache = _chronometre(en_cache, iterations)
+        coherent = direct(0) == en_cache(0)
+
+        # Une sortie ne recalcule que les indicateurs lus dans le registre et ses projections
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO Mouvements (type, code_article, quantite, date_mvt) VALUES ('sortie', 'C0001', 1, ?)",
+                         (datetime.now(),))
+            conn.commit()
+        avant = cache.stats()["misses"]
+        coherent = coherent and direct(0) == en_cache(0)
+        recalculs_mouvement = cache.stats()["misses"] - avant
+        # Un changement de prix ne touche que les indicateurs lisant Articles
+        with db.get_connection() as conn:
+            conn.execute("UPDATE Articles SET prix_vente = 3.0 WHERE code_article = 'C0002'")
+            conn.commit()
+        avant = cache.stats()["misses"]
+        coherent = coherent and direct(0) == en_cache(0)
+        recalculs_article = cache.stats()["misses"] - avant
+
+        rapport = _chronometre(lambda _: cache.appel(report_manager.get_articles_plus_vendus), iterations)[1]
+        stats = cache.stats()
+        cache.fermer()
+
+        print(f"Indicateurs du tableau de bord : {len(indicateurs)} requêtes, {mouvements} mouvements")
+        print(f"  requêtes directes        : {unitaire_direct / 1000:.3f} ms par rafraîchissement")
+        print(f"  cache, base inchangée    : {unitaire_cache / 1000:.3f} ms par rafraîchissement "
+              f"({unitaire_direct / unitaire_cache:.0f}x)")
+        print(f"  après une sortie         : {recalculs_mouvement}/{len(indicateurs)} indicateurs recalculés")
+        print(f"  après un changement de prix : {recalculs_article}/{len(indicateurs)} indicateurs recalculés")
+        print(f"  articles les plus vendus en cache : {rapport / 1000:.3f} ms")
+        print(f"  lectures de VersionsTables : {stats['relectures']} pour {stats['verifications']} vérifications")
+        if not coherent:
+            print("ÉCHEC : un indicateur en cache diffère de la requête directe")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+
+def bench_stats(mouvements=5_000_000, articles=100_000, rafraichissements=10):
+    """Indicateurs du tableau de bord : six requêtes d'origine contre StatsManager (StatistiquesStock)"""
+    import random
+    from datetime import datetime, timedelta
+    from core.stats_manager import StatsManager
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(11)
+        fin = datetime.now().replace(microsecond=0)
+        pas = timedelta(days=730) / mouvements
+        debut_chargement = time.perf_counter()
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"T{i:06d}", f"Article {i}") for i in range(articles)])
+            _charger_mouvements(conn, ((aleatoire.choice(("entrée", "entrée", "sortie")),
+                                        f"T{aleatoire.randrange(articles):06d}", aleatoire.randint(1, 20),
+                                        fin - pas * i) for i in range(mouvements)))
+        chargement = time.perf_counter() - debut_chargement
+
+        # Rafraîchissement d'origine de MainUI.get_stats_data, sans cache
+        origine = [
+            "SELECT COUNT(*) FROM Articles",
+            "SELECT IFNULL(SUM(quantite), 0) FROM StockSolde",
+            "SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL",
+            """SELECT IFNULL(SUM(IFNULL(s.quantite, 0) * a.prix_vente), 0)
+               FROM Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article""",
+            "SELECT COUNT(*) FROM Mouvements WHERE date_mvt >= DATE('now', 'localtime') "
+            "AND date_mvt < DATE('now', 'localtime', '+1 day')",
+            "SELECT date_mvt FROM Mouvements ORDER BY date_mvt DESC LIMIT 1",
+        ]
+
+        def requetes_origine(_):
+            with db.get_connection() as conn:
+                return [conn.execute(sql).fetchone()[0] for sql in origine]
+
+        stats = StatsManager(path)
+
+        def service(_):
+            # Cache vidé : chaque rafraîchissement recalcule tout, comme après une écriture
+            stats.cache.invalider()
+            return stats.statistiques()
+
+        requetes_origine(0)
+        service(0)
+        _, unitaire_origine = _chronometre(requetes_origine, rafraichissements)
+        _, unitaire_service = _chronometre(service, rafraichissements)
+        _, unitaire_cache = _chronometre(lambda _: stats.statistiques(), rafraichissements)
+
+        attendu = requetes_origine(0)
+        obtenu = service(0)
+        obtenu["valeur_stock"] = round(obtenu["valeur_stock"], 2)
+        attendu[3] = round(attendu[3], 2)
+        coherent = [obtenu[cle] for cle in ("total_articles", "total_stock", "rupture_stock", "valeur_stock",
+                                             "mouvements_today", "last_activity")] == attendu
+        stats.cache.fermer()
+
+        print(f"Tableau de bord : {articles} articles, {mouvements} mouvements (chargés en {chargement:.0f}s)")
+        print(f"  six requêtes d'origine      : {unitaire_origine / 1000:.1f} ms par rafraîchissement")
+        print(f"  StatsManager, tout recalculé : {unitaire_service / 1000:.1f} ms "
+              f"({unitaire_origine / unitaire_service:.1f}x)")
+        print(f"  StatsManager, base inchangée : {unitaire_cache / 1000:.3f} ms")
+        if not coherent:
+            print(f"ÉCHEC : indicateurs différents ({obtenu} au lieu de {attendu})")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+
+def bench_pagination(mouvements=1_000_000, articles=10_000, iterations=200):
+    """Historique des mouvements : lecture complète d'origine contre pages lues par clé (PagedQuery)"""
+    import random
+    from datetime import datetime, timedelta
+    from database.pagination import PAGE_SIZE, PagedQuery
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(16)
+        fin = datetime.now().replace(microsecond=0)
+        pas = timedelta(days=730) / mouvements
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"P{i:05d}", f"Article {i}") for i in range(articles)])
+            _charger_mouvements(conn, ((aleatoire.choice(("entrée", "sortie")),
+                                        f"P{aleatoire.randrange(articles):05d}", aleatoire.randint(1, 20),
+                                        (fin - pas * i).strftime("%Y-%m-%d %H:%M:%S")) for i in range(mouvements)))
+
+        # Requête de l'historique (MainUI.show_all_mouvements), telle que la lit le Treeview virtuel
+        historique = PagedQuery(
+            "m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet",
+            """Mouvements m
+            LEFT JOIN Articles a ON m.code_article = a.code_article
+            LEFT JOIN Utilisateurs u ON m.user_id = u.id""",
+            "m.id", {"date": "IFNULL(m.date_mvt, '')"}, count_from="Mouvements m",
+        )
+
+        with db.get_connection() as conn:
+            debut = time.perf_counter()
+            tout = conn.execute("""
+                SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet, m.id
+                FROM Mouvements m
+                LEFT JOIN Articles a ON m.code_article = a.code_article
+                LEFT JOIN Utilisateurs u ON m.user_id = u.id
+                ORDER BY m.date_mvt DESC, m.id DESC
+            """).fetchall()
+            origine = time.perf_counter() - debut
+            ordre = [row[-1] for row in tout]
+            del tout
+
+            _, ouverture = _chronometre(lambda _: (historique.page(conn, "date", True), historique.count(conn)), 10)
+            rangs = [aleatoire.randrange(mouvements - PAGE_SIZE) for _ in range(iterations)]
+            ancres = [historique.anchor_at(conn, "date", True, rang) for rang in rangs]
+            _, suivante = _chronometre(lambda i: historique.page(conn, "date", True, ancres[i]), iterations)
+            _, saut = _chronometre(lambda i: historique.anchor_at(conn, "date", True, rangs[i]), iterations)
+            _, recherche = _chronometre(lambda i: historique.rank(conn, "date", True, ancres[i]), iterations)
+
+            # Les pages lues par clé reproduisent l'ordre complet, sans trou ni doublon
+            coherent = all(historique.rank(conn, "date", True, ancres[i]) == rangs[i] for i in range(20))
+            page, lues = historique.page(conn, "date", True), []
+            while page and len(lues) < 10 * PAGE_SIZE:
+                lues.extend(row[-1] for row in page)
+                page = historique.page(conn, "date", True, page[-1][-2:])
+            coherent = coherent and lues == ordre[:len(lues)]
+            coherent = coherent and all(
+                [row[-1] for row in historique.page(conn, "date", True, ancres[i], inclusive=True)]
+                == ordre[rangs[i]:rangs[i] + PAGE_SIZE] for i in range(20)
+            )
+
+        print(f"Historique : {mouvements} mouvements, pages de {PAGE_SIZE} lignes")
+        print(f"  lecture complète d'origine        : {origine * 1000:.0f} ms")
+        print(f"  ouverture (première page + total) : {ouverture / 1000:.2f} ms")
+        print(f"  page suivante, position au hasard : {suivante / 1000:.2f} ms")
+        print(f"  saut direct (barre de défilement) : {saut / 1000:.2f} ms")
+        print(f"  rang d'une ligne (aller à)        : {recherche / 1000:.2f} ms")
+        if not coherent:
+            print("ÉCHEC : les pages lues par clé ne suivent pas l'ordre de l'historique")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+def bench_plein_texte(articles=500_000, iterations=20):
+    """Recherche d'articles : LIKE '%terme%' contre l'index plein texte ArticlesFTS"""
+    import random
+    from core.produit_manager import ARTICLES_CONTENANT, ProduitManager, motif_contient
+    from database import search_index
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(19)
+        noms = ("Vis", "Écrou", "Boulon", "Rondelle", "Clou", "Cheville", "Tournevis", "Marteau",
+                "Perceuse", "Scie", "Pince", "Clé", "Foret", "Équerre", "Charnière", "Serrure")
+        matieres = ("acier", "inox", "laiton", "zinc", "bois", "plastique", "alu", "fonte")
+        with db.get_connection() as conn:
+            if not search_index.fts_available(conn):
+                print("SQLite n'offre pas FTS5 : la recherche reste en LIKE.")
+                return
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, ?, 1.0, 2.0, 5)
+            """, ((f"P{i:06d}", f"{aleatoire.choice(noms)} {aleatoire.choice(matieres)} "
+                                f"M{aleatoire.randint(3, 24)}x{aleatoire.randint(10, 200)}",
+                   aleatoire.choice(("Quincaillerie", "Outillage", "Fixation"))) for i in range(articles)))
+            conn.commit()
+
+        produits = ProduitManager()
+        produits.db = db
+        termes = ("ecrou", "écrou inox", "boulon laiton m12", "charn", "tournevis acier", "P01234", "serrure fonte m8x1", "zzz")
+        like = f"""
+            SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock
+            FROM Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article
+            WHERE {ARTICLES_CONTENANT} LIMIT 50
+        """
+        print(f"Recherche de 50 articles au plus parmi {articles}, moyenne sur {iterations} recherches :")
+        print(f"  {'terme':<22} {'LIKE':>9} {'FTS5':>9} {'trouvés':>8}")
+        pire = 0
+        with db.get_connection() as conn:
+            for terme in termes:
+                motif = motif_contient(terme)
+                origine, _ = _chronometre(lambda _: conn.execute(like, (motif,) * 3).fetchall(), iterations)
+                fts, _ = _chronometre(lambda _: produits.rechercher_articles(terme, 50), iterations)
+                pire = max(pire, fts / iterations)
+                trouves = len(produits.rechercher_articles(terme, 50))
+                print(f"  {terme:<22} {origine / iterations * 1000:>6.1f} ms {fts / iterations * 1000:>6.2f} ms "
+                      f"{trouves:>8}")
+
+            # La comparaison en mémoire (affinage de IncrementalSearch) retient les mêmes articles que MATCH
+            catalogue = [(row[0], "\0".join(produits.plier_recherche(str(champ or "")) for champ in row))
+                         for row in conn.execute("SELECT code_article, designation, categorie FROM Articles")]
+            coherent = True
+            for terme in termes + ("Ecr", "EQUERRE Alu", "m1"):
+                critere = produits.critere_recherche(produits.plier_recherche(terme))
+                attendu = {code for code, texte in catalogue if critere(texte)}
+                where, params = produits.filtre_articles(terme)
+                trouves = {row[0] for row in conn.execute(
+                    f"SELECT a.code_article FROM Articles a WHERE {where}", params)}
+                coherent = coherent and trouves == attendu
+            accents = {row[1].split()[0] for row in produits.rechercher_articles("ecrou", 50)} == {"Écrou"}
+
+        print(f"  FTS5 au pire : {pire * 1000:.2f} ms par recherche")
+        if not (coherent and accents):
+            print("ÉCHEC : la recherche en mémoire ou le repli des accents diffère de l'index")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+def bench_code_barre(iterations=2000, articles=(1_000, 10_000, 100_000, 500_000)):
+    """Scan en caisse : LIKE sur Articles.code_barre contre resolve_barcode (CodesBarres et cache)"""
+    import random
+    from core.produit_manager import ARTICLE_DU_CODE_BARRE, ProduitManager, normaliser_code_barre
+    from database.query_cache import QueryCache
+
+    if isinstance(articles, int):
+        articles = (articles,)
+    print(f"Résolution d'un code scanné, moyenne sur {iterations} scans :")
+    print(f"  {'articles':>9} {'LIKE':>10} {'index':>10} {'cache':>10}")
+    coherent = True
+    for taille in articles:
+        path = _base_temporaire()
+        try:
+            db = Database(path, profile="fast")
+            db.initialize()
+            aleatoire = random.Random(20)
+            # EAN-13 commençant par 0 : aussi lisibles en UPC-A (12 chiffres)
+            eans = [f"0{300_000_000_000 + i * 7:012d}" for i in range(taille)]
+            with db.get_connection() as conn:
+                conn.executemany("""
+                    INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre)
+                    VALUES (?, ?, 'Divers', 1.0, 2.0, 5, ?)
+                """, ((f"A{i:06d}", f"Article {i}", f"barcodes/A{i:06d}.png") for i in range(taille)))
+                conn.executemany("INSERT INTO CodesBarres (code, code_article) VALUES (?, ?)",
+                                 ((ean, f"A{i:06d}") for i, ean in enumerate(eans)))
+                conn.commit()
+            produits = ProduitManager()
+            produits.db = db
+            scans = [aleatoire.randrange(taille) for _ in range(iterations)]
+
+            # Recherche d'origine (generation_scann) : le code scanné dans le chemin de l'image
+            with db.get_connection() as conn:
+                like = _chronometre(lambda i: conn.execute(
+                    "SELECT * FROM Articles WHERE code_barre LIKE ?", (f"%A{scans[i]:06d}%",)).fetchone(),
+                    min(iterations, 200))[1]
+
+            def requete(i):
+                with db.get_connection() as conn:
+                    return conn.execute(ARTICLE_DU_CODE_BARRE, (eans[scans[i]], eans[scans[i]])).fetchone()
+            sans_cache = _chronometre(requete, iterations)[1]
+            for i in range(iterations):
+                produits.resolve_barcode(eans[scans[i]])
+            en_cache = _chronometre(lambda i: produits.resolve_barcode(eans[scans[i]]), iterations)[1]
+            print(f"  {taille:>9} {like / 1000:>7.3f} ms {sans_cache / 1000:>7.3f} ms {en_cache / 1000:>7.3f} ms")
+
+            # Formes équivalentes d'un même code, code article, code inconnu
+            ean = eans[1]
+            coherent = coherent and all(produits.resolve_barcode(forme) == "A000001" for forme in
+                                        (ean, ean[1:], "0" + ean, f" {ean[:6]}-{ean[6:]} ", "A000001"))
+            coherent = coherent and produits.resolve_barcode("9999999999999") is None
+            coherent = coherent and normaliser_code_barre(ean[1:]) == ean
+            # Un mouvement ne touche pas le cache ; un code réaffecté est relu
+            cache = QueryCache.pour(db, "codes_barres")
+            with db.get_connection() as conn:
+                conn.execute("INSERT INTO Mouvements (type, code_article, quantite, date_mvt) "
+                             "VALUES ('entrée', 'A000001', 5, CURRENT_TIMESTAMP)")
+                conn.commit()
+            avant = cache.stats()["misses"]
+            produits.resolve_barcode(ean)
+            coherent = coherent and cache.stats()["misses"] == avant
+            succes, _ = produits.supprimer_code_barre(ean)
+            succes = succes and produits.ajouter_code_barre("A000002", ean)[0]
+            coherent = coherent and succes and produits.resolve_barcode(ean) == "A000002"
+            coherent = coherent and not produits.ajouter_code_barre("A000003", "A000002")[0]
+            cache.fermer()
+        finally:
+            _supprimer_base(path)
+    if not coherent:
+        print("ÉCHEC : un code scanné n'est pas résolu vers l'article attendu")
+        raise SystemExit(1)
+
+
+def bench_rapport_pdf(lignes=40_000):
+    """Listing de stock en PDF : une page sans saut de page contre RapportPDF paginé"""
+    import random
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from core.export_manager import COLONNES_PDF_STOCK, ExportManager, JEUX_EXPORT
+    from reporting.pdf_report import RapportPDF
+
+    path = _base_temporaire()
+    fichier = path + ".pdf"
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(22)
+        noms = ("Vis", "Écrou", "Boulon", "Rondelle", "Cheville", "Tournevis", "Charnière", "Serrure")
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Quincaillerie', 1.0, ?, 5)
+            """, ((f"A{i:06d}", f"{aleatoire.choice(noms)} {'inox ' * aleatoire.randint(0, 8)}M{aleatoire.randint(3, 24)}",
+                   round(aleatoire.uniform(0.5, 300), 2)) for i in range(lignes)))
+            conn.executemany("INSERT INTO Stock (code_article, quantite, emplacement) VALUES (?, ?, 'Magasin')",
+                             ((f"A{i:06d}", aleatoire.randint(0, 2000)) for i in range(lignes)))
+            conn.commit()
+            quantite, valeur = conn.execute("SELECT SUM(quantite), SUM(s.quantite * a.prix_vente) FROM Stock s "
+                                            "JOIN Articles a ON a.code_article = s.code_article").fetchone()
+
+        # Rapport d'origine : toutes les lignes lues, dessinées sur une seule page
+        debut = time.perf_counter()
+        c = canvas.Canvas(fichier, pagesize=letter)
+        c.drawString(100, 750, "Rapport de Stock")
+        visibles = 0
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Stock JOIN Articles ON Stock.code_article = Articles.code_article")
+            y = 700
+            for row in cursor.fetchall():
+                c.drawString(100, y, f"{row['designation']}: {row['quantite']} unités")
+                visibles += y > 0
+                y -= 20
+            c.save()
+        origine = time.perf_counter() - debut
+
+        manager = ExportManager(path)
+        debut = time.perf_counter()
+        pages = manager.export_stock_pdf(fichier)
+        duree = time.perf_counter() - debut
+        taille = os.path.getsize(fichier) / 1_000_000
+
+        # Pied de la dernière page : totaux de toutes les lignes
+        jeu = JEUX_EXPORT["stock"]
+        rapport = RapportPDF(fichier, "Contrôle", jeu.selection(COLONNES_PDF_STOCK), lignes)
+        with db.get_connection() as conn:
+            rapport.ajouter(conn.execute(jeu.requete(rapport.colonnes)))
+        attendues = rapport.total_pages
+        rapport.terminer()
+        cumul = dict(zip(COLONNES_PDF_STOCK, rapport.cumul))
+
+        print(f"Listing de stock, {lignes} lignes :")
+        print(f"  origine    : {origine:.2f} s, 1 page, {visibles} lignes dans la page")
+        print(f"  RapportPDF : {duree:.2f} s, {pages} pages ({pages / duree:.0f} pages/s, "
+              f"{lignes / duree:,.0f} lignes/s), {taille:.1f} Mo")
+        if pages != attendues or cumul["quantite"] != quantite or abs(cumul["valeur"] - valeur) > 0.01:
+            print("ÉCHEC : pagination ou totaux du rapport inattendus")
+            raise SystemExit(1)
+    finally:
+        try:
+            os.remove(fichier)
+        except OSError:
+            pass
+        _supprimer_base(path)
+
+
+def bench_recherche(articles=100_000, intervalle_ms=120):
+    """Recherche à la frappe dans le dialogue d'entrée / sortie : filtre relu à chaque touche contre IncrementalSearch"""
+    import random
+    from core.produit_manager import ARTICLES_CONTENANT, ProduitManager, motif_contient
+    from database.pagination import PagedQuery, RowsQuery
+    from ui.incremental_search import SEARCH_DELAY_MS, IncrementalSearch
+
+    # Articles et stock du dialogue (ui.main_ui.ARTICLES_STOCK)
+    articles_stock = PagedQuery(
+        "a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock",
+        "Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article",
+        "a.code_article", {"designation": "a.designation"},
+    )
+    tri = {"designation": lambda row: row[1]}
+
+    class Saisie:
+        """Champ de saisie sur une horloge simulée : after() est exécuté quand la frappe avance"""
+
+        def __init__(self):
+            self.maintenant, self.attentes, self.numero = 0, {}, 0
+
+        def after(self, delai, fonction, *args):
+            self.numero += 1
+            self.attentes[self.numero] = (self.maintenant + delai, fonction, args)
+            return self.numero
+
+        def after_cancel(self, numero):
+            self.attentes.pop(numero, None)
+
+        def avancer(self, jusqu_a):
+            for numero, (echeance, fonction, args) in sorted(self.attentes.items(), key=lambda e: e[1][0]):
+                if echeance <= jusqu_a and numero in self.attentes:
+                    del self.attentes[numero]
+                    self.maintenant = echeance
+                    fonction(*args)
+            self.maintenant = jusqu_a
+
+    class Tache:
+        def cancel(self):
+            pass
+
+    class Executeur:
+        """Exécute les lectures sur-le-champ et compte celles qui touchent la base"""
+
+        def __init__(self):
+            self.lectures = 0
+
+        def submit(self, fonction, *args, on_success=None, on_error=None, **options):
+            self.lectures += 1
+            on_success(fonction(*args))
+            return Tache()
+
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        aleatoire = random.Random(18)
+        noms = ("Vis", "Écrou", "Boulon", "Rondelle", "Clou", "Cheville", "Tournevis", "Marteau",
+                "Perceuse", "Scie", "Pince", "Clé", "Foret", "Équerre", "Charnière", "Serrure")
+        matieres = ("acier", "inox", "laiton", "zinc", "bois", "plastique", "alu", "fonte")
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, ?, 1.0, 2.0, 5)
+            """, [(f"P{i:06d}", f"{aleatoire.choice(noms)} {aleatoire.choice(matieres)} "
+                               f"M{aleatoire.randint(3, 24)}x{aleatoire.randint(10, 200)}",
+                   aleatoire.choice(("Quincaillerie", "Outillage", "Fixation"))) for i in range(articles)])
+            conn.commit()
+
+        produits = ProduitManager()
+        produits.db = db
+        requete = "boulon inox m12"
+        saisies = [requete[:i] for i in range(1, len(requete) + 1)]
+
+        # Origine : chaque touche relit la première page filtrée (LIKE) et le nombre de lignes
+        origine = []
+        with db.get_connection() as conn:
+            for terme in saisies:
+                motif = motif_contient(terme)
+                filtre = articles_stock.filtered(ARTICLES_CONTENANT, (motif, motif, motif))
+                debut = time.perf_counter()
+                filtre.page(conn, "designation")
+                filtre.count(conn)
+                origine.append(time.perf_counter() - debut)
+
+        # Dernier affichage attendu : le filtre de la base sur le terme complet
+        with db.get_connection() as conn:
+            attendu = articles_stock.filtered(*produits.filtre_articles(requete))
+            attendu = (requete, [row[-1] for row in attendu.page(conn, "designation")], attendu.count(conn))
+
+        def taper(intervalle):
+            """Frappe toutes les ``intervalle`` ms ; affichage lu comme le fait la table virtuelle"""
+            saisie, executeur, affiches = Saisie(), Executeur(), []
+
+            def afficher(terme, lignes):
+                with db.get_connection() as conn:
+                    if lignes is None:
+                        filtre = articles_stock.filtered(*produits.filtre_articles(terme))
+                    else:
+                        filtre = RowsQuery(lignes, lambda row: row[0], tri)
+                    affiches.append((terme, [row[-1] for row in filtre.page(conn, "designation")],
+                                     filtre.count(conn)))
+
+            recherche = IncrementalSearch(saisie, executeur, produits.rechercher_articles, (0, 1, 2),
+                                          produits.plier_recherche, produits.critere_recherche, afficher)
+            par_touche = []
+            for i, terme in enumerate(saisies):
+                debut = time.perf_counter()
+                saisie.avancer(i * intervalle)
+                if par_touche:
+                    # Lectures déclenchées par la pause : imputées à la touche précédente
+                    par_touche[-1] += time.perf_counter() - debut
+                debut = time.perf_counter()
+                recherche.update(terme)
+                par_touche.append(time.perf_counter() - debut)
+            debut = time.perf_counter()
+            saisie.avancer(len(saisies) * intervalle + SEARCH_DELAY_MS)
+            par_touche[-1] += time.perf_counter() - debut
+            return executeur.lectures, par_touche, affiches[-1] == attendu
+
+        print(f"Recherche « {requete} » tapée touche par touche, {articles} articles")
+        print(f"  filtre relu à chaque touche    : {len(saisies)} lectures, "
+              f"{max(origine) * 1000:.1f} ms au pire, {sum(origine) * 1000:.0f} ms au total")
+        coherent = True
+        for intervalle in (intervalle_ms, SEARCH_DELAY_MS + 100):
+            lectures, par_touche, identique = taper(intervalle)
+            coherent = coherent and identique
+            print(f"  IncrementalSearch, {intervalle:>3} ms/touche : {lectures} lecture(s), "
+                  f"{max(par_touche) * 1000:.1f} ms au pire, {sum(par_touche) * 1000:.0f} ms au total, "
+                  f"médiane {sorted(par_touche)[len(par_touche) // 2] * 1000:.2f} ms")
+        if not coherent:
+            print("ÉCHEC : le dernier résultat affiché diffère du filtre de la base")
+            raise SystemExit(1)
+    finally:
+        _supprimer_base(path)
+
+def bench_synchro(rafraichissements=20, articles=20_000):
+    """Rafraîchissement d'un Treeview de stock après un mouvement : tout réinsérer contre sync_tree"""
+    import tkinter as tk
+    from tkinter import ttk
+    from core.stock_manager import StockManager
+    from ui.table_sync import sync_tree
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Un affichage est nécessaire pour mesurer un Treeview : {e}")
+        raise SystemExit(1)
+    root.withdraw()
+    path = _base_temporaire()
+    try:
+        db = Database(path, profile="fast")
+        db.initialize()
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte)
+                VALUES (?, ?, 'Divers', 1.0, 2.0, 5)
+            """, [(f"S{i:05d}", f"Article {i}") for i in range(articles)])
+            conn.commit()
+        stock = StockManager(path)
+
+        def lire():
+            # Requête de l'état du stock (StockManager.refresh_table)
+            with db.get_connection() as conn:
+                return conn.execute("""
+                    SELECT a.code_article, a.designation, COALESCE(s.quantite, 0), a.seuil_alerte
+                    FROM Articles a
+                    LEFT JOIN StockSolde s ON a.code_article = s.code_article
+                    ORDER BY a.designation
+                """).fetchall()
+
+        colonnes = ("code_article", "designation", "quantite", "seuil_alerte")
+        origine_tree = ttk.Treeview(root, columns=colonnes, show="headings")
+        sync_tree_widget = ttk.Treeview(root, columns=colonnes, show="headings")
+        for row in lire():
+            origine_tree.insert("", tk.END, values=tuple(row))
+
+        def origine(i):
+            stock.ajouter_stock(f"S{i * 997 % articles:05d}", 1)
+            stocks = lire()
+            for item in origine_tree.get_children():
+                origine_tree.delete(item)
+            for row in stocks:
+                origine_tree.insert("", tk.END, values=tuple(row))
+
+        operations = []
+
+        def synchro(i):
+            stock.ajouter_stock(f"S{i * 991 % articles:05d}", 1)
+            operations.append(sync_tree(sync_tree_widget, ((row[0], tuple(row), ()) for row in lire())))
+
+        _, unitaire_origine = _chronometre(origine, rafraichissements)
+        sync_tree(sync_tree_widget, ((row[0], tuple(row), ()) for row in lire()))
+        _, unitaire_synchro = _chronometre(synchro, rafraichissements)
+        touchees = max(sum(compte.values()) for compte in operations)
+        coherent = (list(sync_tree_widget.get_children()) == [row[0] for row in lire()]
+                    and all(compte == {"insert": 0, "update": 1, "delete": 0, "move": 0} for compte in operations))
+
+        print(f"Stock de {articles} articles, {rafraichissements} rafraîchissements après un mouvement")
+        print(f"  tout effacer et réinsérer : {unitaire_origine / 1000:.1f} ms, {2 * articles} opérations Treeview")
+        print(f"  sync_tree                 : {unitaire_synchro / 1000:.1f} ms "
+              f"({unitaire_origine / unitaire_synchro:.1f}x), {touchees} ligne(s) touchée(s)")
+        if not coherent:
+            print(f"ÉCHEC : opérations inattendues ({operations[:3]})")
+            raise SystemExit(1)
+    finally:
+        root.destroy()
+        _supprimer_base(path)
+
+COMMANDES = {
+    "cache": bench_cache,
+    "code_barre": bench_code_barre,
+    "cumuls": bench_cumuls,
+    "etiquettes": bench_etiquettes,
+    "export_excel": bench_export_excel,
+    "export_fichiers": bench_export_fichiers,
+    "exports_concurrents": bench_exports_concurrents,
+    "lot": bench_lot,
+    "pagination": bench_pagination,
+    "plein_texte": bench_plein_texte,
+    "pool": bench_pool,
+    "rapport_pdf": bench_rapport_pdf,
+    "recherche": bench_recherche,
+    "sortie": bench_sortie_concurrente,
+    "stats": bench_stats,
+    "stock_au": bench_stock_au,
+    "synchro": bench_synchro,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures de performance de la base de stock")
+    parser.add_argument("commande", choices=sorted(COMMANDES))
+    parser.add_argument("-n", "--iterations", type=int, default=None,
+                        help="nombre d'itérations (selon la commande)")
+    args = parser.parse_args()
+
+    fonction = COMMANDES[args.commande]
+    if args.iterations is not None:
+        fonction(args.iterations)
+    else:
+        fonction()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,71 @@
 # database/db.py
-import sqlite3
+import os
+import threading
 from contextlib import contextmanager
+from database.pool import ConnectionPool
+from database.pragmas import DEFAULT_PROFILE, apply_profile, get_profile
+from database.migrations import migrate
+
+# Paramètres par défaut du pool de connexions
+POOL_SIZE = 5
+POOL_IDLE_TIMEOUT = 300.0
+POOL_HEALTH_CHECK_INTERVAL = 30.0
+POOL_CHECKOUT_TIMEOUT = 10.0
 
 class Database:
-    def __init__(self, db_name="stock_app.db"):
+    # Un pool par fichier de base et par profil PRAGMA, partagé par toutes les instances
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_name="stock_app.db", pool_size=None, profile=None):
         self.db_name = db_name
+        self.profile = profile or DEFAULT_PROFILE
+        get_profile(self.profile)  # Profil inconnu : ValueError immédiate
+        self.pool = self._get_pool(db_name, pool_size, self.profile)
+
+    @classmethod
+    def _get_pool(cls, db_name, pool_size, profile):
+        key = (os.path.abspath(db_name), profile)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    db_name,
+                    max_size=pool_size or POOL_SIZE,
+                    idle_timeout=POOL_IDLE_TIMEOUT,
+                    health_check_interval=POOL_HEALTH_CHECK_INTERVAL,
+                    checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+                    on_connect=lambda conn: apply_profile(conn, profile),
+                )
+                cls._pools[key] = pool
+            elif pool_size and pool_size != pool.max_size:
+                # Le pool est partagé : sa taille est fixée par le premier qui l'ouvre
+                raise ValueError(
+                    f"Le pool de {db_name} ({profile}) est déjà ouvert avec {pool.max_size} connexions"
+                )
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        """Ferme les connexions au repos de tous les pools"""
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.close_all()
 
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_name)
-        conn.row_factory = sqlite3.Row  # Permet d'accéder aux colonnes par nom
+        conn = self.pool.acquire()
         try:
             yield conn
         finally:
-            conn.close()
+            self.pool.release(conn)
 
-    def initialize(self):
+    def pool_stats(self):
+        """Retourne les statistiques du pool de connexions"""
+        return self.pool.stats()
+
+    def initialize(self, progress=None):
+        """Met le schéma à jour ; ne coûte qu'une lecture s'il l'est déjà"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            # Création des tables si elles n'existent pas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Utilisateurs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    nom_complet TEXT,
-                    last_login DATETIME
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Articles (
-                    code_article TEXT PRIMARY KEY,
-                    designation TEXT NOT NULL,
-                    categorie TEXT,
-                    prix_achat REAL,
-                    prix_vente REAL,
-                    seuil_alerte INTEGER
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Stock (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    code_article TEXT,
-                    quantite INTEGER,
-                    emplacement TEXT,
-                    FOREIGN KEY (code_article) REFERENCES Articles(code_article)
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Mouvements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    type TEXT,
-                    code_article TEXT,
-                    quantite INTEGER,
-                    date_mvt DATETIME,
-                    user_id INTEGER,
-                    FOREIGN KEY (code_article) REFERENCES Articles(code_article),
-                    FOREIGN KEY (user_id) REFERENCES Utilisateurs(id)
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Fournisseurs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nom TEXT NOT NULL,
-                    contact TEXT
-                )
-            """)
-            conn.commit()
+            return migrate(conn, progress=progress)
@@ -1,20 +1,144 @@
+# database/generation_code.py
+"""Génération en masse des étiquettes Code128 des articles.
+
+Les images sont dessinées par un pool de processus, un lot d'articles à la
+fois, et enregistrées dans ``barcodes/<code article>.png``. Chaque article
+garde l'empreinte du contenu de son étiquette (code encodé, symbologie,
+versions de python-barcode et de Pillow) : une étiquette dont l'empreinte
+n'a pas changé et dont le fichier existe n'est pas redessinée, et une image
+redessinée identique au fichier en place n'est pas réécrite. Les chemins et
+empreintes sont enregistrés en une seule transaction.
+
+    python -m database.generation_code [base] [--dossier barcodes] [--processus N] [--tout]
+"""
+import argparse
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import barcode
+import PIL
 from barcode.writer import ImageWriter
-import sqlite3
-import os
+from database.db import Database
+
+SYMBOLOGIE = "code128"
+DOSSIER = "barcodes"
+# Articles envoyés à la fois à un processus de rendu
+TAILLE_LOT = 250
+
+
+def empreinte(code_article):
+    """Empreinte du contenu de l'étiquette d'un article"""
+    contenu = f"{SYMBOLOGIE}\0{barcode.version}\0{PIL.__version__}\0{code_article}"
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+def fichier_etiquette(dossier, code_article):
+    return os.path.join(dossier, f"{code_article}.png")
+
+
+def rendre_lot(dossier, articles):
+    """Dessine les étiquettes d'un lot [(code article, empreinte)] ; retourne [(code, fichier, empreinte, réécrit)]"""
+    resultats = []
+    for code_article, empreinte_article in articles:
+        # Code128 accepte les codes alphanumériques comme "A001"
+        image = io.BytesIO()
+        barcode.get(SYMBOLOGIE, code_article, writer=ImageWriter()).write(image)
+        contenu = image.getvalue()
+        fichier = fichier_etiquette(dossier, code_article)
+        try:
+            with open(fichier, "rb") as existant:
+                reecrit = existant.read() != contenu
+        except OSError:
+            reecrit = True
+        if reecrit:
+            provisoire = f"{fichier}.{os.getpid()}.tmp"
+            with open(provisoire, "wb") as sortie:
+                sortie.write(contenu)
+            os.replace(provisoire, fichier)
+        resultats.append((code_article, fichier, empreinte_article, reecrit))
+    return resultats
+
+
+def generer_codes_barres(db_name="stock_app.db", dossier=DOSSIER, processus=None, tout=False, progression=None):
+    """Génère les étiquettes manquantes ou périmées du catalogue (toutes avec ``tout``).
+
+    ``processus`` : taille du pool de rendu (un par cœur par défaut).
+    ``progression(dessinees, a_dessiner)`` est appelée après chaque lot.
+    Retourne les compteurs {"articles", "inchangees", "dessinees", "reecrites", "duree", "processus"}.
+    """
+    debut = time.perf_counter()
+    db = Database(db_name)
+    with db.get_connection() as conn:
+        articles = conn.execute("SELECT code_article, code_barre, empreinte_code_barre FROM Articles").fetchall()
+    os.makedirs(dossier, exist_ok=True)
+
+    a_dessiner = []
+    for code_article, code_barre, empreinte_enregistree in articles:
+        attendue = empreinte(code_article)
+        if (not tout and empreinte_enregistree == attendue and code_barre == fichier_etiquette(dossier, code_article)
+                and os.path.exists(code_barre)):
+            continue
+        a_dessiner.append((code_article, attendue))
+    lots = [a_dessiner[i:i + TAILLE_LOT] for i in range(0, len(a_dessiner), TAILLE_LOT)]
+
+    processus = max(1, min(processus or os.cpu_count() or 1, len(lots)))
+    resultats = []
+
+    def recevoir(lot):
+        resultats.extend(lot)
+        if progression:
+            progression(len(resultats), len(a_dessiner))
+
+    if processus == 1:
+        for lot in lots:
+            recevoir(rendre_lot(dossier, lot))
+    else:
+        with ProcessPoolExecutor(max_workers=processus) as pool:
+            for lot in pool.map(rendre_lot, repeat(dossier), lots):
+                recevoir(lot)
+
+    if resultats:
+        with db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE Articles SET code_barre = ?, empreinte_code_barre = ? WHERE code_article = ?",
+                    ((fichier, empreinte_article, code_article)
+                     for code_article, fichier, empreinte_article, _ in resultats))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return {
+        "articles": len(articles),
+        "inchangees": len(articles) - len(a_dessiner),
+        "dessinees": len(resultats),
+        "reecrites": sum(1 for *_, reecrit in resultats if reecrit),
+        "duree": time.perf_counter() - debut,
+        "processus": processus,
+    }
+
 
-os.makedirs("barcodes", exist_ok=True)
+def main():
+    parser = argparse.ArgumentParser(description="Génère les étiquettes code-barres (Code128) des articles")
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    parser.add_argument("--dossier", default=DOSSIER)
+    parser.add_argument("--processus", type=int, default=None, help="processus de rendu (un par cœur par défaut)")
+    parser.add_argument("--tout", action="store_true", help="redessine aussi les étiquettes inchangées")
+    args = parser.parse_args()
 
-conn = sqlite3.connect("stock_app.db")
-cursor = conn.cursor()
-articles = cursor.execute("SELECT code_article FROM Articles").fetchall()
+    Database(args.base).initialize()
+    compteurs = generer_codes_barres(args.base, args.dossier, args.processus, args.tout)
+    duree = compteurs["duree"]
+    print(f"{compteurs['articles']} articles : {compteurs['dessinees']} étiquettes dessinées "
+          f"({compteurs['reecrites']} fichiers écrits), {compteurs['inchangees']} inchangées.")
+    print(f"{duree:.1f} s, {compteurs['processus']} processus : "
+          f"{compteurs['articles'] / duree if duree else 0:,.0f} articles/s, "
+          f"{compteurs['dessinees'] / duree if duree else 0:,.0f} étiquettes dessinées/s.")
 
-for (code_article,) in articles:
-    # Utilise Code128 pour accepter les codes alphanumériques comme "A001"
-    code128 = barcode.get('code128', code_article, writer=ImageWriter())
-    filename = code128.save(f"barcodes/{code_article}")
-    cursor.execute("UPDATE Articles SET code_barre = ? WHERE code_article = ?", (filename, code_article))
 
-conn.commit()
-conn.close()
-print("Codes-barres générés pour tous les articles.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
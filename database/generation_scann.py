@@ -1,6 +1,6 @@
 import cv2
 from pyzbar.pyzbar import decode
-import sqlite3
+from core.produit_manager import ProduitManager
 
 def scanner_code_barre():
     cap = cv2.VideoCapture(0)
@@ -23,9 +23,6 @@ def scanner_code_barre():
 
 code_barre = scanner_code_barre()
 if code_barre:
-    conn = sqlite3.connect("stock_app.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Articles WHERE code_barre LIKE ?", (f"%{code_barre}%",))
-    article = cursor.fetchone()
-    print("Article trouvé :", article)
-    conn.close()
\ No newline at end of file
+    # Code-barres enregistré (CodesBarres) ou code article imprimé sur l'étiquette
+    article = ProduitManager().resolve_barcode(code_barre)
+    print("Article trouvé :", article)
\ No newline at end of file
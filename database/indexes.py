@@ -0,0 +1,245 @@
+# database/indexes.py
+"""Index secondaires gérés et audit des plans d'exécution des requêtes critiques.
+
+Les index sont créés par les migrations ; l'audit vérifie, avec
+EXPLAIN QUERY PLAN, qu'aucune requête enregistrée ne parcourt une table entière,
+même dans l'ordre d'un index, hors parcours déclarés dans ``allowed_scans`` :
+    python -m database.indexes [base]
+"""
+import argparse
+import re
+from core.stats_manager import (DERNIERE_ACTIVITE, DERNIERE_ACTIVITE_EMPLACEMENT, MOUVEMENTS_DU_JOUR,
+                                MOUVEMENTS_DU_JOUR_EMPLACEMENT, NOMBRE_ARTICLES, STATISTIQUES,
+                                SYNTHESE_EMPLACEMENT)
+
+# Index gérés par les migrations, par nom
+MANAGED_INDEXES = {
+    "idx_stock_code_article":
+        "CREATE INDEX IF NOT EXISTS idx_stock_code_article ON Stock (code_article)",
+    "idx_mouvements_date":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_date ON Mouvements (date_mvt)",
+    "idx_mouvements_type_article":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_type_article ON Mouvements (type, code_article, quantite)",
+    "idx_articles_code_barre":
+        "CREATE INDEX IF NOT EXISTS idx_articles_code_barre ON Articles (code_barre)",
+    "idx_mouvements_article_date":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_article_date ON Mouvements (code_article, date_mvt)",
+    "idx_stock_emplacement_article":
+        "CREATE INDEX IF NOT EXISTS idx_stock_emplacement_article ON Stock (emplacement, code_article, quantite)",
+    "idx_mouvements_emplacement_date":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_emplacement_date ON Mouvements (emplacement, date_mvt)",
+    "idx_mouvements_destination_date":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_destination_date ON Mouvements (destination, date_mvt)",
+    "idx_reservations_statut_expiration":
+        "CREATE INDEX IF NOT EXISTS idx_reservations_statut_expiration ON Reservations (statut, date_expiration)",
+    "idx_reservations_article":
+        "CREATE INDEX IF NOT EXISTS idx_reservations_article ON Reservations (code_article, statut)",
+    "idx_mouvements_jour_article":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_jour_article ON MouvementsJour (code_article, jour, quantite_sortie)",
+    "idx_articles_designation":
+        "CREATE INDEX IF NOT EXISTS idx_articles_designation ON Articles (designation, code_article)",
+    "idx_mouvements_type_date":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_type_date ON Mouvements (type, date_mvt)",
+    "idx_codes_barres_article":
+        "CREATE INDEX IF NOT EXISTS idx_codes_barres_article ON CodesBarres (code_article)",
+    "idx_mouvements_date_tri":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_date_tri ON Mouvements (IFNULL(date_mvt, ''))",
+    "idx_mouvements_type_date_tri":
+        "CREATE INDEX IF NOT EXISTS idx_mouvements_type_date_tri ON Mouvements (type, IFNULL(date_mvt, ''))",
+    "idx_taches_export_statut":
+        "CREATE INDEX IF NOT EXISTS idx_taches_export_statut ON TachesExport (statut, poste)",
+}
+
+
+class HotQuery:
+    def __init__(self, name, sql, params=(), allowed_scans=()):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        # Tables (ou alias) dont le parcours complet est attendu, ex. un catalogue entier ;
+        # un parcours dans l'ordre d'un index ("SCAN t USING INDEX ...") reste un parcours complet
+        self.allowed_scans = allowed_scans
+
+
+HOT_QUERIES = [
+    HotQuery("stock d'un article", """
+        SELECT quantite FROM Stock WHERE code_article = ?
+    """, (None,)),
+    HotQuery("instantané d'un article", """
+        SELECT quantite FROM StockInstantanes WHERE date_instantane = ? AND code_article = ?
+    """, (None, None)),
+    HotQuery("mouvements d'un article depuis un instantané", """
+        SELECT type, quantite FROM Mouvements WHERE code_article = ? AND date_mvt >= ? AND date_mvt < ?
+    """, (None, None, None)),
+    HotQuery("état du stock", """
+        SELECT a.code_article, a.designation, COALESCE(s.quantite, 0) AS quantite, a.seuil_alerte
+        FROM Articles a
+        LEFT JOIN StockSolde s ON a.code_article = s.code_article
+        ORDER BY a.designation
+    """, allowed_scans=("a",)),
+    # Parcours complet attendu : historique complet, sans limite (rapports)
+    HotQuery("historique des mouvements", """
+        SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet
+        FROM Mouvements m
+        LEFT JOIN Articles a ON m.code_article = a.code_article
+        LEFT JOIN Utilisateurs u ON m.user_id = u.id
+        ORDER BY m.date_mvt DESC
+    """, allowed_scans=("m",)),
+    HotQuery("historique par type", """
+        SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet
+        FROM Mouvements m
+        LEFT JOIN Articles a ON m.code_article = a.code_article
+        LEFT JOIN Utilisateurs u ON m.user_id = u.id
+        WHERE m.type = ?
+        ORDER BY m.date_mvt DESC
+    """, (None,)),
+    HotQuery("page suivante de l'historique", """
+        SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet,
+               IFNULL(m.date_mvt, ''), m.id
+        FROM Mouvements m
+        LEFT JOIN Articles a ON m.code_article = a.code_article
+        LEFT JOIN Utilisateurs u ON m.user_id = u.id
+        WHERE IFNULL(m.date_mvt, '') <= ? AND (IFNULL(m.date_mvt, '') < ? OR m.id < ?)
+        ORDER BY IFNULL(m.date_mvt, '') DESC, m.id DESC LIMIT ?
+    """, (None, None, None, 200)),
+    HotQuery("page suivante de l'historique par type", """
+        SELECT m.date_mvt, m.type, m.code_article, m.quantite, IFNULL(m.date_mvt, ''), m.id
+        FROM Mouvements m
+        WHERE (m.type = ?) AND IFNULL(m.date_mvt, '') <= ? AND (IFNULL(m.date_mvt, '') < ? OR m.id < ?)
+        ORDER BY IFNULL(m.date_mvt, '') DESC, m.id DESC LIMIT ?
+    """, (None, None, None, None, 200)),
+    HotQuery("rang d'un mouvement dans l'historique", """
+        SELECT (SELECT COUNT(*) FROM Mouvements m WHERE IFNULL(m.date_mvt, '') > ?)
+             + (SELECT COUNT(*) FROM Mouvements m WHERE IFNULL(m.date_mvt, '') = ? AND m.id > ?)
+    """, (None, None, None)),
+    HotQuery("page suivante du catalogue", """
+        SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0), a.designation, a.code_article
+        FROM Articles a
+        LEFT JOIN StockSolde s ON a.code_article = s.code_article
+        WHERE a.designation >= ? AND (a.designation > ? OR a.code_article > ?)
+        ORDER BY a.designation ASC, a.code_article ASC LIMIT ?
+    """, (None, None, None, 200)),
+    # Indicateurs du tableau de bord : les requêtes mêmes de core.stats_manager
+    HotQuery("indicateurs du tableau de bord", STATISTIQUES),
+    HotQuery("nombre d'articles du catalogue", NOMBRE_ARTICLES),
+    HotQuery("dernière activité", DERNIERE_ACTIVITE),
+    HotQuery("dernière activité d'un emplacement", DERNIERE_ACTIVITE_EMPLACEMENT, (None, None)),
+    HotQuery("mouvements du jour (cumuls)", MOUVEMENTS_DU_JOUR, (None,)),
+    HotQuery("mouvements du jour d'un emplacement", MOUVEMENTS_DU_JOUR_EMPLACEMENT, (None, None, None, None)),
+    HotQuery("synthèse d'un emplacement", SYNTHESE_EMPLACEMENT, (None,)),
+    # Parcours complet attendu : une ligne par article et par jour, puis les totaux
+    HotQuery("articles les plus vendus (cumuls)", """
+        SELECT a.designation, j.total_vendu, j.code_article
+        FROM (
+            SELECT code_article, SUM(quantite_sortie) AS total_vendu
+            FROM MouvementsJour
+            GROUP BY code_article
+        ) j
+        JOIN Articles a ON j.code_article = a.code_article
+        WHERE j.total_vendu > 0
+        ORDER BY j.total_vendu DESC
+        LIMIT 10
+    """, allowed_scans=("MouvementsJour", "j")),
+    HotQuery("articles les plus vendus d'une période (cumuls)", """
+        SELECT code_article, SUM(quantite_sortie) AS total_vendu
+        FROM MouvementsJour
+        WHERE jour >= ? AND jour <= ?
+        GROUP BY code_article
+    """, (None, None)),
+    HotQuery("cumul d'un article sur une période", """
+        SELECT SUM(quantite_sortie) FROM MouvementsJour
+        WHERE code_article = ? AND jour >= ? AND jour <= ?
+    """, (None, None, None)),
+    HotQuery("disponible d'un article", """
+        SELECT quantite - quantite_reservee FROM StockSolde WHERE code_article = ?
+    """, (None,)),
+    HotQuery("réservations expirées", """
+        UPDATE Reservations SET statut = 'expiree', date_cloture = ?
+        WHERE statut = 'active' AND date_expiration <= ?
+    """, (None, None)),
+    # Parcours attendu : l'index partiel ne contient que les alertes ouvertes
+    HotQuery("alertes ouvertes", """
+        SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL
+    """, allowed_scans=("Alertes",)),
+    HotQuery("nouvelles transitions d'alerte", """
+        SELECT id, alerte_id, code_article, transition, date_evenement
+        FROM AlertesEvenements WHERE id > ? ORDER BY id
+    """, (None,)),
+    HotQuery("recherche par code-barres", """
+        SELECT * FROM Articles WHERE code_barre = ?
+    """, (None,)),
+    HotQuery("article d'un code-barres scanné", """
+        SELECT code_article FROM CodesBarres WHERE code = ?
+        UNION ALL
+        SELECT code_article FROM Articles WHERE code_article = ?
+    """, (None, None)),
+    HotQuery("exports à reprendre d'un poste", """
+        SELECT id, format, statut, date_maj FROM TachesExport
+        WHERE statut IN ('en_attente', 'en_cours', 'annulation') AND poste = ?
+    """, (None,)),
+]
+
+# "SCAN t", avec ou sans "USING [COVERING] INDEX ..." : parcours complet de la table
+_FULL_SCAN = re.compile(r"^SCAN (\S+)(?: USING .*)?$")
+
+
+def query_plan(conn, query):
+    """Retourne les lignes de détail d'EXPLAIN QUERY PLAN"""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query.sql, query.params).fetchall()
+    return [row[3] for row in rows]
+
+
+def full_scans(conn, query):
+    """Retourne les tables parcourues entièrement par une requête, hors parcours autorisés"""
+    scans = []
+    for detail in query_plan(conn, query):
+        match = _FULL_SCAN.match(detail.strip())
+        if match and match.group(1) not in query.allowed_scans:
+            scans.append(match.group(1))
+    return scans
+
+
+def missing_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [name for name in MANAGED_INDEXES if name not in existing]
+
+
+def audit(conn, queries=None):
+    """Audite les requêtes critiques.
+
+    Retourne la liste des problèmes (vide si tout est indexé) sous forme de
+    chaînes lisibles.
+    """
+    problems = [f"index manquant : {name}" for name in missing_indexes(conn)]
+    for query in queries or HOT_QUERIES:
+        for table in full_scans(conn, query):
+            problems.append(f"{query.name} : parcours complet de {table}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie que les requêtes critiques utilisent un index")
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    parser.add_argument("-v", "--verbose", action="store_true", help="affiche les plans d'exécution")
+    args = parser.parse_args()
+
+    from database.db import Database
+    db = Database(args.base)
+    with db.get_connection() as conn:
+        if args.verbose:
+            for query in HOT_QUERIES:
+                print(f"{query.name} :")
+                for detail in query_plan(conn, query):
+                    print(f"    {detail}")
+        problems = audit(conn)
+
+    if problems:
+        print("Échec de l'audit des index :")
+        for problem in problems:
+            print(f"  - {problem}")
+        raise SystemExit(1)
+    print(f"Audit réussi : {len(HOT_QUERIES)} requêtes critiques indexées.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from db import Database
+from database.db import Database
 
 db = Database("stock_app.db")  # Assure-toi que le nom correspond à ta base
-db.initialize()
-print("Tables créées avec succès.")
\ No newline at end of file
+applied = db.initialize()
+print(f"Schéma à jour ({len(applied)} migration(s) appliquée(s)).")
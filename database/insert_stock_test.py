@@ -1,6 +1,7 @@
 import sqlite3
 conn = sqlite3.connect("stock_app.db")
 cursor = conn.cursor()
-cursor.execute("INSERT OR IGNORE INTO Stock (code_article, quantite, emplacement) VALUES (?, ?, ?)", ("A001", 20, "Magasin"))
+# Stock est une projection du registre : l'entrée passe par Mouvements
+cursor.execute("INSERT INTO Mouvements (type, code_article, quantite, date_mvt, emplacement) VALUES (?, ?, ?, datetime('now'), ?)", ("entrée", "A001", 20, "Magasin"))
 conn.commit()
 conn.close()
\ No newline at end of file
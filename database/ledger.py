@@ -0,0 +1,489 @@
+# database/ledger.py
+"""Registre des mouvements et soldes matérialisés.
+
+La table Mouvements est le registre de référence, en ajout seul ; StockSolde
+(par article) et Stock (par article et emplacement) en sont des projections
+tenues à jour par trigger à chaque mouvement inséré. Des instantanés
+périodiques des soldes (StockInstantanes) permettent de connaître le stock à
+une date sans relire tout l'historique.
+
+    python -m database.ledger verifier [base]
+    python -m database.ledger reconstruire [base]
+    python -m database.ledger cumuls [base]
+    python -m database.ledger instantane [base]
+    python -m database.ledger stock-au AAAA-MM-JJ[THH:MM] [--article CODE] [base]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+# Types de mouvements
+ENTREE = "entrée"
+SORTIE = "sortie"
+AJUSTEMENT = "ajustement"  # quantité signée, sert aux reprises d'inventaire
+TRANSFERT = "transfert"  # de emplacement vers destination, sans effet sur le solde de l'article
+
+EMPLACEMENT_DEFAUT = "Magasin"
+
+# Écart maximal entre deux instantanés pris automatiquement
+INTERVALLE_INSTANTANES = timedelta(days=7)
+
+
+def signed_quantity(alias="m"):
+    """Expression SQL de l'effet d'un mouvement sur le solde de l'article"""
+    return f"""
+        CASE
+            WHEN lower({alias}.type) = 'sortie' THEN -{alias}.quantite
+            WHEN lower({alias}.type) LIKE 'entr%e' OR lower({alias}.type) = 'ajustement' THEN {alias}.quantite
+            ELSE 0
+        END
+    """
+
+
+def location_quantity(alias="m"):
+    """Expression SQL de l'effet d'un mouvement sur son emplacement (origine d'un transfert)"""
+    return f"""
+        CASE
+            WHEN lower({alias}.type) = 'transfert' THEN -{alias}.quantite
+            ELSE {signed_quantity(alias)}
+        END
+    """
+
+
+def _location_effects():
+    """Sous-requête des effets du registre par article et emplacement"""
+    return f"""
+        SELECT m.code_article, m.emplacement, {location_quantity('m')} AS quantite
+        FROM Mouvements m
+        UNION ALL
+        SELECT m.code_article, m.destination, m.quantite
+        FROM Mouvements m
+        WHERE lower(m.type) = 'transfert'
+    """
+
+
+# Cumul journalier par article : ``source`` fournit les colonnes dans l'ordre de la table
+DAILY_ROLLUP_UPSERT = """
+    INSERT INTO MouvementsJour (jour, code_article, quantite_entree, quantite_sortie, quantite_ajustement,
+                                nombre, valeur_entree, valeur_sortie)
+    SELECT * FROM ({source}) WHERE true
+    ON CONFLICT (jour, code_article) DO UPDATE SET
+        quantite_entree = quantite_entree + excluded.quantite_entree,
+        quantite_sortie = quantite_sortie + excluded.quantite_sortie,
+        quantite_ajustement = quantite_ajustement + excluded.quantite_ajustement,
+        nombre = nombre + excluded.nombre,
+        valeur_entree = valeur_entree + excluded.valeur_entree,
+        valeur_sortie = valeur_sortie + excluded.valeur_sortie
+"""
+
+
+def daily_rollup_values(alias="m"):
+    """Clause SELECT (sans FROM) des colonnes de MouvementsJour pour un mouvement.
+
+    Les valeurs sont calculées au prix de l'article au moment du cumul.
+    """
+    entree = f"CASE WHEN lower({alias}.type) LIKE 'entr%e' THEN {alias}.quantite ELSE 0 END"
+    sortie = f"CASE WHEN lower({alias}.type) = 'sortie' THEN {alias}.quantite ELSE 0 END"
+    return f"""
+        SELECT date({alias}.date_mvt) AS jour,
+               {alias}.code_article AS code_article,
+               {entree} AS quantite_entree,
+               {sortie} AS quantite_sortie,
+               CASE WHEN lower({alias}.type) = 'ajustement' THEN {alias}.quantite ELSE 0 END AS quantite_ajustement,
+               1 AS nombre,
+               {entree} * IFNULL((SELECT prix_achat FROM Articles WHERE code_article = {alias}.code_article), 0)
+                   AS valeur_entree,
+               {sortie} * IFNULL((SELECT prix_vente FROM Articles WHERE code_article = {alias}.code_article), 0)
+                   AS valeur_sortie
+    """
+
+
+def rebuild_balances(conn):
+    """Recalcule StockSolde à partir du registre (à appeler dans une transaction)"""
+    conn.execute("DELETE FROM StockSolde")
+    conn.execute(f"""
+        INSERT INTO StockSolde (code_article, quantite, date_maj)
+        SELECT a.code_article, IFNULL(r.quantite, 0), r.date_maj
+        FROM Articles a
+        LEFT JOIN (
+            SELECT m.code_article, SUM({signed_quantity('m')}) AS quantite, MAX(m.date_mvt) AS date_maj
+            FROM Mouvements m
+            GROUP BY m.code_article
+        ) r ON r.code_article = a.code_article
+    """)
+    # Mouvements d'articles supprimés du catalogue : le solde est conservé
+    conn.execute(f"""
+        INSERT INTO StockSolde (code_article, quantite, date_maj)
+        SELECT m.code_article, SUM({signed_quantity('m')}), MAX(m.date_mvt)
+        FROM Mouvements m
+        WHERE m.code_article NOT IN (SELECT code_article FROM StockSolde)
+        GROUP BY m.code_article
+    """)
+
+
+def rebuild_stock(conn):
+    """Recalcule Stock, article par emplacement, en rejouant le registre"""
+    conn.execute("DELETE FROM Stock")
+    conn.execute(f"""
+        INSERT INTO Stock (code_article, quantite, emplacement)
+        SELECT code_article, SUM(quantite), emplacement
+        FROM ({_location_effects()})
+        GROUP BY code_article, emplacement
+    """)
+
+
+def rebuild_reservations(conn):
+    """Recalcule StockSolde.quantite_reservee à partir des réservations actives"""
+    conn.execute("""
+        UPDATE StockSolde
+        SET quantite_reservee = IFNULL((
+            SELECT SUM(r.quantite) FROM Reservations r
+            WHERE r.code_article = StockSolde.code_article AND r.statut = 'active'
+        ), 0)
+    """)
+
+
+def verify_reservations(conn):
+    """Compare StockSolde.quantite_reservee aux réservations actives.
+
+    Retourne la liste des écarts sous forme de dictionnaires
+    {code_article, reserve, reservations}.
+    """
+    rows = conn.execute("""
+        SELECT s.code_article, s.quantite_reservee AS reserve, IFNULL(SUM(r.quantite), 0) AS reservations
+        FROM StockSolde s
+        LEFT JOIN Reservations r ON r.code_article = s.code_article AND r.statut = 'active'
+        GROUP BY s.code_article
+        HAVING s.quantite_reservee != IFNULL(SUM(r.quantite), 0)
+    """).fetchall()
+    return [dict(row) for row in rows]
+
+
+def verify_balances(conn):
+    """Compare StockSolde au registre.
+
+    Retourne la liste des écarts sous forme de dictionnaires
+    {code_article, solde, registre}.
+    """
+    rows = conn.execute(f"""
+        SELECT code_article, SUM(solde) AS solde, SUM(registre) AS registre
+        FROM (
+            SELECT code_article, quantite AS solde, 0 AS registre FROM StockSolde
+            UNION ALL
+            SELECT m.code_article, 0, {signed_quantity('m')} FROM Mouvements m
+        )
+        GROUP BY code_article
+        HAVING SUM(solde) != SUM(registre)
+    """).fetchall()
+    return [dict(row) for row in rows]
+
+
+def verify_stock(conn):
+    """Compare Stock au registre, par article et emplacement.
+
+    Retourne la liste des écarts sous forme de dictionnaires
+    {code_article, emplacement, stock, registre}.
+    """
+    rows = conn.execute(f"""
+        SELECT code_article, emplacement, SUM(stock) AS stock, SUM(registre) AS registre
+        FROM (
+            SELECT code_article, emplacement, quantite AS stock, 0 AS registre FROM Stock
+            UNION ALL
+            SELECT code_article, emplacement, 0, quantite FROM ({_location_effects()})
+        )
+        GROUP BY code_article, emplacement
+        HAVING SUM(stock) != SUM(registre)
+    """).fetchall()
+    return [dict(row) for row in rows]
+
+
+def verify_rollups(conn):
+    """Compare les quantités et nombres de MouvementsJour au registre.
+
+    Retourne la liste des écarts (cumul moins registre) sous forme de
+    dictionnaires {jour, code_article, nombre, quantite_entree,
+    quantite_sortie, quantite_ajustement}.
+    """
+    rows = conn.execute(f"""
+        SELECT jour, code_article, SUM(nombre) AS nombre, SUM(quantite_entree) AS quantite_entree,
+               SUM(quantite_sortie) AS quantite_sortie, SUM(quantite_ajustement) AS quantite_ajustement
+        FROM (
+            SELECT jour, code_article, nombre, quantite_entree, quantite_sortie, quantite_ajustement
+            FROM MouvementsJour
+            UNION ALL
+            SELECT jour, code_article, -nombre, -quantite_entree, -quantite_sortie, -quantite_ajustement
+            FROM ({daily_rollup_values('m')} FROM Mouvements m)
+        )
+        GROUP BY jour, code_article
+        HAVING SUM(nombre) != 0 OR SUM(quantite_entree) != 0
+            OR SUM(quantite_sortie) != 0 OR SUM(quantite_ajustement) != 0
+    """).fetchall()
+    return [dict(row) for row in rows]
+
+
+def rebuild_rollups(conn):
+    """Recalcule MouvementsJour à partir du registre, aux prix actuels des articles"""
+    conn.execute("DELETE FROM MouvementsJour")
+    conn.execute(DAILY_ROLLUP_UPSERT.format(source=f"""
+        SELECT jour, code_article, SUM(quantite_entree), SUM(quantite_sortie), SUM(quantite_ajustement),
+               SUM(nombre), SUM(valeur_entree), SUM(valeur_sortie)
+        FROM ({daily_rollup_values('m')} FROM Mouvements m)
+        GROUP BY jour, code_article
+    """))
+
+
+# Indicateurs globaux en un seul parcours du catalogue joint aux soldes
+STATISTICS_QUERY = """
+    SELECT COUNT(*) AS nombre_articles,
+           IFNULL(SUM(s.quantite), 0) AS quantite_totale,
+           (SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL) AS nombre_alertes,
+           IFNULL(SUM(s.quantite * a.prix_vente), 0) AS valeur_stock
+    FROM Articles a
+    LEFT JOIN StockSolde s ON s.code_article = a.code_article
+"""
+
+
+def rebuild_statistics(conn):
+    """Recalcule la ligne de StatistiquesStock à partir du catalogue, des soldes et des alertes"""
+    conn.execute(f"""
+        INSERT OR REPLACE INTO StatistiquesStock (id, nombre_articles, quantite_totale, nombre_alertes, valeur_stock)
+        SELECT 1, * FROM ({STATISTICS_QUERY})
+    """)
+
+
+def verify_statistics(conn):
+    """Compare StatistiquesStock à un recalcul complet.
+
+    Retourne la liste des écarts sous forme de tuples (indicateur, tenu,
+    recalculé) ; la valeur du stock tolère l'arrondi des sommes successives.
+    """
+    tenu = conn.execute("""
+        SELECT nombre_articles, quantite_totale, nombre_alertes, valeur_stock
+        FROM StatistiquesStock WHERE id = 1
+    """).fetchone()
+    recalcule = conn.execute(STATISTICS_QUERY).fetchone()
+    if tenu is None:
+        return [(nom, None, recalcule[nom]) for nom in recalcule.keys()]
+    ecarts = []
+    for nom in recalcule.keys():
+        if nom == "valeur_stock":
+            if abs(tenu[nom] - recalcule[nom]) > 0.01:
+                ecarts.append((nom, tenu[nom], recalcule[nom]))
+        elif tenu[nom] != recalcule[nom]:
+            ecarts.append((nom, tenu[nom], recalcule[nom]))
+    return ecarts
+
+
+def reconcile_ledger_with_stock(conn, user_id=None):
+    """Ajoute au registre les ajustements qui l'alignent sur la table Stock.
+
+    Sert à la reprise des quantités saisies directement dans Stock, sans
+    mouvement. Retourne le nombre d'ajustements insérés.
+    """
+    ecarts = conn.execute(f"""
+        SELECT code_article, SUM(stock) - SUM(registre) AS ecart
+        FROM (
+            SELECT code_article, IFNULL(quantite, 0) AS stock, 0 AS registre FROM Stock
+            UNION ALL
+            SELECT m.code_article, 0, {signed_quantity('m')} FROM Mouvements m
+        )
+        WHERE code_article IS NOT NULL
+        GROUP BY code_article
+        HAVING SUM(stock) != SUM(registre)
+    """).fetchall()
+    maintenant = datetime.now()
+    conn.executemany("""
+        INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(AJUSTEMENT, row["code_article"], row["ecart"], maintenant, user_id) for row in ecarts])
+    return len(ecarts)
+
+
+def reconcile_ledger_with_locations(conn, user_id=None):
+    """Répartit le registre entre emplacements comme l'est la table Stock.
+
+    Les mouvements antérieurs aux emplacements sont rattachés à
+    EMPLACEMENT_DEFAUT ; des ajustements de sens opposé, nuls au total par
+    article, déplacent les quantités vers les emplacements saisis dans Stock.
+    Retourne le nombre d'ajustements insérés.
+    """
+    ecarts = conn.execute(f"""
+        SELECT code_article, emplacement, SUM(stock) - SUM(registre) AS ecart
+        FROM (
+            SELECT code_article, IFNULL(emplacement, :defaut) AS emplacement,
+                   IFNULL(quantite, 0) AS stock, 0 AS registre
+            FROM Stock
+            UNION ALL
+            SELECT m.code_article, m.emplacement, 0, {signed_quantity('m')} FROM Mouvements m
+        )
+        WHERE code_article IS NOT NULL
+        GROUP BY code_article, emplacement
+        HAVING SUM(stock) != SUM(registre)
+    """, {"defaut": EMPLACEMENT_DEFAUT}).fetchall()
+    maintenant = datetime.now()
+    conn.executemany("""
+        INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id, emplacement)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(AJUSTEMENT, row["code_article"], row["ecart"], maintenant, user_id, row["emplacement"])
+          for row in ecarts])
+    return len(ecarts)
+
+
+def balances_as_of(conn, instant, code_article=None):
+    """Retourne {code_article: quantité} au moment ``instant`` (mouvements antérieurs).
+
+    Part du dernier instantané pris au plus tard à ``instant`` et n'ajoute que
+    les mouvements postérieurs à celui-ci.
+    """
+    filtre_instantane = filtre_mouvement = ""
+    params = {"instant": instant, "code": code_article}
+    if code_article is not None:
+        filtre_instantane = "AND code_article = :code"
+        filtre_mouvement = "AND m.code_article = :code"
+    rows = conn.execute(f"""
+        WITH base AS (
+            SELECT MAX(date_instantane) AS date_instantane
+            FROM StockInstantanes
+            WHERE date_instantane <= :instant
+        )
+        SELECT code_article, SUM(quantite) AS quantite
+        FROM (
+            SELECT code_article, quantite
+            FROM StockInstantanes
+            WHERE date_instantane = (SELECT date_instantane FROM base) {filtre_instantane}
+            UNION ALL
+            SELECT m.code_article, {signed_quantity('m')}
+            FROM Mouvements m
+            WHERE m.date_mvt >= IFNULL((SELECT date_instantane FROM base), '')
+              AND m.date_mvt < :instant {filtre_mouvement}
+        )
+        GROUP BY code_article
+    """, params).fetchall()
+    return {row["code_article"]: row["quantite"] for row in rows}
+
+
+def last_snapshot(conn):
+    """Retourne la date du dernier instantané, ou None"""
+    return conn.execute("SELECT MAX(date_instantane) FROM StockInstantanes").fetchone()[0]
+
+
+def take_snapshot(conn, instant=None):
+    """Enregistre les soldes à ``instant`` (maintenant par défaut).
+
+    À appeler dans une transaction ; retourne le nombre d'articles enregistrés.
+    """
+    instant = instant or datetime.now()
+    soldes = balances_as_of(conn, instant)
+    conn.execute("DELETE FROM StockInstantanes WHERE date_instantane = ?", (instant,))
+    conn.executemany("""
+        INSERT INTO StockInstantanes (date_instantane, code_article, quantite)
+        VALUES (?, ?, ?)
+    """, [(instant, code, quantite) for code, quantite in soldes.items() if quantite])
+    return len(soldes)
+
+
+def snapshot_if_due(conn, intervalle=INTERVALLE_INSTANTANES):
+    """Prend un instantané si le dernier date de plus de ``intervalle``.
+
+    Retourne True si un instantané a été pris.
+    """
+    derniere = last_snapshot(conn)
+    maintenant = datetime.now()
+    if derniere and str(derniere) > str(maintenant - intervalle):
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Un autre poste a pu le prendre pendant l'attente du verrou
+        if last_snapshot(conn) != derniere:
+            conn.rollback()
+            return False
+        take_snapshot(conn, maintenant)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def _instant(texte):
+    """Interprète une date saisie ; une date seule désigne la fin de cette journée"""
+    instant = datetime.fromisoformat(texte)
+    if len(texte) <= 10:
+        instant += timedelta(days=1)
+    return instant
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des mouvements : soldes, instantanés, stock à une date")
+    parser.add_argument("commande", choices=("verifier", "reconstruire", "cumuls", "instantane", "stock-au"))
+    parser.add_argument("date", nargs="?", help="date pour stock-au (AAAA-MM-JJ ou AAAA-MM-JJTHH:MM)")
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    parser.add_argument("--article", help="limite stock-au à un article")
+    args = parser.parse_args()
+    if args.commande != "stock-au" and args.date:
+        # Sans date, le seul positionnel est la base
+        args.base = args.date
+    elif args.commande == "stock-au" and not args.date:
+        parser.error("stock-au attend une date")
+
+    from database.db import Database
+    from database.query_cache import signaler_modification
+    db = Database(args.base)
+    db.initialize()
+    with db.get_connection() as conn:
+        if args.commande == "stock-au":
+            soldes = balances_as_of(conn, _instant(args.date), args.article)
+            for code, quantite in sorted(soldes.items()):
+                print(f"  {code} : {quantite}")
+            print(f"{len(soldes)} article(s) au {args.date}.")
+            return
+        if args.commande == "instantane":
+            conn.execute("BEGIN IMMEDIATE")
+            nombre = take_snapshot(conn)
+            conn.commit()
+            print(f"Instantané enregistré pour {nombre} article(s).")
+            return
+        if args.commande == "reconstruire":
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild_balances(conn)
+            rebuild_reservations(conn)
+            rebuild_stock(conn)
+            rebuild_statistics(conn)
+            signaler_modification(conn, "Mouvements")
+            conn.commit()
+            print("Soldes, stock par emplacement et indicateurs reconstruits à partir du registre des mouvements.")
+        if args.commande == "cumuls":
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild_rollups(conn)
+            signaler_modification(conn, "Mouvements")
+            conn.commit()
+            print("Cumuls journaliers recalculés (valeurs aux prix actuels des articles).")
+        ecarts = verify_balances(conn)
+        ecarts_stock = verify_stock(conn)
+        ecarts_reservations = verify_reservations(conn)
+        ecarts_cumuls = verify_rollups(conn)
+        ecarts_statistiques = verify_statistics(conn)
+
+    total = (len(ecarts) + len(ecarts_stock) + len(ecarts_reservations) + len(ecarts_cumuls)
+             + len(ecarts_statistiques))
+    if total:
+        print(f"{total} solde(s) ou cumul(s) incohérent(s) :")
+        for ecart in ecarts:
+            print(f"  {ecart['code_article']} : solde {ecart['solde']}, registre {ecart['registre']}")
+        for ecart in ecarts_stock:
+            print(f"  {ecart['code_article']} ({ecart['emplacement']}) : stock {ecart['stock']}, "
+                  f"registre {ecart['registre']}")
+        for ecart in ecarts_reservations:
+            print(f"  {ecart['code_article']} : réservé {ecart['reserve']}, "
+                  f"réservations actives {ecart['reservations']}")
+        for ecart in ecarts_cumuls:
+            print(f"  {ecart['code_article']} le {ecart['jour']} : écart de {ecart['nombre']} mouvement(s), "
+                  f"entrées {ecart['quantite_entree']}, sorties {ecart['quantite_sortie']}")
+        for indicateur, tenu, recalcule in ecarts_statistiques:
+            print(f"  indicateur {indicateur} : tenu {tenu}, recalculé {recalcule}")
+        raise SystemExit(1)
+    print("Les soldes, le stock, les réservations, les cumuls et les indicateurs sont cohérents "
+          "avec le registre des mouvements.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,872 @@
+# database/migrations.py
+"""Migrations versionnées du schéma de la base de stock.
+
+Chaque migration porte un numéro de version croissant et est enregistrée
+dans la table schema_version une fois appliquée. Au démarrage, une seule
+lecture de schema_version suffit quand le schéma est à jour.
+
+Application manuelle :
+    python -m database.migrations [base]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+# Taille des tranches pour les migrations de données volumineuses
+BATCH_SIZE = 50000
+
+MIGRATIONS = []
+
+
+class Migration:
+    def __init__(self, version, description, apply, batched=False):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        # Une migration par tranches gère ses propres transactions
+        self.batched = batched
+
+
+def migration(version, description, batched=False):
+    """Enregistre une étape de migration (décorateur)"""
+    def decorator(apply):
+        MIGRATIONS.append(Migration(version, description, apply, batched))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return apply
+    return decorator
+
+
+class MigrationContext:
+    """Outils mis à disposition d'une étape de migration"""
+
+    def __init__(self, conn, migration, progress=None):
+        self.conn = conn
+        self.migration = migration
+        self.progress = progress
+
+    def report(self, done, total):
+        if self.progress:
+            self.progress(self.migration, done, total)
+
+    def run_in_batches(self, table, statement, batch_size=BATCH_SIZE, last=None):
+        """Exécute ``statement`` par tranches de rowid, une transaction par tranche.
+
+        La requête reçoit les paramètres nommés :debut (exclu) et :fin (inclus).
+        La position atteinte est enregistrée dans la même transaction que la
+        tranche : une migration interrompue reprend là où elle s'était arrêtée.
+        ``last`` borne le traitement (par défaut, le plus grand rowid actuel).
+        """
+        conn = self.conn
+        version = self.migration.version
+        row = conn.execute(
+            "SELECT position FROM schema_batch_progress WHERE version = ? AND nom_table = ?",
+            (version, table)
+        ).fetchone()
+        start = row[0] if row else 0
+        if last is None:
+            last = conn.execute(f"SELECT IFNULL(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        self.report(min(start, last), last)
+
+        while start < last:
+            end = min(start + batch_size, last)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(statement, {"debut": start, "fin": end})
+                conn.execute("""
+                    INSERT OR REPLACE INTO schema_batch_progress (version, nom_table, position)
+                    VALUES (?, ?, ?)
+                """, (version, table, end))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            start = end
+            self.report(start, last)
+
+    def checkpoint(self, name, compute):
+        """Retourne une valeur enregistrée pour la migration, calculée au premier appel.
+
+        ``compute(conn)`` est exécutée sous verrou d'écriture et peut créer des
+        objets du schéma : la valeur et ces objets sont validés ensemble.
+        """
+        conn = self.conn
+        version = self.migration.version
+        row = conn.execute(
+            "SELECT position FROM schema_batch_progress WHERE version = ? AND nom_table = ?",
+            (version, name)
+        ).fetchone()
+        if row:
+            return row[0]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = compute(conn)
+            conn.execute("""
+                INSERT INTO schema_batch_progress (version, nom_table, position)
+                VALUES (?, ?, ?)
+            """, (version, name, value))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return value
+
+    def create_indexes(self, statements):
+        """Crée des index un par un, chacun dans sa propre transaction.
+
+        SQLite construit un index en une seule instruction : découper la liste
+        limite la durée de chaque verrou d'écriture à la construction d'un index.
+        """
+        conn = self.conn
+        total = len(statements)
+        self.report(0, total)
+        for done, statement in enumerate(statements, 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(statement)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self.report(done, total)
+
+
+def _ensure_version_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME NOT NULL,
+            duration_ms INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_batch_progress (
+            version INTEGER NOT NULL,
+            nom_table TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (version, nom_table)
+        )
+    """)
+    conn.commit()
+
+
+def latest_version():
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(conn):
+    """Retourne la version du schéma, 0 pour une base jamais migrée"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except Exception:
+        return 0
+    return row[0] or 0
+
+
+def is_up_to_date(conn):
+    return current_version(conn) >= latest_version()
+
+
+def pending_migrations(conn):
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(conn, progress=None):
+    """Applique les migrations manquantes et retourne celles qui l'ont été"""
+    # Chemin rapide : une seule lecture quand le schéma est à jour
+    if is_up_to_date(conn):
+        return []
+
+    _ensure_version_tables(conn)
+    applied = []
+    for step in pending_migrations(conn):
+        context = MigrationContext(conn, step, progress)
+        started = time.perf_counter()
+        try:
+            if step.batched:
+                # Les tranches valident elles-mêmes leurs transactions
+                step.apply(conn, context)
+                conn.execute("BEGIN IMMEDIATE")
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+                # Une autre instance a pu appliquer l'étape pendant l'attente du verrou
+                if current_version(conn) >= step.version:
+                    conn.rollback()
+                    continue
+                step.apply(conn, context)
+            conn.execute("""
+                INSERT OR IGNORE INTO schema_version (version, description, applied_at, duration_ms)
+                VALUES (?, ?, ?, ?)
+            """, (step.version, step.description, datetime.now(),
+                  int((time.perf_counter() - started) * 1000)))
+            conn.execute("DELETE FROM schema_batch_progress WHERE version = ?", (step.version,))
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(step)
+    return applied
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column_if_missing(conn, table, column, declaration):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+@migration(1, "Schéma initial")
+def _schema_initial(conn, context):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Utilisateurs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            nom_complet TEXT,
+            last_login DATETIME
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Articles (
+            code_article TEXT PRIMARY KEY,
+            designation TEXT NOT NULL,
+            categorie TEXT,
+            prix_achat REAL,
+            prix_vente REAL,
+            seuil_alerte INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code_article TEXT,
+            quantite INTEGER,
+            emplacement TEXT,
+            FOREIGN KEY (code_article) REFERENCES Articles(code_article)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Mouvements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT,
+            code_article TEXT,
+            quantite INTEGER,
+            date_mvt DATETIME,
+            user_id INTEGER,
+            FOREIGN KEY (code_article) REFERENCES Articles(code_article),
+            FOREIGN KEY (user_id) REFERENCES Utilisateurs(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Fournisseurs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT NOT NULL,
+            contact TEXT
+        )
+    """)
+
+
+@migration(2, "Colonne Articles.code_barre")
+def _articles_code_barre(conn, context):
+    _add_column_if_missing(conn, "Articles", "code_barre", "TEXT")
+
+
+@migration(3, "Colonnes Fournisseurs.email et Fournisseurs.adresse")
+def _fournisseurs_coordonnees(conn, context):
+    _add_column_if_missing(conn, "Fournisseurs", "email", "TEXT")
+    _add_column_if_missing(conn, "Fournisseurs", "adresse", "TEXT")
+
+
+@migration(4, "Index des requêtes critiques", batched=True)
+def _index_requetes_critiques(conn, context):
+    from database.indexes import MANAGED_INDEXES
+    context.create_indexes([MANAGED_INDEXES[name] for name in (
+        "idx_stock_code_article",
+        "idx_mouvements_date",
+        "idx_mouvements_type_article",
+        "idx_articles_code_barre",
+    )])
+
+
+@migration(5, "Soldes de stock matérialisés (StockSolde)")
+def _stock_solde(conn, context):
+    from database.ledger import reconcile_ledger_with_stock, rebuild_balances, signed_quantity
+    conn.execute("UPDATE Mouvements SET type = 'sortie' WHERE type = 'SORTIE'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StockSolde (
+            code_article TEXT PRIMARY KEY,
+            quantite INTEGER NOT NULL DEFAULT 0,
+            date_maj DATETIME
+        )
+    """)
+    # Reprise des quantités saisies dans Stock sans mouvement correspondant
+    reconcile_ledger_with_stock(conn)
+    rebuild_balances(conn)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mouvements_solde
+        AFTER INSERT ON Mouvements
+        BEGIN
+            INSERT INTO StockSolde (code_article, quantite, date_maj)
+            VALUES (NEW.code_article, {signed_quantity('NEW')}, NEW.date_mvt)
+            ON CONFLICT (code_article) DO UPDATE
+            SET quantite = quantite + excluded.quantite, date_maj = excluded.date_maj;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_solde
+        AFTER INSERT ON Articles
+        BEGIN
+            INSERT OR IGNORE INTO StockSolde (code_article, quantite) VALUES (NEW.code_article, 0);
+        END
+    """)
+
+
+@migration(6, "Registre des mouvements en ajout seul, Stock par emplacement et instantanés")
+def _registre_mouvements(conn, context):
+    from database.ledger import EMPLACEMENT_DEFAUT, reconcile_ledger_with_locations, signed_quantity
+    _add_column_if_missing(conn, "Mouvements", "emplacement",
+                           f"TEXT NOT NULL DEFAULT '{EMPLACEMENT_DEFAUT}'")
+    reconcile_ledger_with_locations(conn)
+    # Stock devient la projection du registre par article et emplacement
+    conn.execute("DELETE FROM Stock")
+    conn.execute(f"""
+        INSERT INTO Stock (code_article, quantite, emplacement)
+        SELECT m.code_article, SUM({signed_quantity('m')}), m.emplacement
+        FROM Mouvements m
+        GROUP BY m.code_article, m.emplacement
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_article_emplacement
+        ON Stock (code_article, emplacement)
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mouvements_stock
+        AFTER INSERT ON Mouvements
+        BEGIN
+            INSERT INTO Stock (code_article, quantite, emplacement)
+            VALUES (NEW.code_article, {signed_quantity('NEW')}, NEW.emplacement)
+            ON CONFLICT (code_article, emplacement) DO UPDATE
+            SET quantite = quantite + excluded.quantite;
+        END
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StockInstantanes (
+            date_instantane DATETIME NOT NULL,
+            code_article TEXT NOT NULL,
+            quantite INTEGER NOT NULL,
+            PRIMARY KEY (date_instantane, code_article)
+        ) WITHOUT ROWID
+    """)
+    # Un mouvement antidaté rend caducs les instantanés pris après sa date
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mouvements_instantanes
+        AFTER INSERT ON Mouvements
+        BEGIN
+            DELETE FROM StockInstantanes WHERE date_instantane > NEW.date_mvt;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mouvements_sans_modification
+        BEFORE UPDATE ON Mouvements
+        BEGIN
+            SELECT RAISE(ABORT, 'Registre des mouvements en ajout seul : enregistrer un ajustement');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mouvements_sans_suppression
+        BEFORE DELETE ON Mouvements
+        BEGIN
+            SELECT RAISE(ABORT, 'Registre des mouvements en ajout seul : enregistrer un ajustement');
+        END
+    """)
+    from database.indexes import MANAGED_INDEXES
+    conn.execute(MANAGED_INDEXES["idx_mouvements_article_date"])
+
+
+@migration(7, "Transferts entre emplacements et index par emplacement")
+def _transferts_emplacements(conn, context):
+    from database.ledger import location_quantity
+    _add_column_if_missing(conn, "Mouvements", "destination", "TEXT")
+    # Un transfert retire de son emplacement et ajoute à sa destination
+    conn.execute("DROP TRIGGER IF EXISTS trg_mouvements_stock")
+    conn.execute(f"""
+        CREATE TRIGGER trg_mouvements_stock
+        AFTER INSERT ON Mouvements
+        BEGIN
+            INSERT INTO Stock (code_article, quantite, emplacement)
+            VALUES (NEW.code_article, {location_quantity('NEW')}, NEW.emplacement)
+            ON CONFLICT (code_article, emplacement) DO UPDATE
+            SET quantite = quantite + excluded.quantite;
+            INSERT INTO Stock (code_article, quantite, emplacement)
+            SELECT NEW.code_article, NEW.quantite, NEW.destination
+            WHERE lower(NEW.type) = 'transfert'
+            ON CONFLICT (code_article, emplacement) DO UPDATE
+            SET quantite = quantite + excluded.quantite;
+        END
+    """)
+    from database.indexes import MANAGED_INDEXES
+    for name in ("idx_stock_emplacement_article", "idx_mouvements_emplacement_date",
+                 "idx_mouvements_destination_date"):
+        conn.execute(MANAGED_INDEXES[name])
+
+
+@migration(8, "Réservations de stock et quantité réservée par article")
+def _reservations(conn, context):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code_article TEXT NOT NULL,
+            quantite INTEGER NOT NULL CHECK (quantite > 0),
+            reference TEXT,
+            statut TEXT NOT NULL DEFAULT 'active',
+            date_creation DATETIME NOT NULL,
+            date_expiration DATETIME NOT NULL,
+            date_cloture DATETIME,
+            user_id INTEGER,
+            FOREIGN KEY (code_article) REFERENCES Articles(code_article),
+            FOREIGN KEY (user_id) REFERENCES Utilisateurs(id)
+        )
+    """)
+    _add_column_if_missing(conn, "StockSolde", "quantite_reservee", "INTEGER NOT NULL DEFAULT 0")
+    # Agrégat tenu par trigger : le disponible d'un article se lit sur une seule ligne
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reservations_ouverture
+        AFTER INSERT ON Reservations
+        WHEN NEW.statut = 'active'
+        BEGIN
+            INSERT INTO StockSolde (code_article, quantite, quantite_reservee)
+            VALUES (NEW.code_article, 0, NEW.quantite)
+            ON CONFLICT (code_article) DO UPDATE
+            SET quantite_reservee = quantite_reservee + excluded.quantite_reservee;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reservations_cloture
+        AFTER UPDATE OF statut ON Reservations
+        WHEN OLD.statut = 'active' AND NEW.statut != 'active'
+        BEGIN
+            UPDATE StockSolde
+            SET quantite_reservee = quantite_reservee - OLD.quantite
+            WHERE code_article = OLD.code_article;
+        END
+    """)
+    from database.indexes import MANAGED_INDEXES
+    for name in ("idx_reservations_statut_expiration", "idx_reservations_article"):
+        conn.execute(MANAGED_INDEXES[name])
+
+
+def _evaluer_alerte(code, quantite, seuil):
+    """Instructions de trigger qui ouvrent ou résolvent l'alerte d'un article"""
+    return f"""
+            INSERT INTO Alertes (code_article, seuil, quantite, date_levee)
+            SELECT {code}, {seuil}, {quantite}, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE {quantite} <= {seuil}
+              AND NOT EXISTS (SELECT 1 FROM Alertes WHERE code_article = {code} AND date_resolution IS NULL);
+            UPDATE Alertes SET date_resolution = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE code_article = {code} AND date_resolution IS NULL
+              AND ({seuil} IS NULL OR {quantite} > {seuil});
+    """
+
+
+@migration(9, "Alertes de stock tenues à jour par trigger")
+def _alertes(conn, context):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Alertes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code_article TEXT NOT NULL,
+            seuil INTEGER,
+            quantite INTEGER,
+            date_levee DATETIME NOT NULL,
+            date_resolution DATETIME
+        )
+    """)
+    # Au plus une alerte ouverte par article
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_alertes_ouvertes
+        ON Alertes (code_article) WHERE date_resolution IS NULL
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS AlertesEvenements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            alerte_id INTEGER NOT NULL,
+            code_article TEXT NOT NULL,
+            transition TEXT NOT NULL,
+            date_evenement DATETIME NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_alertes_levee
+        AFTER INSERT ON Alertes
+        BEGIN
+            INSERT INTO AlertesEvenements (alerte_id, code_article, transition, date_evenement)
+            VALUES (NEW.id, NEW.code_article, 'levee', NEW.date_levee);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_alertes_resolution
+        AFTER UPDATE OF date_resolution ON Alertes
+        WHEN OLD.date_resolution IS NULL AND NEW.date_resolution IS NOT NULL
+        BEGIN
+            INSERT INTO AlertesEvenements (alerte_id, code_article, transition, date_evenement)
+            VALUES (NEW.id, NEW.code_article, 'resolue', NEW.date_resolution);
+        END
+    """)
+    # Seuls les articles touchés par un mouvement ou un changement de seuil sont réévalués
+    seuil_article = "(SELECT seuil_alerte FROM Articles WHERE code_article = NEW.code_article)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_solde_alerte_insertion
+        AFTER INSERT ON StockSolde
+        BEGIN
+            {_evaluer_alerte("NEW.code_article", "NEW.quantite", seuil_article)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_solde_alerte
+        AFTER UPDATE OF quantite ON StockSolde
+        WHEN NEW.quantite IS NOT OLD.quantite
+        BEGIN
+            {_evaluer_alerte("NEW.code_article", "NEW.quantite", seuil_article)}
+        END
+    """)
+    solde_article = "IFNULL((SELECT quantite FROM StockSolde WHERE code_article = NEW.code_article), 0)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_seuil_alerte
+        AFTER UPDATE OF seuil_alerte ON Articles
+        WHEN NEW.seuil_alerte IS NOT OLD.seuil_alerte
+        BEGIN
+            {_evaluer_alerte("NEW.code_article", solde_article, "NEW.seuil_alerte")}
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_suppression_alerte
+        AFTER DELETE ON Articles
+        BEGIN
+            UPDATE Alertes SET date_resolution = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE code_article = OLD.code_article AND date_resolution IS NULL;
+        END
+    """)
+    # État initial : une alerte ouverte par article déjà sous son seuil
+    conn.execute("""
+        INSERT INTO Alertes (code_article, seuil, quantite, date_levee)
+        SELECT a.code_article, a.seuil_alerte, IFNULL(s.quantite, 0), strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+        FROM Articles a
+        LEFT JOIN StockSolde s ON a.code_article = s.code_article
+        WHERE IFNULL(s.quantite, 0) <= a.seuil_alerte
+          AND NOT EXISTS (SELECT 1 FROM Alertes al WHERE al.code_article = a.code_article AND al.date_resolution IS NULL)
+    """)
+
+
+@migration(10, "Cumuls journaliers des mouvements par article (MouvementsJour)", batched=True)
+def _mouvements_jour(conn, context):
+    from database.indexes import MANAGED_INDEXES
+    from database.ledger import DAILY_ROLLUP_UPSERT, daily_rollup_values
+
+    def creer(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS MouvementsJour (
+                jour DATE NOT NULL,
+                code_article TEXT NOT NULL,
+                quantite_entree INTEGER NOT NULL DEFAULT 0,
+                quantite_sortie INTEGER NOT NULL DEFAULT 0,
+                quantite_ajustement INTEGER NOT NULL DEFAULT 0,
+                nombre INTEGER NOT NULL DEFAULT 0,
+                valeur_entree REAL NOT NULL DEFAULT 0,
+                valeur_sortie REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (jour, code_article)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(MANAGED_INDEXES["idx_mouvements_jour_article"])
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_mouvements_jour
+            AFTER INSERT ON Mouvements
+            BEGIN
+                {DAILY_ROLLUP_UPSERT.format(source=daily_rollup_values("NEW"))};
+            END
+        """)
+        # Les mouvements postérieurs sont cumulés par le trigger, la reprise s'arrête ici
+        return conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM Mouvements").fetchone()[0]
+
+    borne = context.checkpoint("Mouvements:borne", creer)
+    context.run_in_batches("Mouvements", DAILY_ROLLUP_UPSERT.format(source=f"""
+        SELECT jour, code_article, SUM(quantite_entree), SUM(quantite_sortie), SUM(quantite_ajustement),
+               SUM(nombre), SUM(valeur_entree), SUM(valeur_sortie)
+        FROM ({daily_rollup_values("m")} FROM Mouvements m WHERE m.rowid > :debut AND m.rowid <= :fin)
+        GROUP BY jour, code_article
+    """), last=borne)
+
+
+@migration(11, "Compteurs de modification des tables (VersionsTables)")
+def _versions_tables(conn, context):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS VersionsTables (
+            nom_table TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    # Tables sources : les projections (StockSolde, Alertes, MouvementsJour) en découlent
+    for table in ("Articles", "Stock", "Mouvements", "Reservations"):
+        conn.execute("INSERT OR IGNORE INTO VersionsTables (nom_table) VALUES (?)", (table,))
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_versions_{table.lower()}_{operation.lower()}
+                AFTER {operation} ON {table}
+                BEGIN
+                    UPDATE VersionsTables SET version = version + 1 WHERE nom_table = '{table}';
+                END
+            """)
+
+
+@migration(12, "Indicateurs globaux du stock tenus à jour par trigger (StatistiquesStock)")
+def _statistiques_stock(conn, context):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS StatistiquesStock (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            nombre_articles INTEGER NOT NULL DEFAULT 0,
+            quantite_totale INTEGER NOT NULL DEFAULT 0,
+            nombre_alertes INTEGER NOT NULL DEFAULT 0,
+            valeur_stock REAL NOT NULL DEFAULT 0
+        )
+    """)
+    # Un seul parcours du catalogue joint aux soldes ; les soldes d'articles supprimés sont ignorés
+    conn.execute("""
+        INSERT OR REPLACE INTO StatistiquesStock (id, nombre_articles, quantite_totale, nombre_alertes, valeur_stock)
+        SELECT 1, COUNT(*), IFNULL(SUM(s.quantite), 0),
+               (SELECT COUNT(*) FROM Alertes WHERE date_resolution IS NULL),
+               IFNULL(SUM(s.quantite * a.prix_vente), 0)
+        FROM Articles a
+        LEFT JOIN StockSolde s ON s.code_article = a.code_article
+    """)
+    # Variation des soldes, pour les seuls articles du catalogue
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_solde_insertion
+        AFTER INSERT ON StockSolde
+        BEGIN
+            UPDATE StatistiquesStock
+            SET quantite_totale = quantite_totale + NEW.quantite,
+                valeur_stock = valeur_stock + NEW.quantite * IFNULL((SELECT prix_vente FROM Articles WHERE code_article = NEW.code_article), 0)
+            WHERE id = 1 AND EXISTS (SELECT 1 FROM Articles WHERE code_article = NEW.code_article);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_solde
+        AFTER UPDATE OF quantite ON StockSolde
+        WHEN NEW.quantite IS NOT OLD.quantite
+        BEGIN
+            UPDATE StatistiquesStock
+            SET quantite_totale = quantite_totale + NEW.quantite - OLD.quantite,
+                valeur_stock = valeur_stock + (NEW.quantite - OLD.quantite) * IFNULL((SELECT prix_vente FROM Articles WHERE code_article = NEW.code_article), 0)
+            WHERE id = 1 AND EXISTS (SELECT 1 FROM Articles WHERE code_article = NEW.code_article);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_solde_suppression
+        AFTER DELETE ON StockSolde
+        BEGIN
+            UPDATE StatistiquesStock
+            SET quantite_totale = quantite_totale - OLD.quantite,
+                valeur_stock = valeur_stock - OLD.quantite * IFNULL((SELECT prix_vente FROM Articles WHERE code_article = OLD.code_article), 0)
+            WHERE id = 1 AND EXISTS (SELECT 1 FROM Articles WHERE code_article = OLD.code_article);
+        END
+    """)
+    # Catalogue : un nouvel article a un solde nul, sauf s'il reprend le solde d'un article supprimé
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_article_insertion
+        AFTER INSERT ON Articles
+        BEGIN
+            UPDATE StatistiquesStock
+            SET nombre_articles = nombre_articles + 1,
+                quantite_totale = quantite_totale + IFNULL((SELECT quantite FROM StockSolde WHERE code_article = NEW.code_article), 0),
+                valeur_stock = valeur_stock + IFNULL((SELECT quantite FROM StockSolde WHERE code_article = NEW.code_article), 0)
+                                              * IFNULL(NEW.prix_vente, 0)
+            WHERE id = 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_article_suppression
+        AFTER DELETE ON Articles
+        BEGIN
+            UPDATE StatistiquesStock
+            SET nombre_articles = nombre_articles - 1,
+                quantite_totale = quantite_totale - IFNULL((SELECT quantite FROM StockSolde WHERE code_article = OLD.code_article), 0),
+                valeur_stock = valeur_stock - IFNULL((SELECT quantite FROM StockSolde WHERE code_article = OLD.code_article), 0)
+                                              * IFNULL(OLD.prix_vente, 0)
+            WHERE id = 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_article_prix
+        AFTER UPDATE OF prix_vente ON Articles
+        WHEN NEW.prix_vente IS NOT OLD.prix_vente
+        BEGIN
+            UPDATE StatistiquesStock
+            SET valeur_stock = valeur_stock + IFNULL((SELECT quantite FROM StockSolde WHERE code_article = NEW.code_article), 0)
+                                              * (IFNULL(NEW.prix_vente, 0) - IFNULL(OLD.prix_vente, 0))
+            WHERE id = 1;
+        END
+    """)
+    # Alertes ouvertes
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_alerte_levee
+        AFTER INSERT ON Alertes
+        WHEN NEW.date_resolution IS NULL
+        BEGIN
+            UPDATE StatistiquesStock SET nombre_alertes = nombre_alertes + 1 WHERE id = 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_statistiques_alerte_resolution
+        AFTER UPDATE OF date_resolution ON Alertes
+        WHEN OLD.date_resolution IS NULL AND NEW.date_resolution IS NOT NULL
+        BEGIN
+            UPDATE StatistiquesStock SET nombre_alertes = nombre_alertes - 1 WHERE id = 1;
+        END
+    """)
+
+
+@migration(13, "Index de pagination du catalogue et de l'historique par type", batched=True)
+def _index_pagination(conn, context):
+    # Pages ordonnées par (désignation, code) et par date dans un type de mouvement
+    from database.indexes import MANAGED_INDEXES
+    context.create_indexes([MANAGED_INDEXES[name] for name in (
+        "idx_articles_designation",
+        "idx_mouvements_type_date",
+    )])
+
+
+@migration(14, "Index plein texte du catalogue (ArticlesFTS)")
+def _index_plein_texte(conn, context):
+    from database.search_index import create_search_index
+    # Sans FTS5 dans SQLite, la recherche d'articles reste en LIKE
+    create_search_index(conn)
+
+
+@migration(15, "Codes-barres des articles, plusieurs par article (CodesBarres)")
+def _codes_barres(conn, context):
+    # Valeur normalisée (core.produit_manager.normaliser_code_barre) ; le code article,
+    # encodé par les étiquettes Code128 générées, reste reconnu sans y figurer
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS CodesBarres (
+            code TEXT PRIMARY KEY,
+            code_article TEXT NOT NULL REFERENCES Articles (code_article),
+            date_ajout DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+    from database.indexes import MANAGED_INDEXES
+    conn.execute(MANAGED_INDEXES["idx_codes_barres_article"])
+    # Les codes suivent leur article (clés étrangères non appliquées par SQLite par défaut)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_codes_barres_article_suppression
+        AFTER DELETE ON Articles
+        BEGIN
+            DELETE FROM CodesBarres WHERE code_article = OLD.code_article;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_codes_barres_article_code
+        AFTER UPDATE OF code_article ON Articles
+        BEGIN
+            UPDATE CodesBarres SET code_article = NEW.code_article WHERE code_article = OLD.code_article;
+        END
+    """)
+    # Compteur de modification, pour le cache des lectures de codes
+    conn.execute("INSERT OR IGNORE INTO VersionsTables (nom_table) VALUES ('CodesBarres')")
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_versions_codesbarres_{operation.lower()}
+            AFTER {operation} ON CodesBarres
+            BEGIN
+                UPDATE VersionsTables SET version = version + 1 WHERE nom_table = 'CodesBarres';
+            END
+        """)
+
+
+@migration(16, "Repères des exports incrémentaux (EtatsExport)")
+def _etats_export(conn, context):
+    # Un export nommé reprend après le dernier repère exporté (core.export_manager)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS EtatsExport (
+            nom TEXT PRIMARY KEY,
+            jeu TEXT NOT NULL,
+            repere,
+            date_export DATETIME NOT NULL,
+            lignes INTEGER NOT NULL
+        )
+    """)
+
+
+@migration(17, "File des exports en arrière-plan (TachesExport)")
+def _taches_export(conn, context):
+    # Exports soumis à core.export_jobs : statut, progression et fichier produit
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS TachesExport (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jeu TEXT NOT NULL,
+            format TEXT NOT NULL,
+            fichier TEXT NOT NULL,
+            options TEXT NOT NULL DEFAULT '{}',
+            statut TEXT NOT NULL DEFAULT 'en_attente',
+            lignes INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            resultat INTEGER,
+            message TEXT,
+            user_id INTEGER,
+            poste TEXT,
+            date_creation DATETIME NOT NULL,
+            date_debut DATETIME,
+            date_fin DATETIME,
+            date_maj DATETIME
+        )
+    """)
+    from database.indexes import MANAGED_INDEXES
+    conn.execute(MANAGED_INDEXES["idx_taches_export_statut"])
+
+
+@migration(18, "Empreinte des étiquettes code-barres (Articles.empreinte_code_barre)")
+def _empreinte_code_barre(conn, context):
+    # Une étiquette dont l'empreinte n'a pas changé n'est pas redessinée (database.generation_code)
+    _add_column_if_missing(conn, "Articles", "empreinte_code_barre", "TEXT")
+
+
+@migration(19, "Index de l'historique trié par date, dates absentes comprises", batched=True)
+def _index_historique_date(conn, context):
+    # L'historique paginé trie sur IFNULL(date_mvt, '') : une date NULL reste dans les pages
+    from database.indexes import MANAGED_INDEXES
+    context.create_indexes([MANAGED_INDEXES[name] for name in (
+        "idx_mouvements_date_tri",
+        "idx_mouvements_type_date_tri",
+    )])
+
+
+def _print_progress(step, done, total):
+    percent = done / total * 100 if total else 100.0
+    print(f"  [{step.version}] {step.description} : {done}/{total} ({percent:.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Applique les migrations du schéma de stock")
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    parser.add_argument("--status", action="store_true", help="affiche l'état sans migrer")
+    args = parser.parse_args()
+
+    from database.db import Database
+    db = Database(args.base)
+    with db.get_connection() as conn:
+        print(f"Version du schéma : {current_version(conn)} (dernière : {latest_version()})")
+        pending = pending_migrations(conn)
+        for step in pending:
+            print(f"  à appliquer : [{step.version}] {step.description}")
+        if args.status:
+            sys.exit(1 if pending else 0)
+        for step in migrate(conn, progress=_print_progress):
+            print(f"Migration {step.version} appliquée : {step.description}")
+    print("Schéma à jour.")
+
+
+if __name__ == "__main__":
+    main()
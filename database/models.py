@@ -35,6 +35,13 @@ class Mouvement:
     quantite: int
     date_mvt: datetime
     user_id: int
+    emplacement: str = "Magasin"
+
+@dataclass
+class StockInstantane:
+    date_instantane: datetime
+    code_article: str
+    quantite: int
 
 @dataclass
 class Fournisseur:
@@ -0,0 +1,181 @@
+# database/pagination.py
+"""Lecture par pages d'une requête triée, sans OFFSET (pagination par clé).
+
+La page suivante reprend après la dernière ligne lue :
+    WHERE tri >= ? AND (tri > ? OR clé > ?) ORDER BY tri, clé LIMIT ?
+Avec un index sur (tri, clé), chaque page coûte une descente d'index, quelle
+que soit sa position dans la table. La clé (unique) départage les lignes de
+même valeur de tri.
+
+Chaque ligne lue se termine par sa valeur de tri et sa clé : c'est l'ancre
+de la page suivante ou précédente.
+
+RowsQuery offre la même lecture sur des lignes déjà en mémoire (résultat
+d'une recherche), pour les afficher dans le même Treeview virtuel.
+"""
+from bisect import bisect_left, bisect_right
+
+# Lignes lues par page
+PAGE_SIZE = 200
+
+
+class PagedQuery:
+    """Requête paginée : colonnes lues, tables, filtre et clé unique de départage"""
+
+    def __init__(self, select, from_, key, sort_columns, where=None, params=(), count_from=None):
+        self.select = select
+        self.from_ = from_
+        self.key = key
+        # Colonne affichée -> expression SQL de tri, jamais NULL (IFNULL au besoin)
+        self.sort_columns = sort_columns
+        self.where = where
+        self.params = tuple(params)
+        # Tables suffisant au filtre et aux expressions de tri, pour les comptages
+        # (sans les jointures qui n'ajoutent que des colonnes affichées)
+        self.count_from = count_from or from_
+
+    def filtered(self, where, params=()):
+        """Retourne la même requête restreinte par ``where``"""
+        return PagedQuery(self.select, self.from_, self.key, self.sort_columns, where, params, self.count_from)
+
+    def _conditions(self, sort, descending, anchor, inclusive):
+        conditions, params = [], []
+        if self.where:
+            conditions.append(f"({self.where})")
+            params.extend(self.params)
+        if anchor is not None:
+            expression = self.sort_columns[sort]
+            op = "<" if descending else ">"
+            conditions.append(f"{expression} {op}= ? AND ({expression} {op} ? OR {self.key} {op}{'=' if inclusive else ''} ?)")
+            params.extend((anchor[0], anchor[0], anchor[1]))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def page(self, conn, sort, descending=False, anchor=None, inclusive=False, limit=PAGE_SIZE):
+        """Retourne jusqu'à ``limit`` lignes après ``anchor`` (valeur de tri, clé), dans l'ordre demandé.
+
+        ``inclusive`` inclut la ligne de l'ancre ; sans ancre, la page part du début.
+        """
+        expression = self.sort_columns[sort]
+        where, params = self._conditions(sort, descending, anchor, inclusive)
+        order = "DESC" if descending else "ASC"
+        params.append(limit)
+        return [tuple(row) for row in conn.execute(
+            f"SELECT {self.select}, {expression}, {self.key} FROM {self.from_}{where}"
+            f" ORDER BY {expression} {order}, {self.key} {order} LIMIT ?", params
+        ).fetchall()]
+
+    def page_before(self, conn, sort, descending=False, anchor=None, limit=PAGE_SIZE):
+        """Retourne jusqu'à ``limit`` lignes avant ``anchor`` (les dernières sans ancre), dans l'ordre demandé"""
+        rows = self.page(conn, sort, not descending, anchor, limit=limit)
+        rows.reverse()
+        return rows
+
+    def anchor_at(self, conn, sort, descending, index):
+        """Retourne l'ancre de la ligne de rang ``index``, ou None au-delà de la dernière.
+
+        Seul accès par OFFSET, pour les sauts directs : il ne parcourt que
+        l'index de tri de ``count_from``, sans les jointures d'affichage.
+        """
+        expression = self.sort_columns[sort]
+        where = f" WHERE {self.where}" if self.where else ""
+        order = "DESC" if descending else "ASC"
+        row = conn.execute(
+            f"SELECT {expression}, {self.key} FROM {self.count_from}{where}"
+            f" ORDER BY {expression} {order}, {self.key} {order} LIMIT 1 OFFSET ?", self.params + (index,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def count(self, conn):
+        """Retourne le nombre de lignes de la requête"""
+        where = f" WHERE {self.where}" if self.where else ""
+        return conn.execute(f"SELECT COUNT(*) FROM {self.count_from}{where}", self.params).fetchone()[0]
+
+    def rank(self, conn, sort, descending, anchor):
+        """Retourne le nombre de lignes placées avant ``anchor`` dans l'ordre demandé"""
+        # Deux comptages d'intervalle, chacun parcourant l'index sans OR :
+        # valeurs de tri strictement avant, puis même valeur et clé avant
+        expression = self.sort_columns[sort]
+        op = ">" if descending else "<"
+        where = f"({self.where}) AND " if self.where else ""
+        return conn.execute(f"""
+            SELECT (SELECT COUNT(*) FROM {self.count_from} WHERE {where}{expression} {op} ?)
+                 + (SELECT COUNT(*) FROM {self.count_from} WHERE {where}{expression} = ? AND {self.key} {op} ?)
+        """, self.params + (anchor[0],) + self.params + (anchor[0], anchor[1])).fetchone()[0]
+
+    def anchor_of(self, conn, key, sort):
+        """Retourne l'ancre (valeur de tri, clé) de la ligne de clé ``key``, ou None"""
+        where = f" AND ({self.where})" if self.where else ""
+        row = conn.execute(
+            f"SELECT {self.sort_columns[sort]}, {self.key} FROM {self.count_from} WHERE {self.key} = ?{where}",
+            (key,) + self.params
+        ).fetchone()
+        return tuple(row) if row else None
+
+
+class RowsQuery:
+    """Lignes déjà lues, paginées comme une PagedQuery ; la connexion passée est ignorée.
+
+    ``key(row)`` donne la clé unique d'une ligne, ``sort_columns`` associe à chaque
+    colonne triable une fonction ``row -> valeur de tri`` (jamais None).
+    """
+
+    def __init__(self, rows, key, sort_columns):
+        self.rows = [tuple(row) for row in rows]
+        self.key = key
+        self.sort_columns = sort_columns
+        # Colonne -> (ancres triées, lignes dans le même ordre), calculé au premier usage
+        self._ordres = {}
+        self._par_cle = None
+
+    def _ordre(self, sort):
+        ordre = self._ordres.get(sort)
+        if ordre is None:
+            valeur = self.sort_columns[sort]
+            lignes = sorted(self.rows, key=lambda row: (valeur(row), self.key(row)))
+            ordre = self._ordres[sort] = ([(valeur(row), self.key(row)) for row in lignes], lignes)
+        return ordre
+
+    def page(self, conn, sort, descending=False, anchor=None, inclusive=False, limit=PAGE_SIZE):
+        """Retourne jusqu'à ``limit`` lignes après ``anchor`` (valeur de tri, clé), dans l'ordre demandé"""
+        ancres, lignes = self._ordre(sort)
+        if descending:
+            if anchor is None:
+                fin = len(ancres)
+            else:
+                fin = (bisect_right if inclusive else bisect_left)(ancres, tuple(anchor))
+            indices = range(fin - 1, max(fin - limit, 0) - 1, -1)
+        else:
+            debut = 0 if anchor is None else (bisect_left if inclusive else bisect_right)(ancres, tuple(anchor))
+            indices = range(debut, min(debut + limit, len(ancres)))
+        return [lignes[i] + ancres[i] for i in indices]
+
+    def page_before(self, conn, sort, descending=False, anchor=None, limit=PAGE_SIZE):
+        """Retourne jusqu'à ``limit`` lignes avant ``anchor`` (les dernières sans ancre), dans l'ordre demandé"""
+        rows = self.page(conn, sort, not descending, anchor, limit=limit)
+        rows.reverse()
+        return rows
+
+    def anchor_at(self, conn, sort, descending, index):
+        """Retourne l'ancre de la ligne de rang ``index``, ou None au-delà de la dernière"""
+        ancres, _ = self._ordre(sort)
+        if not 0 <= index < len(ancres):
+            return None
+        return ancres[len(ancres) - 1 - index if descending else index]
+
+    def count(self, conn):
+        """Retourne le nombre de lignes"""
+        return len(self.rows)
+
+    def rank(self, conn, sort, descending, anchor):
+        """Retourne le nombre de lignes placées avant ``anchor`` dans l'ordre demandé"""
+        ancres, _ = self._ordre(sort)
+        if descending:
+            return len(ancres) - bisect_right(ancres, tuple(anchor))
+        return bisect_left(ancres, tuple(anchor))
+
+    def anchor_of(self, conn, key, sort):
+        """Retourne l'ancre (valeur de tri, clé) de la ligne de clé ``key``, ou None"""
+        if self._par_cle is None:
+            self._par_cle = {str(self.key(row)): row for row in self.rows}
+        row = self._par_cle.get(str(key))
+        return (self.sort_columns[sort](row), self.key(row)) if row is not None else None
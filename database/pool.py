@@ -0,0 +1,175 @@
+# database/pool.py
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Aucune connexion libre dans le délai imparti"""
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite partagé par tous les gestionnaires.
+
+    Chaque thread emprunte au plus une connexion à la fois : les appels
+    imbriqués de ``acquire`` dans un même thread réutilisent la même
+    connexion. Les connexions inactives trop longtemps sont fermées, et une
+    connexion restée au repos est vérifiée (``SELECT 1``) avant d'être prêtée.
+    """
+
+    def __init__(self, db_name, max_size=5, idle_timeout=300.0,
+                 health_check_interval=30.0, checkout_timeout=10.0, on_connect=None):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.on_connect = on_connect
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(connexion, instant du dernier retour)]
+        self._size = 0
+        self._local = threading.local()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "health_failures": 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Permet d'accéder aux colonnes par nom
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._size -= 1
+        self._stats["closed"] += 1
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            self._stats["health_failures"] += 1
+            return False
+
+    def _reap_idle_locked(self, now):
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                self._close(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    def acquire(self):
+        """Emprunte une connexion pour le thread courant"""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        start = time.perf_counter()
+        deadline = start + self.checkout_timeout
+        conn = None
+        with self._cond:
+            waited = False
+            while conn is None:
+                now = time.monotonic()
+                self._reap_idle_locked(now)
+                if self._idle:
+                    candidate, last_used = self._idle.pop()
+                    if now - last_used > self.health_check_interval and not self._is_healthy(candidate):
+                        self._close(candidate)
+                        continue
+                    conn = candidate
+                    self._stats["reused"] += 1
+                elif self._size < self.max_size:
+                    # Réserver la place avant d'ouvrir hors verrou
+                    self._size += 1
+                    break
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Aucune connexion disponible après {self.checkout_timeout}s "
+                            f"(taille du pool : {self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += time.perf_counter() - start
+            self._stats["checkouts"] += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Rend la connexion au pool quand le thread n'en a plus l'usage"""
+        if getattr(self._local, "conn", None) is not conn:
+            raise RuntimeError("Cette connexion n'a pas été empruntée par ce thread")
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        # Ne jamais rendre une transaction ouverte à un autre emprunteur
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reusable = True
+        except sqlite3.Error:
+            reusable = False
+
+        with self._cond:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._close(conn)
+            self._cond.notify()
+
+    def reap_idle(self):
+        """Ferme les connexions inactives depuis plus de ``idle_timeout``"""
+        with self._cond:
+            self._reap_idle_locked(time.monotonic())
+
+    def close_all(self):
+        """Ferme toutes les connexions au repos"""
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    def stats(self):
+        """Retourne les compteurs du pool (créations, emprunts, attentes...)"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+        stats["avg_wait_ms"] = (stats["wait_time"] / stats["waits"] * 1000) if stats["waits"] else 0.0
+        return stats
@@ -0,0 +1,111 @@
+# database/pragmas.py
+"""Profils de PRAGMA appliqués à chaque connexion ouverte par Database.
+
+Vérification des réglages en vigueur :
+    python -m database.pragmas [--profile durable|fast|reporting] [base]
+"""
+import argparse
+import sqlite3
+
+DEFAULT_PROFILE = "durable"
+
+# Valeurs exprimées telles que SQLite les attend ; cache_size négatif = Kio
+PROFILES = {
+    # Comptoirs : aucune transaction validée ne doit être perdue
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Saisie en masse : en WAL, NORMAL ne risque que les dernières transactions
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Rapports et exports : gros cache, lectures mappées en mémoire
+    "reporting": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -128000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 15000,
+    },
+}
+
+# Traduction des valeurs numériques renvoyées par SQLite
+_SYNCHRONOUS = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_TEMP_STORE = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+
+def get_profile(name):
+    """Retourne les réglages d'un profil, ou lève ValueError s'il est inconnu"""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Profil PRAGMA inconnu : {name} (choix : {', '.join(sorted(PROFILES))})")
+
+
+def apply_profile(conn, name=DEFAULT_PROFILE):
+    """Applique un profil à une connexion fraîchement ouverte"""
+    for pragma, value in get_profile(name).items():
+        conn.execute(f"PRAGMA {pragma} = {value}").fetchall()
+
+
+def read_settings(conn):
+    """Lit les réglages réellement en vigueur sur la connexion"""
+    settings = {}
+    for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout"):
+        row = conn.execute(f"PRAGMA {pragma}").fetchone()
+        settings[pragma] = row[0] if row else None
+    settings["journal_mode"] = str(settings["journal_mode"]).upper()
+    settings["synchronous"] = _SYNCHRONOUS.get(settings["synchronous"], settings["synchronous"])
+    settings["temp_store"] = _TEMP_STORE.get(settings["temp_store"], settings["temp_store"])
+    return settings
+
+
+def check_profile(conn, name=DEFAULT_PROFILE):
+    """Compare les réglages en vigueur au profil attendu.
+
+    Retourne la liste des écarts sous forme de tuples (pragma, attendu, obtenu).
+    """
+    actual = read_settings(conn)
+    differences = []
+    for pragma, expected in get_profile(name).items():
+        if str(actual[pragma]).upper() != str(expected).upper():
+            differences.append((pragma, expected, actual[pragma]))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie les PRAGMA appliqués à la base de stock")
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    args = parser.parse_args()
+
+    from database.db import Database
+    db = Database(args.base, profile=args.profile)
+    with db.get_connection() as conn:
+        settings = read_settings(conn)
+        differences = check_profile(conn, args.profile)
+
+    print(f"Base : {args.base} — profil : {args.profile} (SQLite {sqlite3.sqlite_version})")
+    for pragma, value in settings.items():
+        print(f"  {pragma:<13} = {value}")
+    if differences:
+        print("Écarts avec le profil :")
+        for pragma, expected, actual in differences:
+            print(f"  {pragma}: attendu {expected}, obtenu {actual}")
+        raise SystemExit(1)
+    print("Tous les réglages du profil sont en vigueur.")
+
+
+if __name__ == "__main__":
+    main()
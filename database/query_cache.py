@@ -0,0 +1,140 @@
+# database/query_cache.py
+"""Cache des résultats de requêtes, invalidé par les compteurs de modification des tables.
+
+Chaque écriture dans une table suivie incrémente, par trigger, sa ligne de
+VersionsTables. Un résultat reste valable tant que les versions des tables
+dont il dépend n'ont pas bougé. Une connexion sentinelle, qui n'écrit jamais,
+lit PRAGMA data_version : tant qu'aucune transaction n'a été validée depuis la
+dernière vérification, par ce processus ou un autre poste, VersionsTables
+n'est même pas relue.
+
+Les projections tenues par trigger (StockSolde, Alertes, MouvementsJour)
+dépendent de leurs tables sources : Mouvements, Articles et Reservations.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Nombre de résultats conservés par base
+TAILLE_CACHE = 256
+
+
+def depend_de(*tables):
+    """Déclare les tables lues par une fonction de rapport ``fonction(conn, ...)`` (décorateur)"""
+    def decorator(fonction):
+        fonction.tables = tables
+        return fonction
+    return decorator
+
+
+def signaler_modification(conn, *tables):
+    """Invalide les résultats dépendant de ``tables`` après une écriture non suivie par trigger"""
+    conn.executemany(
+        "UPDATE VersionsTables SET version = version + 1 WHERE nom_table = ?",
+        [(table,) for table in tables]
+    )
+
+
+class QueryCache:
+    """Résultats de requêtes indexés par requête et paramètres, un cache par base"""
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, db, taille=TAILLE_CACHE):
+        self.db = db
+        self.taille = taille
+        self._entrees = OrderedDict()  # clé -> (résultat, versions des tables lues)
+        self._versions = {}
+        self._data_version = None
+        self._sentinelle = None
+        self._verrou = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "verifications": 0, "relectures": 0}
+
+    @classmethod
+    def pour(cls, db, nom=None, taille=TAILLE_CACHE):
+        """Retourne le cache partagé de la base de ``db`` ; ``nom`` désigne un cache dédié"""
+        key = (os.path.abspath(db.db_name), nom)
+        with cls._caches_lock:
+            cache = cls._caches.get(key)
+            if cache is None:
+                cache = cls._caches[key] = cls(db, taille)
+            return cache
+
+    def _actualiser_versions(self):
+        """Relit VersionsTables si une transaction a été validée depuis la dernière vérification"""
+        if self._sentinelle is None:
+            self._sentinelle = sqlite3.connect(self.db.db_name, check_same_thread=False)
+        self._stats["verifications"] += 1
+        data_version = self._sentinelle.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._stats["relectures"] += 1
+        self._versions = dict(self._sentinelle.execute("SELECT nom_table, version FROM VersionsTables"))
+        self._data_version = data_version
+
+    def get(self, cle, tables, calcul):
+        """Retourne le résultat en cache de ``cle``, ou l'obtient par ``calcul(conn)``.
+
+        ``tables`` liste les tables dont dépend le résultat ; il est recalculé
+        dès que l'une d'elles a été modifiée.
+        """
+        with self._verrou:
+            self._actualiser_versions()
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[1] == versions:
+                self._entrees.move_to_end(cle)
+                self._stats["hits"] += 1
+                return entree[0]
+            self._stats["misses"] += 1
+
+        # Les versions sont lues avant le calcul : une écriture concurrente
+        # ne peut que provoquer un recalcul de trop, jamais un résultat périmé
+        with self.db.get_connection() as conn:
+            resultat = calcul(conn)
+
+        with self._verrou:
+            self._entrees[cle] = (resultat, versions)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+        return resultat
+
+    def versions(self, tables):
+        """Retourne les versions actuelles de ``tables`` (sans relire VersionsTables si rien n'a été validé)"""
+        with self._verrou:
+            self._actualiser_versions()
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def fetchone(self, sql, params=(), tables=()):
+        return self.get(("fetchone", sql, tuple(params)), tables,
+                        lambda conn: conn.execute(sql, params).fetchone())
+
+    def fetchall(self, sql, params=(), tables=()):
+        return self.get(("fetchall", sql, tuple(params)), tables,
+                        lambda conn: conn.execute(sql, params).fetchall())
+
+    def appel(self, fonction, *args):
+        """Appelle une fonction de rapport déclarée avec ``depend_de``, via le cache"""
+        cle = (fonction.__module__, fonction.__qualname__, args)
+        return self.get(cle, fonction.tables, lambda conn: fonction(conn, *args))
+
+    def invalider(self):
+        """Vide le cache"""
+        with self._verrou:
+            self._entrees.clear()
+
+    def stats(self):
+        """Retourne les compteurs de succès, d'échecs et de vérifications"""
+        with self._verrou:
+            return dict(self._stats, entrees=len(self._entrees))
+
+    def fermer(self):
+        """Ferme la connexion sentinelle"""
+        with self._verrou:
+            if self._sentinelle is not None:
+                self._sentinelle.close()
+                self._sentinelle = None
+                self._data_version = None
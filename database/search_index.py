@@ -0,0 +1,154 @@
+# database/search_index.py
+"""Index plein texte du catalogue (ArticlesFTS, FTS5).
+
+ArticlesFTS indexe le code, la désignation et la catégorie des articles ;
+c'est une table à contenu externe (content='Articles') : le texte n'est pas
+dupliqué, les triggers de la migration 14 tiennent l'index à jour à chaque
+écriture dans Articles. Le tokenizer unicode61 replie la casse et les
+accents (« ecrou » trouve « Écrou ») ; chaque mot saisi est cherché comme
+préfixe d'un mot indexé, et les résultats sont classés par bm25, le code
+pesant plus que la désignation, elle-même plus que la catégorie.
+
+L'index suit les rowid d'Articles, qu'un VACUUM peut renuméroter : il se
+reconstruit alors depuis la table.
+
+    python -m database.search_index verifier [base]
+    python -m database.search_index reconstruire [base]
+"""
+import argparse
+import re
+import sqlite3
+import unicodedata
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Longueurs de préfixe indexées : un mot saisi de cette longueur se lit en un
+# seul parcours, sans fusionner les listes de tous les mots qu'il préfixe
+PREFIXES = "2 3 4 5 6"
+
+# Poids bm25 des colonnes indexées : code, désignation, catégorie
+POIDS_COLONNES = (10.0, 5.0, 1.0)
+
+_MOTS = re.compile(r"[^\W_]+")
+
+
+def fts_available(conn):
+    """Vrai si l'index ArticlesFTS existe (SQLite compilé avec FTS5 lors de la migration)"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ArticlesFTS'"
+    ).fetchone() is not None
+
+
+def create_search_index(conn):
+    """Crée ArticlesFTS, ses triggers et l'indexation du catalogue ; faux si FTS5 manque"""
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS ArticlesFTS USING fts5(
+                code_article, designation, categorie,
+                content='Articles', content_rowid='rowid',
+                tokenize='{TOKENIZER}', prefix='{PREFIXES}'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        return False
+    conn.execute(
+        "INSERT INTO ArticlesFTS (ArticlesFTS, rank) VALUES ('rank', ?)",
+        ("bm25({})".format(", ".join(str(poids) for poids in POIDS_COLONNES)),)
+    )
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_insertion
+        AFTER INSERT ON Articles
+        BEGIN
+            INSERT INTO ArticlesFTS (rowid, code_article, designation, categorie)
+            VALUES (NEW.rowid, NEW.code_article, NEW.designation, NEW.categorie);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_suppression
+        AFTER DELETE ON Articles
+        BEGIN
+            INSERT INTO ArticlesFTS (ArticlesFTS, rowid, code_article, designation, categorie)
+            VALUES ('delete', OLD.rowid, OLD.code_article, OLD.designation, OLD.categorie);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_modification
+        AFTER UPDATE OF code_article, designation, categorie ON Articles
+        BEGIN
+            INSERT INTO ArticlesFTS (ArticlesFTS, rowid, code_article, designation, categorie)
+            VALUES ('delete', OLD.rowid, OLD.code_article, OLD.designation, OLD.categorie);
+            INSERT INTO ArticlesFTS (rowid, code_article, designation, categorie)
+            VALUES (NEW.rowid, NEW.code_article, NEW.designation, NEW.categorie);
+        END
+    """)
+    rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn):
+    """Réindexe tout le catalogue depuis Articles"""
+    conn.execute("INSERT INTO ArticlesFTS (ArticlesFTS) VALUES ('rebuild')")
+
+
+def verify_search_index(conn):
+    """Vrai si l'index correspond au contenu d'Articles"""
+    try:
+        conn.execute("INSERT INTO ArticlesFTS (ArticlesFTS, rank) VALUES ('integrity-check', 1)")
+    except sqlite3.DatabaseError:
+        return False
+    return True
+
+
+def search_words(term):
+    """Mots d'une saisie tels que les indexe unicode61 : sans accents, en minuscules"""
+    decompose = unicodedata.normalize("NFKD", term)
+    return _MOTS.findall("".join(c for c in decompose if not unicodedata.combining(c)).lower())
+
+
+def match_expression(term):
+    """Expression MATCH : chaque mot comme préfixe, tous requis ; None sans mot"""
+    words = search_words(term)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def fold(text):
+    """Texte comparable en mémoire : ses mots, chacun précédé d'une espace"""
+    return "".join(" " + word for word in search_words(text))
+
+
+def matcher(folded_term):
+    """Prédicat sur un texte replié par ``fold``, équivalent à MATCH sur le terme replié"""
+    prefixes = [" " + word for word in folded_term.split()]
+    return lambda text: bool(prefixes) and all(prefix in text for prefix in prefixes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index plein texte du catalogue (ArticlesFTS)")
+    parser.add_argument("commande", choices=("verifier", "reconstruire"))
+    parser.add_argument("base", nargs="?", default="stock_app.db")
+    args = parser.parse_args()
+
+    from database.db import Database
+    db = Database(args.base)
+    db.initialize()
+    with db.get_connection() as conn:
+        if not fts_available(conn):
+            print("Index plein texte absent : SQLite n'offrait pas FTS5 lors de la migration.")
+            raise SystemExit(1)
+        if args.commande == "reconstruire":
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild_search_index(conn)
+            conn.commit()
+            print("Index plein texte reconstruit depuis Articles.")
+        if not verify_search_index(conn):
+            print("Index plein texte incohérent : python -m database.search_index reconstruire")
+            raise SystemExit(1)
+    print("Index plein texte cohérent avec le catalogue.")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,11 +19,12 @@ def seed_data():
             VALUES (?, ?, ?, ?, ?, ?)
         """, ("ART001", "Cahier A4", "Papeterie", 2.5, 5.0, 10))
         
-        # Insérer un stock
+        # Stock initial : une entrée au registre, Stock est mis à jour par trigger
         cursor.execute("""
-            INSERT OR IGNORE INTO Stock (code_article, quantite, emplacement)
-            VALUES (?, ?, ?)
-        """, ("ART001", 100, "Entrepôt A"))
+            INSERT INTO Mouvements (type, code_article, quantite, date_mvt, emplacement)
+            SELECT ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM Mouvements WHERE code_article = ?)
+        """, ("entrée", "ART001", 100, datetime.now(), "Entrepôt A", "ART001"))
         
         # Insérer un fournisseur
         cursor.execute("""
@@ -5,17 +5,25 @@ import tkinter as tk
 import os
 import sys
 from database.db import Database
+from core.stock_manager import StockManager
+from core.export_jobs import ExportJobs
 from ui.login_ui import LoginUI
 
 def main():
     # Initialiser la base de données
     db = Database()
     db.initialize()
+    stock = StockManager()
+    stock.instantane_periodique()
+    stock.expirer_reservations()
+    # Exports laissés en file par la session précédente
+    ExportJobs().reprendre()
     
     # Lancer l'interface utilisateur
     root = tk.Tk()
     app = LoginUI(root)
     root.mainloop()
+    ExportJobs.arreter()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+# reporting/pdf_report.py
+"""Rapport PDF paginé, écrit au fil des lignes lues.
+
+Les lignes sont dessinées dès qu'elles arrivent : seule la page en cours est
+en mémoire, sous forme de commandes PDF. Chaque page répète le titre et les
+en-têtes de colonnes et se termine par le total de la page et le cumul des
+pages précédentes pour les colonnes à sommer ; la dernière porte le total
+général. Le nombre de lignes étant connu d'avance, chaque page est numérotée
+« n / total ».
+"""
+from datetime import datetime
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+MARGE = 36
+POLICE = "Helvetica"
+POLICE_GRASSE = "Helvetica-Bold"
+TAILLE_POLICE = 8
+# Hauteur d'une ligne du tableau (points)
+INTERLIGNE = 11
+# Espace entre deux colonnes (points)
+GOUTTIERE = 6
+# Chasse du plus large caractère de la police, en millièmes de la taille (« @ » de Helvetica)
+CHASSE_MAX = 1015
+
+
+def _entier(valeur):
+    return f"{valeur:,}".replace(",", " ")
+
+
+def _decimal(valeur):
+    return f"{valeur:,.2f}".replace(",", " ")
+
+
+def _date(valeur):
+    return str(valeur)[:19]
+
+
+# Type de colonne -> mise en forme d'une valeur non nulle (str par défaut)
+MISES_EN_FORME = {"entier": _entier, "decimal": _decimal, "date": _date}
+# Colonnes alignées à droite
+NUMERIQUES = {"entier", "decimal"}
+
+
+class RapportPDF:
+    """Rapport paginé : ``colonnes`` (titre, type_, largeur, somme), ``total_lignes`` annoncées"""
+
+    def __init__(self, filename, titre, colonnes, total_lignes, pagesize=A4, sous_titre=None):
+        self.canvas = canvas.Canvas(filename, pagesize=pagesize, pageCompression=1)
+        self.canvas.setTitle(titre)
+        self.largeur_page, self.hauteur_page = pagesize
+        self.titre = titre
+        self.sous_titre = sous_titre or f"Édité le {datetime.now():%d/%m/%Y %H:%M}"
+        self.colonnes = colonnes
+
+        # Largeurs proportionnelles à la largeur indicative (en caractères) de chaque colonne
+        utile = self.largeur_page - 2 * MARGE - GOUTTIERE * (len(colonnes) - 1)
+        unite = utile / sum(colonne.largeur for colonne in colonnes)
+        self.cellules = []
+        x = MARGE
+        for colonne in colonnes:
+            largeur = colonne.largeur * unite
+            droite = colonne.type_ in NUMERIQUES
+            # Un texte d'au plus ``courts`` caractères tient sans mesure
+            courts = int(largeur * 1000 / (CHASSE_MAX * TAILLE_POLICE))
+            self.cellules.append((x + largeur if droite else x, largeur, droite, courts,
+                                  MISES_EN_FORME.get(colonne.type_, str)))
+            x += largeur + GOUTTIERE
+        self.sommes = [i for i, colonne in enumerate(colonnes) if colonne.somme]
+
+        # Titre, en-têtes de colonnes, puis les lignes ; le pied reçoit les totaux
+        self.haut_tableau = self.hauteur_page - MARGE - 40
+        self.bas_tableau = MARGE + (3 if self.sommes else 1) * INTERLIGNE + 6
+        self.lignes_par_page = int((self.haut_tableau - INTERLIGNE - self.bas_tableau) // INTERLIGNE)
+        self.total_pages = max(1, -(-total_lignes // self.lignes_par_page))
+
+        self.page = 0
+        self.sur_page = 0
+        self.y = None
+        self.totaux_page = [0] * len(colonnes)
+        self.cumul = [0] * len(colonnes)
+
+    def ajouter(self, lignes):
+        """Dessine les lignes (tuples dans l'ordre des colonnes), en changeant de page au besoin"""
+        c = self.canvas
+        for ligne in lignes:
+            if self.y is None or self.sur_page == self.lignes_par_page:
+                if self.y is not None:
+                    self._fin_page()
+                self._debut_page()
+            for valeur, (x, largeur, droite, courts, mise_en_forme) in zip(ligne, self.cellules):
+                if valeur is None:
+                    continue
+                texte = mise_en_forme(valeur)
+                if droite:
+                    c.drawRightString(x, self.y, texte)
+                else:
+                    c.drawString(x, self.y, texte if len(texte) <= courts else self._tronquer(texte, largeur))
+            for i in self.sommes:
+                if ligne[i] is not None:
+                    self.totaux_page[i] += ligne[i]
+            self.y -= INTERLIGNE
+            self.sur_page += 1
+
+    def terminer(self):
+        """Termine la dernière page, écrit le fichier et retourne le nombre de pages"""
+        if self.y is None:
+            self._debut_page()
+            self.canvas.drawString(MARGE, self.y, "Aucune ligne.")
+        self._fin_page(derniere=True)
+        self.canvas.save()
+        return self.page
+
+    def _debut_page(self):
+        c = self.canvas
+        self.page += 1
+        self.sur_page = 0
+        self.totaux_page = [0] * len(self.colonnes)
+
+        haut = self.hauteur_page - MARGE
+        c.setFont(POLICE_GRASSE, 14)
+        c.drawString(MARGE, haut - 14, self.titre)
+        c.setFont(POLICE, TAILLE_POLICE)
+        c.drawString(MARGE, haut - 28, self.sous_titre)
+        c.drawRightString(self.largeur_page - MARGE, haut - 28, f"Page {self.page} / {self.total_pages}")
+
+        c.setFont(POLICE_GRASSE, TAILLE_POLICE)
+        y = self.haut_tableau
+        for colonne, (x, largeur, droite, _, _) in zip(self.colonnes, self.cellules):
+            (c.drawRightString if droite else c.drawString)(x, y, self._tronquer(colonne.titre, largeur))
+        c.line(MARGE, y - 3, self.largeur_page - MARGE, y - 3)
+        c.setFont(POLICE, TAILLE_POLICE)
+        self.y = y - INTERLIGNE - 2
+
+    def _fin_page(self, derniere=False):
+        c = self.canvas
+        if self.sommes:
+            for i in self.sommes:
+                self.cumul[i] += self.totaux_page[i]
+            y = self.bas_tableau - 4
+            c.line(MARGE, y + INTERLIGNE - 2, self.largeur_page - MARGE, y + INTERLIGNE - 2)
+            c.setFont(POLICE_GRASSE, TAILLE_POLICE)
+            pied = [("Total de la page", self.totaux_page), ("Total général" if derniere else "Cumul", self.cumul)]
+            for libelle, totaux in pied:
+                c.drawString(MARGE, y, libelle)
+                for i in self.sommes:
+                    x, _, _, _, mise_en_forme = self.cellules[i]
+                    c.drawRightString(x, y, mise_en_forme(totaux[i]))
+                y -= INTERLIGNE
+            c.setFont(POLICE, TAILLE_POLICE)
+        c.showPage()
+
+    def _tronquer(self, texte, largeur):
+        """Raccourcit ``texte`` (terminé par « … ») pour qu'il tienne dans ``largeur``"""
+        mesure = stringWidth(texte, POLICE, TAILLE_POLICE)
+        if mesure <= largeur:
+            return texte
+        # Coupe estimée à la chasse moyenne du texte, puis ajustée caractère par caractère
+        texte = texte[:int(len(texte) * (largeur - stringWidth("…", POLICE, TAILLE_POLICE)) / mesure)]
+        while texte and stringWidth(texte + "…", POLICE, TAILLE_POLICE) > largeur:
+            texte = texte[:-1]
+        return texte + "…"
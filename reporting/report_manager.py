@@ -1,41 +1,100 @@
 import sqlite3
+from database.query_cache import depend_de
 
+# Les fonctions déclarent les tables sources qu'elles lisent (QueryCache.appel)
+
+@depend_de("Articles", "Mouvements")
 def get_etat_stocks(conn):
     cursor = conn.cursor()
     cursor.execute("""
         SELECT a.code_article, a.designation, s.quantite
         FROM Articles a
-        LEFT JOIN Stock s ON a.code_article = s.code_article;
+        LEFT JOIN StockSolde s ON a.code_article = s.code_article;
     """)
     return cursor.fetchall()
 
-def get_historique_mouvements(conn):
+@depend_de("Mouvements")
+def get_historique_mouvements(conn, date_debut=None, date_fin=None, limite=None):
+    """Liste les mouvements, du plus récent au plus ancien, éventuellement sur une période"""
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT m.date_mvt, m.type, m.code_article, m.quantite
-        FROM Mouvements m
-        ORDER BY m.date_mvt DESC;
-    """)
+    query = "SELECT m.date_mvt, m.type, m.code_article, m.quantite FROM Mouvements m"
+    params = []
+    if date_debut and date_fin:
+        # Bornes sur date_mvt elle-même : la recherche reste sur l'index de date
+        query += " WHERE m.date_mvt >= ? AND m.date_mvt < DATE(?, '+1 day')"
+        params = [date_debut, date_fin]
+    query += " ORDER BY m.date_mvt DESC"
+    if limite:
+        query += " LIMIT ?"
+        params.append(limite)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
+@depend_de("Articles", "Mouvements")
 def get_valeur_totale_stock(conn):
     cursor = conn.cursor()
     cursor.execute("""
         SELECT SUM(s.quantite * a.prix_achat) AS valeur_totale
-        FROM Stock s
+        FROM StockSolde s
         JOIN Articles a ON s.code_article = a.code_article;
     """)
     return cursor.fetchone()[0]
 
-def get_articles_plus_vendus(conn):
+@depend_de("Articles", "Mouvements")
+def get_articles_plus_vendus(conn, date_debut=None, date_fin=None, limite=10):
+    """Articles les plus sortis, lus dans les cumuls journaliers (MouvementsJour).
+
+    Lignes (designation, total_vendu, code_article) : le code article vient en dernier.
+    """
+    cursor = conn.cursor()
+    periode = ""
+    params = []
+    if date_debut and date_fin:
+        periode = "WHERE jour >= ? AND jour <= ?"
+        params = [date_debut, date_fin]
+    # Agrégation d'abord (index couvrant par article), jointure sur les seuls totaux ensuite
+    cursor.execute(f"""
+        SELECT a.designation, j.total_vendu, j.code_article
+        FROM (
+            SELECT code_article, SUM(quantite_sortie) AS total_vendu
+            FROM MouvementsJour
+            {periode}
+            GROUP BY code_article
+        ) j
+        JOIN Articles a ON j.code_article = a.code_article
+        WHERE j.total_vendu > 0
+        ORDER BY j.total_vendu DESC
+        LIMIT ?;
+    """, params + [limite])
+    return cursor.fetchall()
+
+@depend_de("Mouvements")
+def get_mouvements_par_jour(conn, date_debut, date_fin):
+    """Synthèse quotidienne d'une période : quantités, nombre de mouvements et valeurs"""
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT a.designation, SUM(m.quantite) AS total_vendu
-        FROM Mouvements m
-        JOIN Articles a ON m.code_article = a.code_article
-        WHERE m.type = 'sortie'
-        GROUP BY a.code_article
-        ORDER BY total_vendu DESC
-        LIMIT 10;
-    """)
-    return cursor.fetchall()
\ No newline at end of file
+        SELECT jour, SUM(quantite_entree) AS entrees, SUM(quantite_sortie) AS sorties,
+               SUM(nombre) AS nombre, SUM(valeur_entree) AS valeur_entrees,
+               SUM(valeur_sortie) AS valeur_sorties
+        FROM MouvementsJour
+        WHERE jour >= ? AND jour <= ?
+        GROUP BY jour
+        ORDER BY jour;
+    """, (date_debut, date_fin))
+    return cursor.fetchall()
+
+@depend_de("Articles", "Mouvements")
+def get_synthese_articles(conn, date_debut, date_fin):
+    """Synthèse par article d'une période, lue dans les cumuls journaliers"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT j.code_article, a.designation, SUM(j.quantite_entree) AS entrees,
+               SUM(j.quantite_sortie) AS sorties, SUM(j.nombre) AS nombre,
+               SUM(j.valeur_sortie) AS chiffre_affaires
+        FROM MouvementsJour j
+        LEFT JOIN Articles a ON j.code_article = a.code_article
+        WHERE j.jour >= ? AND j.jour <= ?
+        GROUP BY j.code_article
+        ORDER BY chiffre_affaires DESC;
+    """, (date_debut, date_fin))
+    return cursor.fetchall()
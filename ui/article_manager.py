@@ -1,11 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
 import barcode
 from barcode.writer import ImageWriter
 from PIL import Image, ImageTk
 import os
 from ui.theme_manager import theme_manager
+from database.db import Database
+from database.pagination import PagedQuery
+from core.produit_manager import ProduitManager
+from ui.worker import worker_for
+from ui.virtual_table import VirtualTable
+
+def supprimer_article(db, code_article):
+    """Supprime un article (exécutée hors du thread Tk)"""
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM Articles WHERE code_article = ?", (code_article,))
+        conn.commit()
 
 class ArticleForm(tk.Toplevel):
     def __init__(self, parent, article=None, refresh_callback=None):
@@ -15,7 +25,10 @@ class ArticleForm(tk.Toplevel):
         self.configure(bg=theme_manager.get_color("bg_primary"))
         self.article = article
         self.refresh_callback = refresh_callback
-        self.conn = sqlite3.connect("stock_app.db")
+        self.db = Database()
+        self.produits = ProduitManager()
+        # Lectures et écritures hors du thread Tk, annulées à la fermeture du formulaire
+        self.worker = worker_for(self)
         
         # Configuration des styles
         self.setup_styles()
@@ -165,12 +178,28 @@ class ArticleForm(tk.Toplevel):
         # Zone d'affichage du code-barres
         self.barcode_img_label = tk.Label(barcode_content, bg=theme_manager.get_color("bg_secondary"))
         self.barcode_img_label.pack()
+
+        # Codes-barres scannables de l'article (EAN fournisseur...), en plus de son code
+        if self.article:
+            associate_frame = tk.Frame(barcode_content, bg=theme_manager.get_color("bg_secondary"))
+            associate_frame.pack(fill=tk.X, pady=(15, 0))
+            self.code_associe_var = tk.StringVar()
+            tk.Entry(associate_frame, textvariable=self.code_associe_var, font=('Arial', 11), width=25,
+                     bg=theme_manager.get_color("bg_input"), fg=theme_manager.get_color("fg_tertiary"),
+                     relief='solid', bd=1).pack(side=tk.LEFT, padx=(0, 10))
+            tk.Button(associate_frame, text="➕ Associer", command=self.associer_code_barre,
+                      font=('Arial', 10, 'bold'), **generate_style, padx=10, pady=4).pack(side=tk.LEFT)
+            self.codes_associes_label = tk.Label(barcode_content, font=('Arial', 10), justify=tk.LEFT,
+                                                 bg=theme_manager.get_color("bg_secondary"),
+                                                 fg=theme_manager.get_color("fg_primary"))
+            self.codes_associes_label.pack(anchor=tk.W, pady=(10, 0))
         
         # Section boutons d'action
         action_frame = tk.Frame(scrollable_frame, bg=theme_manager.get_color("bg_secondary"), relief='solid', bd=1)
         action_frame.pack(fill=tk.X)
         
-        action_content = tk.Frame(action_frame, bg=theme_manager.get_color("bg_secondary"))
+        # Indicateur posé sur les boutons pendant une écriture
+        self.action_content = action_content = tk.Frame(action_frame, bg=theme_manager.get_color("bg_secondary"))
         action_content.pack(fill=tk.X, padx=20, pady=20)
         
         # Boutons
@@ -210,6 +239,28 @@ class ArticleForm(tk.Toplevel):
             img = img.resize((250, 100))
             self.barcode_img = ImageTk.PhotoImage(img)
             self.barcode_img_label.config(image=self.barcode_img)
+        self.afficher_codes_associes()
+
+    def afficher_codes_associes(self):
+        def show_codes(codes):
+            self.codes_associes_label.config(
+                text="Codes associés : " + (", ".join(codes) if codes else "aucun"))
+        self.worker.submit(self.produits.codes_barres, self.code_article_var.get(), key=("codes", str(self)),
+                           owner=self, on_success=show_codes,
+                           on_error=lambda e: self.codes_associes_label.config(text=f"Codes associés : erreur ({e})"))
+
+    def associer_code_barre(self):
+        def associated(resultat):
+            succes, message = resultat
+            if not succes:
+                messagebox.showerror("❌ Erreur", message, parent=self)
+                return
+            self.code_associe_var.set("")
+            self.afficher_codes_associes()
+        self.worker.submit(self.produits.ajouter_code_barre, self.code_article_var.get(), self.code_associe_var.get(),
+                           owner=self, loading=self.codes_associes_label, on_success=associated,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de l'association: {str(e)}", parent=self))
 
     def generer_code_barre(self):
         code_article = self.code_article_var.get()
@@ -250,18 +301,30 @@ class ArticleForm(tk.Toplevel):
             self.code_barre_var.get()
         )
         
-        try:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                data
-            )
-            self.conn.commit()
+        def enregistrer():
+            with self.db.get_connection() as conn:
+                # Mise à jour en place : un REPLACE supprimerait la ligne sans déclencher
+                # les triggers de suppression (index plein texte, indicateurs)
+                conn.execute("""
+                    INSERT INTO Articles (code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (code_article) DO UPDATE SET
+                        designation = excluded.designation, categorie = excluded.categorie,
+                        prix_achat = excluded.prix_achat, prix_vente = excluded.prix_vente,
+                        seuil_alerte = excluded.seuil_alerte, code_barre = excluded.code_barre
+                """, data)
+                conn.commit()
+        
+        def enregistre(_):
             messagebox.showinfo("✅ Succès", "Article enregistré avec succès")
             if self.refresh_callback:
                 self.refresh_callback()
             self.destroy()
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}")
+        
+        # Une base verrouillée par un autre poste ne fige pas le formulaire
+        self.worker.submit(enregistrer, owner=self, loading=self.action_content, on_success=enregistre,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}", parent=self))
 
     def delete_article(self):
         code_article = self.code_article_var.get()
@@ -275,15 +338,30 @@ class ArticleForm(tk.Toplevel):
         if not confirm:
             return
         
-        try:
-            self.conn.execute("DELETE FROM Articles WHERE code_article = ?", (code_article,))
-            self.conn.commit()
+        def supprime(_):
             messagebox.showinfo("✅ Succès", "Article supprimé avec succès")
             if self.refresh_callback:
                 self.refresh_callback()
             self.destroy()
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de la suppression: {str(e)}")
+        
+        self.worker.submit(supprimer_article, self.db, code_article, owner=self, loading=self.action_content,
+                           on_success=supprime,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de la suppression: {str(e)}", parent=self))
+
+# Catalogue lu par pages, trié par défaut par désignation (index Articles(designation, code_article))
+ARTICLES = PagedQuery(
+    "code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre",
+    "Articles", "code_article",
+    {
+        "code_article": "code_article",
+        "designation": "designation",
+        "categorie": "IFNULL(categorie, '')",
+        "prix_achat": "IFNULL(prix_achat, 0)",
+        "prix_vente": "IFNULL(prix_vente, 0)",
+        "seuil_alerte": "IFNULL(seuil_alerte, 0)",
+    },
+)
 
 class ArticleManager(tk.Toplevel):
     def __init__(self, parent):
@@ -291,7 +369,10 @@ class ArticleManager(tk.Toplevel):
         self.title("📦 Gestion des Articles")
         self.geometry("1200x700")
         self.configure(bg=theme_manager.get_color("bg_primary"))
-        self.conn = sqlite3.connect("stock_app.db")
+        self.db = Database()
+        self.produits = ProduitManager()
+        # Chargements hors du thread Tk, annulés à la fermeture de la fenêtre
+        self.worker = worker_for(self)
         
         # Configuration des styles
         self.setup_styles()
@@ -446,25 +527,22 @@ class ArticleManager(tk.Toplevel):
         
         # Double-clic pour éditer
         self.tree.bind("<Double-1>", lambda e: self.edit_article())
+        
+        # Seules les lignes visibles sont lues
+        self.table = VirtualTable(self.tree, v_scrollbar, ARTICLES, self.worker, "designation",
+                                  format_row=self.format_article,
+                                  on_error=lambda e: messagebox.showerror(
+                                      "❌ Erreur", f"Erreur lors du chargement des articles: {str(e)}", parent=self))
 
     def refresh_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        
-        try:
-            articles = self.conn.execute(
-                "SELECT code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre FROM Articles"
-            ).fetchall()
-            
-            for article in articles:
-                # Tronquer le chemin du code-barres pour l'affichage
-                display_article = list(article)
-                if display_article[6]:
-                    display_article[6] = os.path.basename(display_article[6])
-                
-                self.tree.insert("", tk.END, values=display_article)
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors du chargement des articles: {str(e)}")
+        self.table.reload(keep_position=True)
+
+    def format_article(self, article):
+        # Tronquer le chemin du code-barres pour l'affichage
+        display_article = list(article)
+        if display_article[6]:
+            display_article[6] = os.path.basename(display_article[6])
+        return display_article, ()
 
     def add_article(self):
         def refresh(): 
@@ -481,14 +559,19 @@ class ArticleManager(tk.Toplevel):
         
         # Récupérer l'article complet avec le chemin complet du code-barres
         code_article = values[0]
-        article_complete = self.conn.execute(
-            "SELECT code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre FROM Articles WHERE code_article = ?",
-            (code_article,)
-        ).fetchone()
+        
+        def load_article():
+            with self.db.get_connection() as conn:
+                return conn.execute(
+                    "SELECT code_article, designation, categorie, prix_achat, prix_vente, seuil_alerte, code_barre FROM Articles WHERE code_article = ?",
+                    (code_article,)
+                ).fetchone()
         
         def refresh(): 
             self.refresh_table()
-        ArticleForm(self, article=article_complete, refresh_callback=refresh)
+        self.worker.submit(load_article, key=("article", str(self)), owner=self,
+                           on_success=lambda article_complete: ArticleForm(
+                               self, article=article_complete, refresh_callback=refresh))
 
     def delete_article(self):
         selected = self.tree.selection()
@@ -508,13 +591,14 @@ class ArticleManager(tk.Toplevel):
         if not confirm:
             return
         
-        try:
-            self.conn.execute("DELETE FROM Articles WHERE code_article = ?", (code_article,))
-            self.conn.commit()
+        def supprime(_):
             self.refresh_table()
-            messagebox.showinfo("✅ Succès", "Article supprimé avec succès.")
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de la suppression: {str(e)}")
+            messagebox.showinfo("✅ Succès", "Article supprimé avec succès.", parent=self)
+        
+        self.worker.submit(supprimer_article, self.db, code_article, owner=self, loading=self.tree,
+                           on_success=supprime,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de la suppression: {str(e)}", parent=self))
 
     def scan_and_select_article(self):
         try:
@@ -544,19 +628,21 @@ class ArticleManager(tk.Toplevel):
                     cap.release()
                     cv2.destroyAllWindows()
                     
-                    # Recherche dans le tableau
-                    found = False
-                    for row_id in self.tree.get_children():
-                        values = self.tree.item(row_id)["values"]
-                        if str(values[0]) == code:  # Recherche par code article
-                            self.tree.selection_set(row_id)
-                            self.tree.see(row_id)
+                    # Code-barres enregistré ou code article, puis sélection y compris hors des lignes affichées
+                    def found(trouve):
+                        if trouve:
                             messagebox.showinfo("✅ Article trouvé", f"Article avec code '{code}' sélectionné.")
-                            found = True
-                            break
-                    
-                    if not found:
-                        messagebox.showwarning("⚠️ Non trouvé", f"Aucun article avec le code '{code}' trouvé.")
+                        else:
+                            messagebox.showwarning("⚠️ Non trouvé", f"Aucun article avec le code '{code}' trouvé.")
+
+                    def resolved(code_article):
+                        if code_article is None:
+                            found(False)
+                        else:
+                            self.table.show(code_article, done=found)
+                    self.worker.submit(self.produits.resolve_barcode, code, owner=self, on_success=resolved,
+                                       on_error=lambda e: messagebox.showerror(
+                                           "❌ Erreur", f"Erreur lors du scan: {str(e)}", parent=self))
                     return
                 
                 # Affichage du flux vidéo
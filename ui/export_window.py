@@ -0,0 +1,191 @@
+# ui/export_window.py
+"""Fenêtre des exports en arrière-plan.
+
+Un export lancé d'ici est mis en file (core.export_jobs) et s'exécute hors
+de la session : la fenêtre peut être fermée, la saisie continue. Le tableau
+relit l'état des tâches chaque seconde, par l'exécuteur de l'interface, et
+n'actualise que les lignes qui ont changé.
+"""
+import os
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from core.export_jobs import (ANNULATION, ANNULEE, ECHEC, EN_ATTENTE, EN_COURS, TERMINEE, ExportJobs,
+                              pourcentage)
+from core.export_manager import COLONNES_PDF_STOCK, JEUX_EXPORT
+from ui.table_sync import sync_tree
+from ui.theme_manager import theme_manager
+from ui.worker import worker_for
+
+# Relecture de l'état des tâches (ms)
+EXPORT_POLL_MS = 1000
+# Tâches affichées
+TACHES_AFFICHEES = 100
+
+FORMATS_AFFICHES = {"Excel (.xlsx)": "excel", "PDF (.pdf)": "pdf", "CSV (.csv)": "csv", "Parquet (.parquet)": "parquet"}
+EXTENSIONS = {"excel": ".xlsx", "pdf": ".pdf", "csv": ".csv", "parquet": ".parquet"}
+
+LIBELLES_STATUT = {
+    EN_ATTENTE: "⏳ En attente",
+    EN_COURS: "▶ En cours",
+    ANNULATION: "⛔ Annulation…",
+    TERMINEE: "✅ Terminé",
+    ECHEC: "❌ Échec",
+    ANNULEE: "⛔ Annulé",
+}
+
+
+class ExportWindow(tk.Toplevel):
+    def __init__(self, parent, user_id=None):
+        super().__init__(parent)
+        self.title("📤 Exports")
+        self.geometry("1000x550")
+        self.configure(bg=theme_manager.get_color("bg_primary"))
+        self.user_id = user_id
+        self.jobs = ExportJobs()
+        self.worker = worker_for(self)
+        self._after_id = None
+
+        self.create_widgets()
+        self.refresh()
+        self.bind("<Destroy>", self.on_destroy)
+
+    def create_widgets(self):
+        header_frame = tk.Frame(self, bg=theme_manager.get_color("bg_tertiary"), height=60)
+        header_frame.pack(fill=tk.X)
+        header_frame.pack_propagate(False)
+
+        header_content = tk.Frame(header_frame, bg=theme_manager.get_color("bg_tertiary"))
+        header_content.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+
+        tk.Label(header_content, text="📤 Exports en arrière-plan", font=('Arial', 16, 'bold'),
+                 bg=theme_manager.get_color("bg_tertiary"), fg=theme_manager.get_color("fg_primary")).pack(side=tk.LEFT)
+
+        tk.Button(header_content, text="← Retour", command=self.destroy, font=('Arial', 10),
+                  **theme_manager.get_button_style("secondary"), padx=15, pady=6).pack(side=tk.RIGHT)
+
+        # Nouvel export : données et format
+        launch_frame = tk.Frame(self, bg=theme_manager.get_color("bg_card"), relief='solid', bd=1)
+        launch_frame.pack(fill=tk.X, padx=20, pady=(20, 10))
+
+        label_style = {"bg": theme_manager.get_color("bg_card"), "fg": theme_manager.get_color("fg_primary"),
+                       "font": ('Arial', 10, 'bold')}
+        tk.Label(launch_frame, text="Données :", **label_style).pack(side=tk.LEFT, padx=(15, 5), pady=12)
+        self.jeux = {donnees.titre: nom for nom, donnees in JEUX_EXPORT.items()}
+        self.jeu_var = tk.StringVar(value=JEUX_EXPORT["stock"].titre)
+        ttk.Combobox(launch_frame, textvariable=self.jeu_var, values=list(self.jeux), state="readonly",
+                     width=22).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(launch_frame, text="Format :", **label_style).pack(side=tk.LEFT, padx=(15, 5))
+        self.format_var = tk.StringVar(value=next(iter(FORMATS_AFFICHES)))
+        ttk.Combobox(launch_frame, textvariable=self.format_var, values=list(FORMATS_AFFICHES), state="readonly",
+                     width=18).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(launch_frame, text="📤 Lancer l'export", command=self.launch_export, font=('Arial', 10, 'bold'),
+                  **theme_manager.get_button_style("success"), padx=15, pady=6).pack(side=tk.LEFT, padx=15)
+
+        # Tâches
+        content_frame = tk.Frame(self, bg=theme_manager.get_color("bg_card"), relief='solid', bd=1)
+        content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 10))
+
+        colonnes = ("N°", "Données", "Format", "Statut", "Progression", "Fichier", "Résultat")
+        largeurs = (50, 130, 70, 120, 90, 260, 220)
+        self.tree = ttk.Treeview(content_frame, columns=colonnes, show="headings")
+        for colonne, largeur in zip(colonnes, largeurs):
+            self.tree.heading(colonne, text=colonne)
+            self.tree.column(colonne, width=largeur, anchor='e' if colonne in ("N°", "Progression") else 'w')
+        self.tree.tag_configure(TERMINEE, foreground=theme_manager.get_color("accent_success"))
+        self.tree.tag_configure(ECHEC, foreground=theme_manager.get_color("accent_danger"))
+        self.tree.tag_configure(ANNULEE, foreground=theme_manager.get_color("fg_tertiary"))
+
+        scrollbar = ttk.Scrollbar(content_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10, padx=(0, 10))
+
+        actions_frame = tk.Frame(self, bg=theme_manager.get_color("bg_primary"))
+        actions_frame.pack(fill=tk.X, padx=20, pady=(0, 15))
+        tk.Button(actions_frame, text="⛔ Annuler l'export", command=self.cancel_export, font=('Arial', 10),
+                  **theme_manager.get_button_style("danger"), padx=15, pady=6).pack(side=tk.LEFT)
+        tk.Button(actions_frame, text="📂 Ouvrir le fichier", command=self.open_result, font=('Arial', 10),
+                  **theme_manager.get_button_style("info"), padx=15, pady=6).pack(side=tk.LEFT, padx=10)
+
+    def launch_export(self):
+        """Demande le fichier de destination puis met l'export en file"""
+        jeu = self.jeux[self.jeu_var.get()]
+        format_ = FORMATS_AFFICHES[self.format_var.get()]
+        extension = EXTENSIONS[format_]
+        fichier = filedialog.asksaveasfilename(parent=self, defaultextension=extension,
+                                               initialfile=f"{jeu}{extension}",
+                                               filetypes=[(self.format_var.get(), f"*{extension}")])
+        if not fichier:
+            return
+        options = {}
+        if jeu == "stock" and format_ == "pdf":
+            # Listing imprimé : les colonnes tiennent sur une page A4 en portrait
+            options = {"colonnes": list(COLONNES_PDF_STOCK), "titre": "Rapport de Stock"}
+        succes, message, _ = self.jobs.soumettre(jeu, format_, fichier, user_id=self.user_id, **options)
+        if not succes:
+            messagebox.showerror("Export", message, parent=self)
+            return
+        self.refresh()
+
+    def cancel_export(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Export", "Sélectionnez un export à annuler", parent=self)
+            return
+        succes, message = self.jobs.annuler(int(selection[0]))
+        if not succes:
+            messagebox.showinfo("Export", message, parent=self)
+        self.refresh()
+
+    def open_result(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        fichier = self.tree.set(selection[0], "Fichier")
+        if not os.path.exists(fichier):
+            messagebox.showinfo("Export", "Le fichier n'est pas (ou plus) disponible", parent=self)
+            return
+        try:
+            if hasattr(os, "startfile"):
+                os.startfile(fichier)
+            else:
+                import subprocess
+                subprocess.Popen(["xdg-open", fichier])
+        except OSError as e:
+            messagebox.showerror("Export", f"Impossible d'ouvrir le fichier : {e}", parent=self)
+
+    def refresh(self):
+        """Relit l'état des tâches, puis recommence une seconde plus tard"""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = None
+        self.worker.submit(self.jobs.taches, TACHES_AFFICHEES, self.user_id, key=("exports", str(self)),
+                           owner=self, on_success=self.show_jobs, on_error=self.show_error)
+
+    def show_jobs(self, taches):
+        rows = []
+        for tache in taches:
+            progression = pourcentage(tache)
+            rows.append((tache["id"], (
+                tache["id"],
+                JEUX_EXPORT[tache["jeu"]].titre if tache["jeu"] in JEUX_EXPORT else tache["jeu"],
+                tache["format"],
+                LIBELLES_STATUT.get(tache["statut"], tache["statut"]),
+                "…" if progression is None else f"{progression:.0f} %",
+                tache["fichier"],
+                tache["message"] or "",
+            ), (tache["statut"],)))
+        sync_tree(self.tree, rows)
+        self._after_id = self.after(EXPORT_POLL_MS, self.refresh)
+
+    def show_error(self, error):
+        print(f"Erreur de lecture des exports: {error}")
+        self._after_id = self.after(EXPORT_POLL_MS, self.refresh)
+
+    def on_destroy(self, event):
+        # <Destroy> est aussi émis pour chaque widget enfant ; les exports continuent sans la fenêtre
+        if event.widget is self and self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
@@ -0,0 +1,117 @@
+# ui/incremental_search.py
+"""Recherche à la frappe, temporisée et annulable.
+
+Chaque saisie incrémente une génération : un résultat arrivé pour une
+génération dépassée n'est pas affiché, et la lecture précédente est annulée
+dans l'exécuteur (requête interrompue). Une lecture dans la base n'est lancée
+qu'après une courte pause de la frappe.
+
+Les derniers résultats complets sont gardés avec leur texte déjà replié : un
+terme qui en prolonge un (tout ce qu'il trouve, l'autre le trouvait) est
+résolu en filtrant ce résultat en mémoire, sans requête ni attente ; revenir à
+un terme déjà lu (effacement) réaffiche son résultat.
+"""
+from collections import OrderedDict
+
+# Pause de la frappe avant une lecture dans la base (ms)
+SEARCH_DELAY_MS = 200
+# Au-delà, un résultat n'est pas gardé en mémoire : l'affichage reste paginé dans la base
+MAX_ROWS = 20000
+# Résultats complets gardés pour l'affinage et le retour arrière
+HISTORY_SIZE = 8
+
+
+class IncrementalSearch:
+    """Pilote la recherche d'un champ de saisie.
+
+    ``search(term, limit)`` s'exécute dans l'exécuteur et retourne les lignes
+    correspondantes (tuples), ``limit`` au plus. La comparaison en mémoire doit
+    retenir les mêmes lignes que ``search`` : ``fold(text)`` replie un texte (le
+    terme ou une colonne d'indice ``fields``), ``match(folded_term)`` retourne le
+    prédicat appliqué au texte replié d'une ligne. ``show(term, rows)`` reçoit le
+    résultat dans le thread Tk ; ``rows`` vaut None quand il n'est pas tenu en
+    mémoire (terme vide ou trop de lignes) : l'appelant filtre alors dans la base.
+    """
+
+    def __init__(self, widget, worker, search, fields, fold, match, show, on_error=None, delay=SEARCH_DELAY_MS):
+        self.widget = widget
+        self.worker = worker
+        self.search = search
+        self.fields = fields
+        self.fold = fold
+        self.match = match
+        self.show = show
+        self.on_error = on_error
+        self.delay = delay
+        self.term = None
+        self.generation = 0
+        self._after_id = None
+        self._task = None
+        # Terme replié -> [(texte replié, ligne)], du plus ancien au plus récent
+        self._history = OrderedDict()
+
+    def update(self, term):
+        """Nouvelle saisie : affiche le résultat de ``term`` dès qu'il est connu"""
+        term = term.strip()
+        if term == self.term:
+            # Touches sans effet sur le texte (flèches, Maj…)
+            return
+        self.term = term
+        self.generation += 1
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if not term:
+            self.show(term, None)
+            return
+        folded = self.fold(term)
+        entries = self._history.get(folded)
+        if entries is None:
+            base = self._base(folded)
+            if base is None:
+                self._after_id = self.widget.after(self.delay, self._read, self.generation, term)
+                return
+            # Le terme prolonge un terme lu : ses lignes sont parmi celles de ce résultat
+            match = self.match(folded)
+            entries = [entry for entry in base if match(entry[0])]
+        self._remember(folded, entries)
+        self.show(term, [row for _, row in entries])
+
+    def _base(self, folded):
+        """Résultat gardé du plus long terme dont le résultat contient celui de ``folded``"""
+        # Un terme retient le texte d'un terme qui le prolonge (« boul » retient « boulon ino »)
+        candidates = [known for known in self._history if self.match(known)(folded)]
+        return self._history[max(candidates, key=len)] if candidates else None
+
+    def _remember(self, folded, entries):
+        self._history[folded] = entries
+        self._history.move_to_end(folded)
+        while len(self._history) > HISTORY_SIZE:
+            self._history.popitem(last=False)
+
+    def _read(self, generation, term):
+        self._after_id = None
+        self._task = self.worker.submit(
+            self._fetch, term, key=("search", str(self.widget)), owner=self.widget,
+            on_success=lambda entries: self._on_result(generation, term, entries),
+            on_error=self.on_error,
+        )
+
+    def _fetch(self, term):
+        """Lecture dans l'exécuteur ; le texte comparé est replié une fois pour toutes"""
+        rows = self.search(term, MAX_ROWS + 1)
+        if len(rows) > MAX_ROWS:
+            return None
+        return [("\0".join(self.fold(str(row[i] or "")) for i in self.fields), row) for row in rows]
+
+    def _on_result(self, generation, term, entries):
+        if generation != self.generation:
+            return
+        self._task = None
+        if entries is not None:
+            self._remember(self.fold(term), entries)
+        self.show(term, None if entries is None else [row for _, row in entries])
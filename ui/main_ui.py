@@ -2,10 +2,45 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from reporting import report_manager
-import sqlite3
+from database.db import Database
+from core.stock_manager import StockManager as StockService
+from core.alert_manager import AlertManager
+from core.stats_manager import StatsManager
+from core.produit_manager import ProduitManager
 from ui.article_manager import ArticleManager
-from ui.stock_manager import StockManager
+from ui.stock_manager import HISTORIQUE, StockManager
+from ui.export_window import ExportWindow
 from ui.theme_manager import theme_manager
+from database.pagination import PagedQuery, RowsQuery
+from ui.worker import worker_for
+from ui.virtual_table import VirtualTable
+from ui.incremental_search import IncrementalSearch
+
+TOUS_EMPLACEMENTS = "Tous les emplacements"
+
+# Fréquence de lecture du journal des alertes (ms)
+ALERT_POLL_MS = 3000
+
+# Articles et stock du dialogue d'entrée / sortie, lus par pages
+ARTICLES_STOCK = PagedQuery(
+    "a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock",
+    "Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article",
+    "a.code_article",
+    {
+        "code": "a.code_article",
+        "designation": "a.designation",
+        "categorie": "IFNULL(a.categorie, '')",
+        "stock": "COALESCE(s.quantite, 0)",
+    },
+)
+
+# Tri en mémoire d'un résultat de recherche, sur les colonnes de ARTICLES_STOCK
+TRI_ARTICLES = {
+    "code": lambda row: row[0],
+    "designation": lambda row: row[1],
+    "categorie": lambda row: row[2] or "",
+    "stock": lambda row: row[3],
+}
 
 class MainUI:
     def __init__(self, root, auth_manager):
@@ -23,8 +58,16 @@ class MainUI:
         self.root.geometry("1200x800")
         self.root.configure(bg=theme_manager.get_color("bg_primary"))
         
-        # Connexion à la base de données
-        self.conn = sqlite3.connect("stock_app.db")
+        # Connexions empruntées au pool partagé
+        self.db = Database()
+        self.stock = StockService()
+        self.statistiques = StatsManager()
+        self.produits = ProduitManager()
+        # Chargements hors du thread Tk
+        self.worker = worker_for(self.root)
+        self.alertes = AlertManager()
+        self._stats_timer = None
+        self._alert_timer = None
         
         # Créer les widgets
         self.create_widgets()
@@ -34,6 +77,12 @@ class MainUI:
         
         # Rafraîchir les statistiques automatiquement
         self.refresh_stats()
+        
+        # Relayer les transitions d'alerte à toutes les fenêtres abonnées
+        self._desabonner = self.alertes.abonner(lambda evenements: self.refresh_stats())
+        self.poll_alertes()
+        # À la déconnexion, la fenêtre détruite cesse de relire les alertes et les statistiques
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
     
     def setup_styles(self):
         """Configure les styles personnalisés pour l'interface"""
@@ -153,6 +202,18 @@ class MainUI:
                                font=('Arial', 9), **refresh_style, padx=10, pady=5)
         refresh_btn.pack(side=tk.RIGHT, pady=10, padx=15)
         
+        # Filtre par emplacement
+        self.emplacement_var = tk.StringVar(value=TOUS_EMPLACEMENTS)
+        emplacement_combo = ttk.Combobox(stats_header, textvariable=self.emplacement_var, state='readonly',
+                                         values=[TOUS_EMPLACEMENTS], width=22)
+        emplacement_combo.pack(side=tk.RIGHT, pady=10)
+        self.worker.submit(self.stock.emplacements, owner=emplacement_combo,
+                           on_success=lambda emplacements: emplacement_combo.configure(
+                               values=[TOUS_EMPLACEMENTS] + emplacements))
+        emplacement_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_stats())
+        tk.Label(stats_header, text="📍 Emplacement :", font=('Arial', 10),
+                 bg=theme_manager.get_color("bg_tertiary"), fg=theme_manager.get_color("fg_secondary")).pack(side=tk.RIGHT, padx=5)
+        
         # Ligne de séparation
         separator = tk.Frame(stats_frame, bg=theme_manager.get_color("separator"), height=1)
         separator.pack(fill=tk.X)
@@ -183,53 +244,13 @@ class MainUI:
         # Boutons d'actions principales
         self.create_action_buttons(actions_content)
         
-    def get_stats_data(self):
-        """Récupère les données statistiques de la base de données"""
+    def get_stats_data(self, emplacement=TOUS_EMPLACEMENTS):
+        """Récupère les données statistiques de la base de données (exécutée hors du thread Tk)"""
         try:
-            # Nombre total d'articles
-            total_articles = self.conn.execute("SELECT COUNT(*) FROM Articles").fetchone()[0]
-            
-            # Stock total (somme des quantités)
-            total_stock = self.conn.execute(
-                "SELECT IFNULL(SUM(quantite), 0) FROM Stock"
-            ).fetchone()[0]
-            
-            # Produits en rupture (quantité = 0 ou inférieure au seuil)
-            rupture_stock = self.conn.execute("""
-                SELECT COUNT(*) FROM Articles a 
-                LEFT JOIN Stock s ON a.code_article = s.code_article 
-                WHERE IFNULL(s.quantite, 0) <= a.seuil_alerte
-            """).fetchone()[0]
-            
-            # Valeur totale du stock
-            valeur_stock = self.conn.execute("""
-                SELECT IFNULL(SUM(IFNULL(s.quantite, 0) * a.prix_vente), 0) 
-                FROM Articles a 
-                LEFT JOIN Stock s ON a.code_article = s.code_article
-            """).fetchone()[0]
-            
-            # Mouvements aujourd'hui
-            mouvements_today = self.conn.execute("""
-                SELECT COUNT(*) FROM Mouvements 
-                WHERE DATE(date_mvt) = DATE('now')
-            """).fetchone()[0]
-            
-            # Dernière activité
-            last_activity = self.conn.execute("""
-                SELECT date_mvt FROM Mouvements 
-                ORDER BY date_mvt DESC LIMIT 1
-            """).fetchone()
-            
-            last_activity_text = "Aucune activité" if not last_activity else last_activity[0]
-            
-            return {
-                'total_articles': total_articles,
-                'total_stock': total_stock,
-                'rupture_stock': rupture_stock,
-                'valeur_stock': valeur_stock,
-                'mouvements_today': mouvements_today,
-                'last_activity': last_activity_text
-            }
+            stats = self.statistiques.statistiques(None if emplacement == TOUS_EMPLACEMENTS else emplacement)
+            if stats['last_activity'] is None:
+                stats['last_activity'] = "Aucune activité"
+            return stats
         except Exception as e:
             print(f"Erreur lors de la récupération des statistiques: {e}")
             return {
@@ -243,13 +264,21 @@ class MainUI:
     
     def refresh_stats(self):
         """Rafraîchit les statistiques affichées"""
+        # Programmer le prochain rafraîchissement (toutes les 30 secondes), sans cumuler les minuteries
+        if self._stats_timer is not None:
+            self.root.after_cancel(self._stats_timer)
+        self._stats_timer = self.root.after(30000, self.refresh_stats)
+        
+        # Calcul en arrière-plan ; un rafraîchissement plus récent remplace celui en cours
+        self.worker.submit(self.get_stats_data, self.emplacement_var.get(), key="statistiques",
+                           owner=self.stats_content, on_success=self.show_stats)
+    
+    def show_stats(self, stats):
+        """Affiche les cartes de statistiques"""
         # Nettoyer le contenu existant
         for widget in self.stats_content.winfo_children():
             widget.destroy()
         
-        # Récupérer les nouvelles données
-        stats = self.get_stats_data()
-        
         # Créer la grille des statistiques
         stats_grid = tk.Frame(self.stats_content, bg=theme_manager.get_color("bg_card"))
         stats_grid.pack(fill=tk.X)
@@ -278,9 +307,23 @@ class MainUI:
         self.create_stat_card(stats_grid, "🕐 Dernière activité", 
                              stats['last_activity'][:16] if len(stats['last_activity']) > 16 else stats['last_activity'], 
                              "Dernier mouvement", 1, 2, theme_manager.get_color("fg_secondary"))
-        
-        # Programmer le prochain rafraîchissement (toutes les 30 secondes)
-        self.root.after(30000, self.refresh_stats)
+    
+    def poll_alertes(self):
+        """Lit les nouvelles transitions d'alerte en arrière-plan et les transmet aux abonnés"""
+        self.worker.submit(self.alertes.lire_evenements, key="alertes", owner=self.root,
+                           on_success=self.alertes.diffuser,
+                           on_error=lambda e: print(f"Erreur lors de la lecture des alertes: {e}"))
+        self._alert_timer = self.root.after(ALERT_POLL_MS, self.poll_alertes)
+    
+    def on_destroy(self, event):
+        # <Destroy> est aussi émis pour chaque widget enfant
+        if event.widget is not self.root:
+            return
+        self._desabonner()
+        for timer in (self._alert_timer, self._stats_timer):
+            if timer is not None:
+                self.root.after_cancel(timer)
+        self._alert_timer = self._stats_timer = None
     
     def create_stat_card(self, parent, title, value, subtitle, row, col, color):
         """Crée une carte de statistique"""
@@ -347,7 +390,7 @@ class MainUI:
         """Affiche le menu des rapports"""
         reports_window = tk.Toplevel(self.root)
         reports_window.title("📊 Rapports")
-        reports_window.geometry("600x400")
+        reports_window.geometry("600x480")
         reports_window.configure(bg=theme_manager.get_color("bg_primary"))
         
         # Header
@@ -380,7 +423,8 @@ class MainUI:
             ("📈 Historique Entrées", self.show_entry_mouvements),
             ("📉 Historique Sorties", self.show_exit_mouvements),
             ("💰 Valeur Stock", lambda: StockManager(self.root).show_stock_value()),
-            ("🏆 Top Vendeurs", lambda: StockManager(self.root).show_top_sellers())
+            ("🏆 Top Vendeurs", lambda: StockManager(self.root).show_top_sellers()),
+            ("📤 Exports", lambda: ExportWindow(self.root, self.current_user['id']))
         ]
         
         for i, (text, command) in enumerate(report_buttons):
@@ -497,7 +541,11 @@ class MainUI:
                 search_entry.configure(fg=theme_manager.get_color("fg_tertiary"))
         
         def on_search_change(event):
-            self.filter_articles(articles_tree, search_entry.get())
+            term = search_entry.get()
+            if term == "Rechercher par code, nom ou catégorie...":
+                term = ""
+            # Temporisé : seule la saisie en cours est lue, les précédentes sont annulées
+            article_search.update(term)
         
         search_entry.bind("<FocusIn>", on_search_focus_in)
         search_entry.bind("<FocusOut>", on_search_focus_out)
@@ -671,92 +719,59 @@ class MainUI:
         
         articles_tree.bind("<<TreeviewSelect>>", on_article_select)
         
-        # Charger tous les articles
-        self.load_all_articles(articles_tree)
+        # Configuration des couleurs des tags
+        articles_tree.tag_configure("red", foreground="#e74c3c")
+        articles_tree.tag_configure("orange", foreground="#f39c12") 
+        articles_tree.tag_configure("green", foreground="#27ae60")
+        
+        # Charger les articles : seules les lignes visibles sont lues
+        articles_table = VirtualTable(articles_tree, articles_v_scrollbar, ARTICLES_STOCK, self.worker, "designation",
+                                      format_row=self.format_article,
+                                      on_error=lambda e: messagebox.showerror(
+                                          "❌ Erreur", f"Erreur lors du chargement des articles: {str(e)}"))
+        self.load_all_articles(articles_table)
+        article_search = IncrementalSearch(
+            search_entry, self.worker, self.produits.rechercher_articles, (0, 1, 2),
+            self.produits.plier_recherche, self.produits.critere_recherche,
+            lambda term, rows: self.show_found_articles(articles_table, term, rows),
+            on_error=lambda e: messagebox.showerror("❌ Erreur", f"Erreur lors de la recherche: {str(e)}"))
         
         # Focus initial sur la recherche
         search_entry.focus()
 
-    def load_all_articles(self, tree):
+    def load_all_articles(self, table):
         """Charge tous les articles dans le tableau"""
-        try:
-            # Requête pour récupérer tous les articles avec leur stock
-            query = """
-            SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock
-            FROM Articles a
-            LEFT JOIN Stock s ON a.code_article = s.code_article
-            ORDER BY a.designation
-            """
-            articles = self.conn.execute(query).fetchall()
-            
-            # Vider le tableau
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # Ajouter les articles
-            for article in articles:
-                # Couleur selon le niveau de stock
-                tags = ()
-                stock = int(article[3]) if article[3] else 0
-                if stock == 0:
-                    tags = ("red",)
-                elif stock < 10:  # Seuil arbitraire
-                    tags = ("orange",)
-                else:
-                    tags = ("green",)
-                
-                tree.insert("", tk.END, values=article, tags=tags)
-            
-            # Configuration des couleurs des tags
-            tree.tag_configure("red", foreground="#e74c3c")
-            tree.tag_configure("orange", foreground="#f39c12") 
-            tree.tag_configure("green", foreground="#27ae60")
-            
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors du chargement des articles: {str(e)}")
+        table.set_query(ARTICLES_STOCK)
 
-    def filter_articles(self, tree, search_term):
-        """Filtre les articles selon le terme de recherche"""
+    def filter_articles(self, table, search_term):
+        """Filtre les articles selon le terme de recherche, par pages lues dans la base"""
         if search_term == "Rechercher..." or not search_term:
-            self.load_all_articles(tree)
+            self.load_all_articles(table)
             return
         
-        try:
-            # Requête de recherche
-            query = """
-            SELECT a.code_article, a.designation, a.categorie, COALESCE(s.quantite, 0) as stock
-            FROM Articles a
-            LEFT JOIN Stock s ON a.code_article = s.code_article
-            WHERE a.code_article LIKE ? OR a.designation LIKE ? OR a.categorie LIKE ?
-            ORDER BY a.designation
-            """
-            search_pattern = f"%{search_term}%"
-            articles = self.conn.execute(query, (search_pattern, search_pattern, search_pattern)).fetchall()
-            
-            # Vider le tableau
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # Ajouter les articles filtrés
-            for article in articles:
-                tags = ()
-                stock = int(article[3]) if article[3] else 0
-                if stock == 0:
-                    tags = ("red",)
-                elif stock < 10:
-                    tags = ("orange",)
-                else:
-                    tags = ("green",)
-                
-                tree.insert("", tk.END, values=article, tags=tags)
-            
-            # Configuration des couleurs des tags
-            tree.tag_configure("red", foreground="#e74c3c")
-            tree.tag_configure("orange", foreground="#f39c12") 
-            tree.tag_configure("green", foreground="#27ae60")
-            
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de la recherche: {str(e)}")
+        # Index plein texte, ou LIKE sans FTS5 ; la table ne garde que la dernière saisie
+        table.set_query(ARTICLES_STOCK.filtered(*self.produits.filtre_articles(search_term)))
+
+    def show_found_articles(self, table, term, rows):
+        """Affiche un résultat de recherche gardé en mémoire, ou filtre dans la base s'il n'y en a pas"""
+        if rows is None:
+            self.filter_articles(table, term)
+            return
+        # Ordre de pertinence de la recherche, jusqu'au clic sur un en-tête
+        rangs = {row[0]: rang for rang, row in enumerate(rows)}
+        tri = dict(TRI_ARTICLES, pertinence=lambda row: rangs[row[0]])
+        table.set_query(RowsQuery(rows, lambda row: row[0], tri), sort="pertinence")
+
+    def format_article(self, article):
+        """Couleur d'un article selon le niveau de stock"""
+        stock = int(article[3]) if article[3] else 0
+        if stock == 0:
+            tags = ("red",)
+        elif stock < 10:  # Seuil arbitraire
+            tags = ("orange",)
+        else:
+            tags = ("green",)
+        return article, tags
 
     def update_selected_article_info_improved(self, article, label, type_mouvement):
         """Met à jour l'affichage des informations de l'article sélectionné avec design amélioré"""
@@ -814,40 +829,32 @@ class MainUI:
             messagebox.showerror("❌ Erreur", "La quantité doit être supérieure à 0")
             return
         
-        # Pour les sorties, vérifier le stock disponible
-        if type_mouvement == "sortie" and selected_article["stock"] < quantite:
-            messagebox.showerror("❌ Erreur", f"Stock insuffisant pour cette sortie\nStock disponible: {selected_article['stock']}")
-            return
+        # La sélection peut changer pendant l'écriture : l'article est lu ici, dans le thread Tk
+        code_article, designation = selected_article["code"], selected_article["designation"]
+        user_id = self.current_user['id']
         
-        try:
-            # Enregistrer le mouvement selon le modèle Mouvement
-            self.conn.execute(
-                "INSERT INTO Mouvements (type, code_article, quantite, date_mvt, user_id) VALUES (?, ?, ?, datetime('now'), ?)",
-                (type_mouvement, selected_article["code"], quantite, self.current_user['id'])
-            )
-            
-            # Mettre à jour le stock
+        def enregistrer():
             if type_mouvement == "entrée":
-                self.conn.execute(
-                    "INSERT OR REPLACE INTO Stock (code_article, quantite) VALUES (?, COALESCE((SELECT quantite FROM Stock WHERE code_article = ?), 0) + ?)",
-                    (selected_article["code"], selected_article["code"], quantite)
-                )
-            else:  # sortie
-                self.conn.execute(
-                    "UPDATE Stock SET quantite = quantite - ? WHERE code_article = ?",
-                    (quantite, selected_article["code"])
-                )
-            
-            self.conn.commit()
-            messagebox.showinfo("✅ Succès", f"{type_mouvement.capitalize()} de stock enregistrée avec succès!\n\nArticle: {selected_article['designation']}\nQuantité: {quantite}")
+                return self.stock.ajouter_stock(code_article, quantite, user_id=user_id)
+            # Le stock affiché peut être périmé : le contrôle se fait à l'écriture
+            return self.stock.sortie_stock(code_article, quantite, user_id)
+        
+        def enregistre(resultat):
+            succes, message = resultat
+            if not succes:
+                messagebox.showerror("❌ Erreur", message, parent=dialog)
+                return
+            messagebox.showinfo("✅ Succès", f"{type_mouvement.capitalize()} de stock enregistrée avec succès!\n\nArticle: {designation}\nQuantité: {quantite}")
             dialog.destroy()
             
             # Rafraîchir les statistiques
             if hasattr(self, 'refresh_stats'):
                 self.refresh_stats()
-                
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}")
+        
+        # Écriture hors du thread Tk : une base verrouillée ne fige pas le dialogue
+        self.worker.submit(enregistrer, owner=dialog, loading=qty_entry, on_success=enregistre,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}", parent=dialog))
     
     def get_current_datetime(self):
         """Retourne la date et heure actuelles formatées"""
@@ -894,15 +901,15 @@ class MainUI:
         filter_buttons.pack(side=tk.LEFT)
         
         all_style = theme_manager.get_button_style("info")
-        tk.Button(filter_buttons, text="📊 Tous", command=lambda: self.filter_movements(movements_tree, "tous"),
+        tk.Button(filter_buttons, text="📊 Tous", command=lambda: self.filter_movements(movements_table, "tous"),
                  font=('Arial', 9), **all_style, padx=10, pady=4).pack(side=tk.LEFT, padx=(0, 5))
         
         entry_style = theme_manager.get_button_style("success")
-        tk.Button(filter_buttons, text="📈 Entrées", command=lambda: self.filter_movements(movements_tree, "entrée"),
+        tk.Button(filter_buttons, text="📈 Entrées", command=lambda: self.filter_movements(movements_table, "entrée"),
                  font=('Arial', 9), **entry_style, padx=10, pady=4).pack(side=tk.LEFT, padx=(0, 5))
         
         exit_style = theme_manager.get_button_style("danger")
-        tk.Button(filter_buttons, text="📉 Sorties", command=lambda: self.filter_movements(movements_tree, "sortie"),
+        tk.Button(filter_buttons, text="📉 Sorties", command=lambda: self.filter_movements(movements_table, "sortie"),
                  font=('Arial', 9), **exit_style, padx=10, pady=4).pack(side=tk.LEFT)
         
         # Tableau
@@ -958,58 +965,36 @@ class MainUI:
         v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
         
-        # Charger tous les mouvements
-        self.filter_movements(movements_tree, "tous")
+        # Charger les mouvements : une page à l'ouverture, quelle que soit la taille de l'historique
+        movements_table = VirtualTable(movements_tree, v_scrollbar, HISTORIQUE, self.worker, "date", descending=True,
+                                       format_row=self.format_movement,
+                                       on_error=lambda e: messagebox.showerror(
+                                           "❌ Erreur", f"Erreur lors du chargement: {str(e)}"))
+        self.filter_movements(movements_table, "tous")
     
-    def filter_movements(self, tree, filter_type):
+    def filter_movements(self, table, filter_type):
         """Filtre les mouvements selon le type (adapté au modèle)"""
-        # Vider le tableau
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        try:
-            # Requête selon le filtre - utilisation des noms corrects du modèle
-            if filter_type == "tous":
-                query = """
-                SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet
-                FROM Mouvements m
-                LEFT JOIN Articles a ON m.code_article = a.code_article
-                LEFT JOIN Utilisateurs u ON m.user_id = u.id
-                ORDER BY m.date_mvt DESC
-                """
-                params = ()
-            else:
-                query = """
-                SELECT m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet
-                FROM Mouvements m
-                LEFT JOIN Articles a ON m.code_article = a.code_article
-                LEFT JOIN Utilisateurs u ON m.user_id = u.id
-                WHERE m.type = ?
-                ORDER BY m.date_mvt DESC
-                """
-                params = (filter_type,)
-            
-            mouvements = self.conn.execute(query, params).fetchall()
-            
-            for mouvement in mouvements:
-                # Formatter les données pour l'affichage
-                date_str = mouvement[0] if mouvement[0] else "N/A"
-                type_icon = "📈" if mouvement[1] == "entrée" else "📉"
-                type_display = f"{type_icon} {mouvement[1].capitalize()}"
-                
-                values = (
-                    date_str,
-                    type_display,
-                    mouvement[2] or "N/A",
-                    mouvement[3] or "Article supprimé",
-                    mouvement[4] or 0,
-                    mouvement[5] or "Utilisateur supprimé"
-                )
-                
-                tree.insert("", tk.END, values=values)
-                
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors du chargement: {str(e)}")
+        # Un nouveau filtre annule le chargement précédent, même en cours de requête
+        if filter_type == "tous":
+            table.set_query(HISTORIQUE)
+        else:
+            table.set_query(HISTORIQUE.filtered("m.type = ?", (filter_type,)))
+    
+    def format_movement(self, mouvement):
+        """Formatte un mouvement pour l'affichage"""
+        date_str = mouvement[0] if mouvement[0] else "N/A"
+        type_icon = "📈" if mouvement[1] == "entrée" else "📉"
+        type_display = f"{type_icon} {mouvement[1].capitalize()}"
+        
+        values = (
+            date_str,
+            type_display,
+            mouvement[2] or "N/A",
+            mouvement[3] or "Article supprimé",
+            mouvement[4] or 0,
+            mouvement[5] or "Utilisateur supprimé"
+        )
+        return values, ()
     
     def manage_stock(self):
         StockManager(self.root)
@@ -1076,20 +1061,29 @@ class MainUI:
     
     def supplier_stats(self):
         """Affiche les statistiques des fournisseurs"""
-        try:
-            # Compter les fournisseurs
-            total_suppliers = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs").fetchone()[0]
+        def compter():
+            with self.db.get_connection() as conn:
+                # Compter les fournisseurs
+                total_suppliers = conn.execute("SELECT COUNT(*) FROM Fournisseurs").fetchone()[0]
+                
+                # Fournisseurs avec email
+                with_email = conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE email IS NOT NULL AND email != ''").fetchone()[0]
             
+                # Fournisseurs avec adresse
+                with_address = conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE adresse IS NOT NULL AND adresse != ''").fetchone()[0]
+            return total_suppliers, with_email, with_address
+        
+        self.worker.submit(compter, on_success=lambda comptes: self.show_supplier_stats(*comptes),
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors du calcul des statistiques: {str(e)}"))
+    
+    def show_supplier_stats(self, total_suppliers, with_email, with_address):
+        """Affiche les statistiques des fournisseurs calculées"""
+        try:
             if total_suppliers == 0:
                 messagebox.showinfo("📊 Statistiques", "Aucun fournisseur enregistré")
                 return
             
-            # Fournisseurs avec email
-            with_email = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE email IS NOT NULL AND email != ''").fetchone()[0]
-            
-            # Fournisseurs avec adresse
-            with_address = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE adresse IS NOT NULL AND adresse != ''").fetchone()[0]
-            
             stats_text = f"""📊 Statistiques des fournisseurs
 
 🏢 Total fournisseurs: {total_suppliers}
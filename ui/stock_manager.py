@@ -1,8 +1,55 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
 from tkinter import simpledialog
 from ui.theme_manager import theme_manager
+from database.db import Database
+from core.stock_manager import StockManager as StockService
+from core.alert_manager import AlertManager
+from reporting import report_manager
+from database.query_cache import QueryCache
+from database.pagination import PagedQuery
+from ui.worker import worker_for
+from ui.virtual_table import VirtualTable
+
+TOUS_EMPLACEMENTS = "Tous les emplacements"
+
+# État du stock de tout le magasin, lu par pages ; tris sans NULL, la désignation est indexée
+STOCK_GLOBAL = PagedQuery(
+    "a.code_article, a.designation, COALESCE(s.quantite, 0) AS quantite, a.seuil_alerte",
+    "Articles a LEFT JOIN StockSolde s ON a.code_article = s.code_article",
+    "a.code_article",
+    {
+        "code_article": "a.code_article",
+        "designation": "a.designation",
+        "quantite": "COALESCE(s.quantite, 0)",
+        "seuil_alerte": "IFNULL(a.seuil_alerte, 0)",
+    },
+)
+
+# Stock d'un emplacement, filtré par emplacement à l'affichage
+STOCK_EMPLACEMENT = PagedQuery(
+    "a.code_article, a.designation, s.quantite, a.seuil_alerte",
+    "Stock s JOIN Articles a ON a.code_article = s.code_article",
+    "a.code_article",
+    {
+        "code_article": "a.code_article",
+        "designation": "a.designation",
+        "quantite": "s.quantite",
+        "seuil_alerte": "IFNULL(a.seuil_alerte, 0)",
+    },
+)
+
+# Historique des mouvements, lu par pages ; seules les colonnes indexées sont triables.
+# date_mvt peut être NULL (affichée « N/A ») : le tri porte sur l'expression indexée IFNULL(m.date_mvt, '')
+HISTORIQUE = PagedQuery(
+    "m.date_mvt, m.type, m.code_article, a.designation, m.quantite, u.nom_complet",
+    """Mouvements m
+    LEFT JOIN Articles a ON m.code_article = a.code_article
+    LEFT JOIN Utilisateurs u ON m.user_id = u.id""",
+    "m.id",
+    {"date": "IFNULL(m.date_mvt, '')", "code_article": "m.code_article"},
+    count_from="Mouvements m",
+)
 
 class StockManager(tk.Toplevel):
     def __init__(self, parent):
@@ -10,14 +57,23 @@ class StockManager(tk.Toplevel):
         self.title("Gestion du stock")
         self.geometry("1200x700")
         self.configure(bg=theme_manager.get_color("bg_primary"))
-        self.conn = sqlite3.connect("stock_app.db")
+        self.db = Database()
+        self.stock = StockService()
+        self.alertes = AlertManager()
+        # Chargements hors du thread Tk, annulés à la fermeture de la fenêtre
+        self.worker = worker_for(self)
         
         # Configuration des styles
         self.setup_styles()
         
         self.create_widgets()
+        self.load_emplacements()
         self.refresh_table()
         self.show_alerts()
+        
+        # Mise à jour sur transition d'alerte plutôt que par relecture du catalogue
+        self._desabonner = AlertManager.abonner(self.on_alert_transition)
+        self.bind("<Destroy>", self.on_destroy)
 
     def setup_styles(self):
         """Configure les styles personnalisés pour l'interface"""
@@ -129,6 +185,10 @@ class StockManager(tk.Toplevel):
         primary_style = theme_manager.get_button_style("primary")
         tk.Button(btn_row2, text="🏆 Articles les plus vendus", command=self.show_top_sellers,
                  font=('Arial', 10, 'bold'), **primary_style, padx=12, pady=6).pack(side=tk.LEFT, padx=(0, 8))
+        
+        secondary_style = theme_manager.get_button_style("secondary")
+        tk.Button(btn_row2, text="🔁 Transfert entre emplacements", command=self.show_transfer_dialog,
+                 font=('Arial', 10, 'bold'), **secondary_style, padx=12, pady=6).pack(side=tk.LEFT, padx=(0, 8))
 
         # Section du tableau
         table_frame = tk.Frame(self, bg=theme_manager.get_color("bg_secondary"), relief='solid', bd=1)
@@ -140,7 +200,16 @@ class StockManager(tk.Toplevel):
         table_title = tk.Label(table_header, text="📦 État actuel du stock", 
                               font=('Arial', 14, 'bold'), bg=theme_manager.get_color("bg_tertiary"), 
                               fg=theme_manager.get_color("fg_primary"))
-        table_title.pack(pady=10)
+        table_title.pack(side=tk.LEFT, pady=10, padx=15)
+        
+        # Filtre par emplacement : les entrées et sorties saisies ici s'y appliquent
+        self.emplacement_var = tk.StringVar(value=TOUS_EMPLACEMENTS)
+        self.emplacement_combo = ttk.Combobox(table_header, textvariable=self.emplacement_var, state='readonly',
+                                              values=[TOUS_EMPLACEMENTS], width=22)
+        self.emplacement_combo.pack(side=tk.RIGHT, pady=10, padx=15)
+        self.emplacement_combo.bind('<<ComboboxSelected>>', lambda e: (self.refresh_table(), self.show_alerts()))
+        tk.Label(table_header, text="📍 Emplacement :", font=('Arial', 10),
+                 bg=theme_manager.get_color("bg_tertiary"), fg=theme_manager.get_color("fg_secondary")).pack(side=tk.RIGHT)
         
         # Ligne de séparation
         separator2 = tk.Frame(table_frame, bg=theme_manager.get_color("separator"), height=1)
@@ -177,32 +246,6 @@ class StockManager(tk.Toplevel):
         
         table_content.grid_rowconfigure(0, weight=1)
         table_content.grid_columnconfigure(0, weight=1)
-
-    def refresh_table(self):
-        """Rafraîchit le tableau des stocks"""
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        
-        query = """
-        SELECT a.code_article, a.designation, 
-               COALESCE(s.quantite, 0) as quantite, 
-               a.seuil_alerte
-        FROM Articles a
-        LEFT JOIN Stock s ON a.code_article = s.code_article
-        ORDER BY a.designation
-        """
-        stocks = self.conn.execute(query).fetchall()
-        
-        for stock in stocks:
-            # Colorer les lignes selon le niveau de stock
-            if stock[2] <= stock[3]:  # Stock sous le seuil
-                tags = ('alerte',)
-            elif stock[2] <= stock[3] * 1.5:  # Stock faible
-                tags = ('faible',)
-            else:
-                tags = ('normal',)
-            
-            self.tree.insert("", tk.END, values=stock, tags=tags)
         
         # Configuration des tags pour les couleurs
         self.tree.tag_configure('alerte', background=theme_manager.get_color("accent_danger"), 
@@ -210,27 +253,77 @@ class StockManager(tk.Toplevel):
         self.tree.tag_configure('faible', background=theme_manager.get_color("accent_warning"), 
                                foreground='white')
         self.tree.tag_configure('normal', background=theme_manager.get_color("bg_secondary"))
+        
+        # Seules les lignes visibles sont lues
+        self.table = VirtualTable(self.tree, v_scrollbar, STOCK_GLOBAL, self.worker, "designation",
+                                  format_row=self.format_stock,
+                                  on_error=lambda e: messagebox.showerror(
+                                      "❌ Erreur", f"Erreur lors du chargement du stock: {str(e)}", parent=self))
+        self.emplacement_affiche = None
+
+    def emplacement_courant(self):
+        """Retourne l'emplacement filtré, ou None pour tous les emplacements"""
+        emplacement = self.emplacement_var.get()
+        return None if emplacement == TOUS_EMPLACEMENTS else emplacement
+
+    def load_emplacements(self):
+        """Charge la liste des emplacements du filtre"""
+        self.worker.submit(self.stock.emplacements, owner=self, key=("emplacements", str(self)),
+                           on_success=lambda emplacements: self.emplacement_combo.configure(
+                               values=[TOUS_EMPLACEMENTS] + emplacements))
+
+    def refresh_table(self):
+        """Rafraîchit le tableau des stocks"""
+        emplacement = self.emplacement_courant()
+        if emplacement == self.emplacement_affiche:
+            self.table.reload(keep_position=True)
+            return
+        self.emplacement_affiche = emplacement
+        if emplacement:
+            self.table.set_query(STOCK_EMPLACEMENT.filtered("s.emplacement = ? AND s.quantite != 0", (emplacement,)))
+        else:
+            self.table.set_query(STOCK_GLOBAL)
+
+    def format_stock(self, stock):
+        """Colore les lignes selon le niveau de stock"""
+        if stock[2] <= stock[3]:  # Stock sous le seuil
+            tags = ('alerte',)
+        elif stock[2] <= stock[3] * 1.5:  # Stock faible
+            tags = ('faible',)
+        else:
+            tags = ('normal',)
+        return stock, tags
+
+    def load_alerts(self, emplacement):
+        """Compte les articles en alerte (exécutée hors du thread Tk)"""
+        if emplacement:
+            return len([s for s in self.stock.stock_emplacement(emplacement)
+                        if s["seuil_alerte"] is not None and s["quantite"] <= s["seuil_alerte"]])
+        return len(self.alertes.alertes_ouvertes())
 
     def show_alerts(self):
         """Affiche les alertes de stock"""
-        query = """
-        SELECT a.code_article, a.designation, 
-               COALESCE(s.quantite, 0) as quantite, 
-               a.seuil_alerte
-        FROM Articles a
-        LEFT JOIN Stock s ON a.code_article = s.code_article
-        WHERE COALESCE(s.quantite, 0) <= a.seuil_alerte
-        ORDER BY COALESCE(s.quantite, 0) ASC
-        """
-        alertes = self.conn.execute(query).fetchall()
-        
-        if alertes:
-            alert_text = f"⚠️ ALERTE: {len(alertes)} article(s) en rupture de stock ou en quantité faible!"
+        self.worker.submit(self.load_alerts, self.emplacement_courant(), key=("alertes", str(self)),
+                           owner=self, on_success=self.show_alert_count)
+
+    def show_alert_count(self, nombre):
+        if nombre:
+            alert_text = f"⚠️ ALERTE: {nombre} article(s) en rupture de stock ou en quantité faible!"
             self.alert_label.configure(text=alert_text, fg=theme_manager.get_color("accent_danger"))
         else:
             self.alert_label.configure(text="✅ Tous les stocks sont au niveau optimal", 
                                      fg=theme_manager.get_color("accent_success"))
 
+    def on_alert_transition(self, evenements):
+        """Rafraîchit les alertes et le tableau lorsqu'une alerte est levée ou résolue"""
+        self.refresh_table()
+        self.show_alerts()
+
+    def on_destroy(self, event):
+        # <Destroy> est aussi émis pour chaque widget enfant
+        if event.widget is self:
+            self._desabonner()
+
     def add_entry(self):
         """Ajoute une entrée de stock"""
         self.show_movement_dialog("entrée")
@@ -319,44 +412,27 @@ class StockManager(tk.Toplevel):
                 messagebox.showerror("❌ Erreur", "Veuillez remplir tous les champs avec des valeurs valides")
                 return
             
-            try:
-                # Vérifier si l'article existe
-                article = self.conn.execute("SELECT * FROM Articles WHERE code_article = ?", (code_article,)).fetchone()
-                if not article:
-                    messagebox.showerror("❌ Erreur", f"L'article avec le code '{code_article}' n'existe pas")
-                    return
-                
-                # Enregistrer le mouvement
-                self.conn.execute(
-                    "INSERT INTO Mouvements (code_article, type, quantite, date_heure) VALUES (?, ?, ?, datetime('now'))",
-                    (code_article, type_mouvement, quantite)
-                )
-                
-                # Mettre à jour le stock
+            emplacement = self.emplacement_courant()
+            
+            def enregistrer():
                 if type_mouvement == "entrée":
-                    self.conn.execute(
-                        "INSERT OR REPLACE INTO Stock (code_article, quantite) VALUES (?, COALESCE((SELECT quantite FROM Stock WHERE code_article = ?), 0) + ?)",
-                        (code_article, code_article, quantite)
-                    )
-                else:  # sortie
-                    current_stock = self.conn.execute("SELECT quantite FROM Stock WHERE code_article = ?", (code_article,)).fetchone()
-                    if not current_stock or current_stock[0] < quantite:
-                        messagebox.showerror("❌ Erreur", "Stock insuffisant pour cette sortie")
-                        return
-                    
-                    self.conn.execute(
-                        "UPDATE Stock SET quantite = quantite - ? WHERE code_article = ?",
-                        (quantite, code_article)
-                    )
-                
-                self.conn.commit()
+                    return self.stock.ajouter_stock(code_article, quantite, emplacement)
+                return self.stock.sortie_stock(code_article, quantite, emplacement=emplacement)
+            
+            def enregistre(resultat):
+                succes, message = resultat
+                if not succes:
+                    messagebox.showerror("❌ Erreur", message, parent=dialog)
+                    return
                 messagebox.showinfo("✅ Succès", f"{type_mouvement.capitalize()} de stock enregistrée")
                 dialog.destroy()
                 self.refresh_table()
                 self.show_alerts()
-                
-            except Exception as e:
-                messagebox.showerror("❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}")
+            
+            # Écriture hors du thread Tk : une base verrouillée ne fige pas le dialogue
+            self.worker.submit(enregistrer, owner=dialog, loading=button_frame, on_success=enregistre,
+                               on_error=lambda e: messagebox.showerror(
+                                   "❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}", parent=dialog))
         
         save_style = theme_manager.get_button_style("success")
         tk.Button(button_frame, text="✅ Enregistrer", command=save_movement,
@@ -369,6 +445,75 @@ class StockManager(tk.Toplevel):
         # Focus sur le premier champ
         code_entry.focus()
 
+    def show_transfer_dialog(self):
+        """Affiche la boîte de dialogue de transfert entre emplacements"""
+        dialog = tk.Toplevel(self)
+        dialog.title("🔁 Transfert entre emplacements")
+        dialog.geometry("500x420")
+        dialog.configure(bg=theme_manager.get_color("bg_primary"))
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        content_frame = tk.Frame(dialog, bg=theme_manager.get_color("bg_secondary"))
+        content_frame.pack(fill=tk.BOTH, expand=True, padx=30, pady=30)
+        
+        champs = {}
+        for cle, libelle in (("code", "📋 Code article:"), ("quantite", "📊 Quantité:"),
+                             ("source", "📍 Depuis:"), ("destination", "📍 Vers (nouvel emplacement possible):")):
+            tk.Label(content_frame, text=libelle, font=('Arial', 11, 'bold'),
+                    bg=theme_manager.get_color("bg_secondary"), fg=theme_manager.get_color("fg_primary")).pack(anchor=tk.W, pady=(0, 5))
+            if cle in ("source", "destination"):
+                champ = ttk.Combobox(content_frame, values=[], font=('Arial', 11),
+                                     state='readonly' if cle == "source" else 'normal')
+            else:
+                champ = tk.Entry(content_frame, font=('Arial', 11), width=30,
+                                 bg=theme_manager.get_color("bg_input"), fg=theme_manager.get_color("fg_tertiary"),
+                                 relief='solid', bd=1)
+            champ.pack(fill=tk.X, pady=(0, 10))
+            champs[cle] = champ
+        if self.emplacement_courant():
+            champs["source"].set(self.emplacement_courant())
+        
+        def show_emplacements(emplacements):
+            champs["source"].configure(values=emplacements)
+            champs["destination"].configure(values=emplacements)
+        self.worker.submit(self.stock.emplacements, owner=dialog, on_success=show_emplacements)
+        
+        def save_transfer():
+            try:
+                quantite = int(champs["quantite"].get())
+            except ValueError:
+                messagebox.showerror("❌ Erreur", "La quantité doit être un nombre entier")
+                return
+            
+            def transfere(resultat):
+                succes, message = resultat
+                if not succes:
+                    messagebox.showerror("❌ Erreur", message, parent=dialog)
+                    return
+                messagebox.showinfo("✅ Succès", message)
+                dialog.destroy()
+                self.load_emplacements()
+                self.refresh_table()
+                self.show_alerts()
+            
+            self.worker.submit(self.stock.transferer_stock, champs["code"].get().strip(), quantite,
+                               champs["source"].get().strip(), champs["destination"].get().strip(),
+                               owner=dialog, loading=button_frame, on_success=transfere,
+                               on_error=lambda e: messagebox.showerror(
+                                   "❌ Erreur", f"Erreur lors du transfert: {str(e)}", parent=dialog))
+        
+        button_frame = tk.Frame(content_frame, bg=theme_manager.get_color("bg_secondary"))
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        save_style = theme_manager.get_button_style("success")
+        tk.Button(button_frame, text="✅ Transférer", command=save_transfer,
+                 font=('Arial', 11, 'bold'), **save_style, padx=20, pady=10).pack(side=tk.LEFT, padx=(0, 10))
+        cancel_style = theme_manager.get_button_style("secondary")
+        tk.Button(button_frame, text="❌ Annuler", command=dialog.destroy,
+                 font=('Arial', 11), **cancel_style, padx=20, pady=10).pack(side=tk.LEFT)
+        
+        champs["code"].focus()
+
     def show_report(self):
         # Affiche un rapport moderne des mouvements
         win = tk.Toplevel(self)
@@ -399,15 +544,23 @@ class StockManager(tk.Toplevel):
         content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
         # Tableau
-        tree = ttk.Treeview(content_frame, columns=("Date", "Type", "Code article", "Quantité"), show="headings")
-        for col in ("Date", "Type", "Code article", "Quantité"):
-            tree.heading(col, text=f"📅 {col}" if col == "Date" else f"📦 {col}" if col == "Code article" else f"🔢 {col}" if col == "Quantité" else f"🔄 {col}")
+        headers = {"date": "📅 Date", "type": "🔄 Type", "code_article": "📦 Code article", "quantite": "🔢 Quantité"}
+        tree = ttk.Treeview(content_frame, columns=tuple(headers), show="headings")
+        for col, text in headers.items():
+            tree.heading(col, text=text)
             tree.column(col, width=200)
-        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        mouvements = self.conn.execute("SELECT date_mvt, type, code_article, quantite FROM Mouvements ORDER BY date_mvt DESC").fetchall()
-        for m in mouvements:
-            tree.insert("", tk.END, values=m)
+        scrollbar = ttk.Scrollbar(content_frame, orient=tk.VERTICAL)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10, padx=(0, 10))
+        
+        # Lu par pages comme l'historique principal : l'ouverture ne dépend pas de la taille du registre
+        def format_movement(mouvement):
+            return (mouvement[0] or "N/A", mouvement[1], mouvement[2], mouvement[4]), ()
+        table = VirtualTable(tree, scrollbar, HISTORIQUE, self.worker, "date", descending=True,
+                             format_row=format_movement,
+                             on_error=lambda e: messagebox.showerror(
+                                 "❌ Erreur", f"Erreur lors du chargement des mouvements: {str(e)}", parent=win))
+        table.reload()
 
     def show_stock_value(self):
         # Fenêtre moderne pour la valeur du stock
@@ -434,16 +587,6 @@ class StockManager(tk.Toplevel):
                              padx=15, pady=6, cursor='hand2')
         close_btn.pack(side=tk.RIGHT)
         
-        # Calcule la valeur totale du stock
-        query = """
-        SELECT a.code_article, a.designation, IFNULL(s.quantite, 0), a.prix_vente,
-               IFNULL(s.quantite, 0) * a.prix_vente AS valeur
-        FROM Articles a
-        LEFT JOIN Stock s ON a.code_article = s.code_article
-        """
-        articles = self.conn.execute(query).fetchall()
-        total = sum(row[4] for row in articles)
-        
         # Contenu
         content_frame = tk.Frame(win, bg='white', relief='solid', bd=1)
         content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -452,7 +595,7 @@ class StockManager(tk.Toplevel):
         total_frame = tk.Frame(content_frame, bg='#e8f5e8', relief='solid', bd=1)
         total_frame.pack(fill=tk.X, padx=10, pady=10)
         
-        total_label = tk.Label(total_frame, text=f"💰 Valeur totale du stock : {total:.2f} €", 
+        total_label = tk.Label(total_frame, text="💰 Valeur totale du stock : …", 
                               font=('Arial', 16, 'bold'), bg='#e8f5e8', fg='#155724')
         total_label.pack(pady=15)
         
@@ -464,8 +607,23 @@ class StockManager(tk.Toplevel):
             tree.column(col, width=150)
         tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        for row in articles:
-            tree.insert("", tk.END, values=row)
+        # Calcule la valeur totale du stock
+        query = """
+        SELECT a.code_article, a.designation, IFNULL(s.quantite, 0), a.prix_vente,
+               IFNULL(s.quantite, 0) * a.prix_vente AS valeur
+        FROM Articles a
+        LEFT JOIN StockSolde s ON a.code_article = s.code_article
+        """
+        def load_values():
+            with self.db.get_connection() as conn:
+                return [tuple(row) for row in conn.execute(query).fetchall()]
+        
+        def show_values(articles):
+            total = sum(row[4] for row in articles)
+            total_label.configure(text=f"💰 Valeur totale du stock : {total:.2f} €")
+            self.worker.fill_tree(tree, ((row, ()) for row in articles))
+        
+        self.worker.submit(load_values, owner=win, loading=tree, on_success=show_values)
 
     def show_top_sellers(self):
         # Fenêtre moderne pour les articles les plus vendus
@@ -496,18 +654,6 @@ class StockManager(tk.Toplevel):
         content_frame = tk.Frame(win, bg='white', relief='solid', bd=1)
         content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
-        # Classement des articles par quantité totale sortie
-        query = """
-        SELECT m.code_article, a.designation, SUM(m.quantite) as total_vendu
-        FROM Mouvements m
-        JOIN Articles a ON m.code_article = a.code_article
-        WHERE m.type = 'sortie'
-        GROUP BY m.code_article
-        ORDER BY total_vendu DESC
-        LIMIT 10
-        """
-        articles = self.conn.execute(query).fetchall()
-        
         # Tableau avec style classement
         tree = ttk.Treeview(content_frame, columns=("Rang", "Code article", "Désignation", "Quantité vendue"), show="headings")
         tree.heading("Rang", text="🏆 Rang")
@@ -522,9 +668,14 @@ class StockManager(tk.Toplevel):
         
         tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        for i, row in enumerate(articles, 1):
-            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            tree.insert("", tk.END, values=(medal, row[0], row[1], row[2]))
+        def show_ranking(articles):
+            for i, row in enumerate(articles, 1):
+                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                tree.insert("", tk.END, values=(medal, row[2], row[0], row[1]))
+        
+        # Classement des articles par quantité totale sortie (cumuls journaliers)
+        self.worker.submit(QueryCache.pour(self.db).appel, report_manager.get_articles_plus_vendus,
+                           owner=win, loading=tree, on_success=show_ranking)
 
 # Pour ouvrir la gestion du stock depuis le menu principal :
 # from ui.stock_manager import StockManager
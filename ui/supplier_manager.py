@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
 from ui.theme_manager import theme_manager
+from database.db import Database
+from ui.worker import worker_for
+from ui.table_sync import sync_tree
 
 class SupplierForm(tk.Toplevel):
     def __init__(self, parent, supplier=None, refresh_callback=None):
@@ -11,7 +13,9 @@ class SupplierForm(tk.Toplevel):
         self.configure(bg=theme_manager.get_color("bg_primary"))
         self.supplier = supplier
         self.refresh_callback = refresh_callback
-        self.conn = sqlite3.connect("stock_app.db")
+        self.db = Database()
+        # Écritures hors du thread Tk, annulées à la fermeture du formulaire
+        self.worker = worker_for(self)
         
         # Configuration des styles
         self.setup_styles()
@@ -126,7 +130,7 @@ class SupplierForm(tk.Toplevel):
         separator2 = tk.Frame(action_frame, bg=theme_manager.get_color("separator"), height=1)
         separator2.pack(fill=tk.X)
         
-        button_content = tk.Frame(action_frame, bg=theme_manager.get_color("bg_secondary"))
+        self.button_content = button_content = tk.Frame(action_frame, bg=theme_manager.get_color("bg_secondary"))
         button_content.pack(fill=tk.X, padx=20, pady=20)
         
         # Boutons
@@ -176,33 +180,39 @@ class SupplierForm(tk.Toplevel):
             messagebox.showerror("❌ Erreur", "Format email invalide")
             return
         
-        try:
-            if self.supplier:
-                # Modification d'un fournisseur existant
-                self.conn.execute("""
-                    UPDATE Fournisseurs 
-                    SET nom = ?, contact = ?, email = ?, adresse = ?
-                    WHERE id = ?
-                """, (nom, contact, email or None, adresse or None, self.supplier[0]))
-                messagebox.showinfo("✅ Succès", f"Fournisseur '{nom}' modifié avec succès")
-            else:
-                # Création d'un nouveau fournisseur
-                self.conn.execute("""
-                    INSERT INTO Fournisseurs (nom, contact, email, adresse)
-                    VALUES (?, ?, ?, ?)
-                """, (nom, contact, email or None, adresse or None))
-                messagebox.showinfo("✅ Succès", f"Fournisseur '{nom}' créé avec succès")
-            
-            self.conn.commit()
+        def enregistrer():
+            with self.db.get_connection() as conn:
+                if self.supplier:
+                    # Modification d'un fournisseur existant
+                    conn.execute("""
+                        UPDATE Fournisseurs 
+                        SET nom = ?, contact = ?, email = ?, adresse = ?
+                        WHERE id = ?
+                    """, (nom, contact, email or None, adresse or None, self.supplier[0]))
+                    message = f"Fournisseur '{nom}' modifié avec succès"
+                else:
+                    # Création d'un nouveau fournisseur
+                    conn.execute("""
+                        INSERT INTO Fournisseurs (nom, contact, email, adresse)
+                        VALUES (?, ?, ?, ?)
+                    """, (nom, contact, email or None, adresse or None))
+                    message = f"Fournisseur '{nom}' créé avec succès"
+                conn.commit()
+            return message
+        
+        def enregistre(message):
+            messagebox.showinfo("✅ Succès", message)
             
             # Rafraîchir la liste si callback défini
             if self.refresh_callback:
                 self.refresh_callback()
             
             self.destroy()
-            
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors de la sauvegarde: {str(e)}")
+        
+        # Une base verrouillée par un autre poste ne fige pas le formulaire
+        self.worker.submit(enregistrer, owner=self, loading=self.button_content, on_success=enregistre,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de la sauvegarde: {str(e)}", parent=self))
 
 
 class SupplierManager(tk.Toplevel):
@@ -211,10 +221,9 @@ class SupplierManager(tk.Toplevel):
         self.title("🏢 Gestion des fournisseurs")
         self.geometry("1200x700")
         self.configure(bg=theme_manager.get_color("bg_primary"))
-        self.conn = sqlite3.connect("stock_app.db")
-        
-        # Créer la table si elle n'existe pas
-        self.create_table_if_not_exists()
+        self.db = Database()
+        # Chargements hors du thread Tk, annulés à la fermeture de la fenêtre
+        self.worker = worker_for(self)
         
         # Configuration des styles
         self.setup_styles()
@@ -222,22 +231,6 @@ class SupplierManager(tk.Toplevel):
         self.create_widgets()
         self.refresh_table()
 
-    def create_table_if_not_exists(self):
-        """Crée la table Fournisseurs si elle n'existe pas"""
-        try:
-            self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS Fournisseurs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nom TEXT NOT NULL,
-                    contact TEXT NOT NULL,
-                    email TEXT,
-                    adresse TEXT
-                )
-            """)
-            self.conn.commit()
-        except Exception as e:
-            print(f"Erreur lors de la création de la table: {e}")
-
     def setup_styles(self):
         """Configure les styles personnalisés pour l'interface"""
         style = ttk.Style()
@@ -405,17 +398,21 @@ class SupplierManager(tk.Toplevel):
         # Double-clic pour éditer
         self.tree.bind("<Double-1>", lambda e: self.edit_supplier())
 
+    def load_suppliers(self):
+        """Récupère les fournisseurs (exécutée hors du thread Tk)"""
+        with self.db.get_connection() as conn:
+            return conn.execute("SELECT * FROM Fournisseurs ORDER BY nom").fetchall()
+
     def refresh_table(self):
         """Actualise le tableau des fournisseurs"""
-        try:
-            # Vider le tableau
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Récupérer les fournisseurs
-            suppliers = self.conn.execute("SELECT * FROM Fournisseurs ORDER BY nom").fetchall()
-            
-            # Ajouter les fournisseurs au tableau
+        self.worker.submit(self.load_suppliers, key=("fournisseurs", str(self)), owner=self,
+                           loading=self.tree, on_success=self.show_suppliers,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors du chargement des fournisseurs: {str(e)}", parent=self))
+
+    def show_suppliers(self, suppliers):
+        """Affiche les fournisseurs chargés"""
+        def lignes():
             for supplier in suppliers:
                 # Limiter la longueur de l'adresse pour l'affichage
                 adresse_display = supplier[4][:50] + "..." if supplier[4] and len(supplier[4]) > 50 else (supplier[4] or "")
@@ -427,14 +424,14 @@ class SupplierManager(tk.Toplevel):
                     supplier[3] or "",  # email
                     adresse_display  # adresse
                 )
-                self.tree.insert("", tk.END, values=values)
-            
-            # Mettre à jour le compteur
-            count = len(suppliers)
-            self.count_label.configure(text=f"📊 {count} fournisseur{'s' if count > 1 else ''}")
-            
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors du chargement des fournisseurs: {str(e)}")
+                yield supplier[0], values, ()
+        
+        # Seuls les fournisseurs ajoutés, modifiés ou supprimés touchent le tableau
+        sync_tree(self.tree, lignes())
+        
+        # Mettre à jour le compteur
+        count = len(suppliers)
+        self.count_label.configure(text=f"📊 {count} fournisseur{'s' if count > 1 else ''}")
 
     def new_supplier(self):
         """Crée un nouveau fournisseur"""
@@ -451,9 +448,14 @@ class SupplierManager(tk.Toplevel):
         supplier_id = item['values'][0]
         
         # Récupérer les données complètes du fournisseur
-        supplier = self.conn.execute("SELECT * FROM Fournisseurs WHERE id = ?", (supplier_id,)).fetchone()
-        if supplier:
-            SupplierForm(self, supplier=supplier, refresh_callback=self.refresh_table)
+        def load_supplier():
+            with self.db.get_connection() as conn:
+                return conn.execute("SELECT * FROM Fournisseurs WHERE id = ?", (supplier_id,)).fetchone()
+        
+        def open_form(supplier):
+            if supplier:
+                SupplierForm(self, supplier=supplier, refresh_callback=self.refresh_table)
+        self.worker.submit(load_supplier, key=("fournisseur", str(self)), owner=self, on_success=open_form)
 
     def delete_supplier(self):
         """Supprime le fournisseur sélectionné"""
@@ -469,33 +471,47 @@ class SupplierManager(tk.Toplevel):
         # Confirmation
         if messagebox.askyesno("🗑️ Confirmation", 
                               f"Êtes-vous sûr de vouloir supprimer le fournisseur '{supplier_name}' ?\n\nCette action est irréversible."):
-            try:
-                self.conn.execute("DELETE FROM Fournisseurs WHERE id = ?", (supplier_id,))
-                self.conn.commit()
+            def supprimer():
+                with self.db.get_connection() as conn:
+                    conn.execute("DELETE FROM Fournisseurs WHERE id = ?", (supplier_id,))
+                    conn.commit()
+            
+            def supprime(_):
                 messagebox.showinfo("✅ Succès", f"Fournisseur '{supplier_name}' supprimé avec succès")
                 self.refresh_table()
-            except Exception as e:
-                messagebox.showerror("❌ Erreur", f"Erreur lors de la suppression: {str(e)}")
-
-    def show_supplier_stats(self):
-        """Affiche les statistiques des fournisseurs"""
-        try:
-            # Compter les fournisseurs
-            total_suppliers = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs").fetchone()[0]
             
+            self.worker.submit(supprimer, owner=self, loading=self.tree, on_success=supprime,
+                               on_error=lambda e: messagebox.showerror(
+                                   "❌ Erreur", f"Erreur lors de la suppression: {str(e)}", parent=self))
+
+    def count_suppliers(self):
+        """Compte les fournisseurs, avec email et avec adresse (exécutée hors du thread Tk)"""
+        with self.db.get_connection() as conn:
+            total_suppliers = conn.execute("SELECT COUNT(*) FROM Fournisseurs").fetchone()[0]
+        
             # Fournisseurs avec email
-            with_email = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE email IS NOT NULL AND email != ''").fetchone()[0]
-            
+            with_email = conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE email IS NOT NULL AND email != ''").fetchone()[0]
+        
             # Fournisseurs avec adresse
-            with_address = self.conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE adresse IS NOT NULL AND adresse != ''").fetchone()[0]
-            
-            stats_text = f"""📊 Statistiques des fournisseurs
+            with_address = conn.execute("SELECT COUNT(*) FROM Fournisseurs WHERE adresse IS NOT NULL AND adresse != ''").fetchone()[0]
+        return total_suppliers, with_email, with_address
+
+    def show_supplier_stats(self):
+        """Affiche les statistiques des fournisseurs"""
+        def show(counts):
+            total_suppliers, with_email, with_address = counts
+            try:
+                stats_text = f"""📊 Statistiques des fournisseurs
 
 🏢 Total fournisseurs: {total_suppliers}
 📧 Avec email: {with_email} ({(with_email/total_suppliers*100):.1f}% si total > 0 else 0)
 📍 Avec adresse: {with_address} ({(with_address/total_suppliers*100):.1f}% si total > 0 else 0)"""
+                
+                messagebox.showinfo("📊 Statistiques", stats_text)
             
-            messagebox.showinfo("📊 Statistiques", stats_text)
-            
-        except Exception as e:
-            messagebox.showerror("❌ Erreur", f"Erreur lors du calcul des statistiques: {str(e)}") 
\ No newline at end of file
+            except Exception as e:
+                messagebox.showerror("❌ Erreur", f"Erreur lors du calcul des statistiques: {str(e)}")
+        
+        self.worker.submit(self.count_suppliers, owner=self, on_success=show,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors du calcul des statistiques: {str(e)}"))
@@ -0,0 +1,92 @@
+# ui/table_sync.py
+"""Rafraîchissement d'un Treeview par différence avec les lignes affichées.
+
+Chaque ligne est identifiée par sa clé, qui sert d'identifiant (iid) à
+l'élément du Treeview. Seules les lignes nouvelles, modifiées, disparues ou
+déplacées touchent le widget : la sélection, le focus et la position de
+défilement des autres lignes sont conservés.
+
+Les valeurs affichées sont mémorisées à part : comparer avec le contenu
+relu du widget coûterait autant d'appels Tk que de tout réinsérer.
+"""
+import weakref
+from bisect import bisect_left
+
+# Treeview -> {iid: (values, tags)} tels que passés au dernier rafraîchissement
+_affiches = weakref.WeakKeyDictionary()
+
+
+def sync_tree(tree, rows):
+    """Aligne les éléments de premier niveau de ``tree`` sur ``rows`` : (clé, values, tags), dans l'ordre.
+
+    Retourne le nombre d'opérations par type : {"insert", "update", "delete", "move"}.
+    """
+    cibles = [(str(cle), tuple(values), tuple(tags)) for cle, values, tags in rows]
+    affiches = _affiches.get(tree)
+    if affiches is None:
+        affiches = _affiches[tree] = {}
+    operations = {"insert": 0, "update": 0, "delete": 0, "move": 0}
+
+    enfants = tree.get_children()
+    nouveaux = {iid for iid, _, _ in cibles}
+    disparus = [iid for iid in enfants if iid not in nouveaux]
+    if disparus:
+        tree.delete(*disparus)
+        operations["delete"] = len(disparus)
+    position = {iid: i for i, iid in enumerate(enfants) if iid in nouveaux}
+    for iid in [iid for iid in affiches if iid not in position]:
+        del affiches[iid]
+
+    # Lignes conservées : les valeurs modifiées sont mises à jour en place
+    for iid, values, tags in cibles:
+        if iid in position and affiches.get(iid) != (values, tags):
+            tree.item(iid, values=values, tags=tags)
+            affiches[iid] = (values, tags)
+            operations["update"] += 1
+
+    # Les lignes conservées dans le bon ordre relatif (plus longue sous-suite croissante
+    # de leurs positions) ne bougent pas ; les autres sont détachées puis replacées
+    gardees = _sous_suite_croissante([position[iid] for iid, _, _ in cibles if iid in position])
+    a_deplacer = [iid for iid, _, _ in cibles if iid in position and position[iid] not in gardees]
+    if a_deplacer:
+        selection = tree.selection()
+        tree.detach(*a_deplacer)
+        a_deplacer = set(a_deplacer)
+
+    for index, (iid, values, tags) in enumerate(cibles):
+        if iid not in position:
+            tree.insert("", index, iid=iid, values=values, tags=tags)
+            affiches[iid] = (values, tags)
+            operations["insert"] += 1
+        elif a_deplacer and iid in a_deplacer:
+            tree.move(iid, "", index)
+            operations["move"] += 1
+
+    if operations["move"] and tree.selection() != selection:
+        tree.selection_set(selection)
+    return operations
+
+
+def forget_tree(tree):
+    """Oublie les valeurs mémorisées de ``tree``, après un remplissage fait sans sync_tree"""
+    _affiches.pop(tree, None)
+
+
+def _sous_suite_croissante(valeurs):
+    """Retourne l'ensemble des valeurs d'une plus longue sous-suite strictement croissante"""
+    fins, indices, precedent = [], [], [None] * len(valeurs)
+    for i, valeur in enumerate(valeurs):
+        rang = bisect_left(fins, valeur)
+        if rang == len(fins):
+            fins.append(valeur)
+            indices.append(i)
+        else:
+            fins[rang] = valeur
+            indices[rang] = i
+        precedent[i] = indices[rang - 1] if rang else None
+    resultat = set()
+    i = indices[-1] if indices else None
+    while i is not None:
+        resultat.add(valeurs[i])
+        i = precedent[i]
+    return resultat
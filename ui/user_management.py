@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from core.auth_manager import AuthManager
+from ui.table_sync import sync_tree
+from ui.worker import worker_for
 
 class UserManagementUI:
     def __init__(self, parent, auth_manager):
@@ -27,6 +29,8 @@ class UserManagementUI:
         self.window.configure(bg='#2c3e50')
         self.window.transient(parent)
         self.window.grab_set()
+        # Lectures et écritures hors du thread Tk, annulées à la fermeture de la fenêtre
+        self.worker = worker_for(self.window)
         
         # Configuration des styles
         self.setup_styles()
@@ -184,19 +188,23 @@ class UserManagementUI:
         self.users_tree.bind("<Double-1>", lambda event: self.show_edit_user_dialog())
     
     def load_users(self):
-        """Charge la liste des utilisateurs depuis la base de données"""
-        # Effacer les données existantes
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-        
-        # Récupérer la liste des utilisateurs
-        success, users = self.auth_manager.list_users()
+        """Charge la liste des utilisateurs depuis la base de données, en arrière-plan"""
+        self.worker.submit(self.auth_manager.list_users, key=("utilisateurs", str(self.window)),
+                           owner=self.window, loading=self.users_tree, on_success=self.show_users,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors du chargement des utilisateurs: {str(e)}",
+                               parent=self.window))
+    
+    def show_users(self, resultat):
+        """Affiche la liste des utilisateurs chargée"""
+        success, users = resultat
         
         if not success:
             messagebox.showerror("❌ Erreur", users)  # Dans ce cas, users contient le message d'erreur
             return
         
-        # Ajouter les utilisateurs au Treeview
+        # Lignes du Treeview, par identifiant d'utilisateur
+        rows = []
         for user in users:
             # Formater la date de dernière connexion
             last_login = user["last_login"] if user["last_login"] else "❌ Jamais"
@@ -210,14 +218,16 @@ class UserManagementUI:
             else:
                 tags = ('vendeur',)
             
-            # Ajouter l'utilisateur au Treeview
-            self.users_tree.insert("", tk.END, values=(
+            rows.append((user["id"], (
                 user["id"],
                 user["username"],
                 f"🔧 {role}" if role == "admin" else f"⚙️ {role}" if role == "gestionnaire" else f"🛒 {role}",
                 user["nom_complet"],
                 last_login
-            ), tags=tags)
+            ), tags))
+        
+        # Seuls les utilisateurs ajoutés, modifiés ou supprimés touchent le Treeview
+        sync_tree(self.users_tree, rows)
         
         # Configuration des couleurs pour les tags (dark theme)
         self.users_tree.tag_configure('admin', background='#8b1538', foreground='white')
@@ -305,13 +315,19 @@ class UserManagementUI:
                 messagebox.showerror("❌ Erreur", "Veuillez remplir tous les champs")
                 return
             
-            success, message = self.auth_manager.register_user(username, password, role, fullname)
-            if success:
-                messagebox.showinfo("✅ Succès", message)
-                dialog.destroy()
-                self.load_users()  # Rafraîchir la liste des utilisateurs
-            else:
-                messagebox.showerror("❌ Erreur", message)
+            def registered(resultat):
+                success, message = resultat
+                if success:
+                    messagebox.showinfo("✅ Succès", message)
+                    dialog.destroy()
+                    self.load_users()  # Rafraîchir la liste des utilisateurs
+                else:
+                    messagebox.showerror("❌ Erreur", message, parent=dialog)
+            
+            self.worker.submit(self.auth_manager.register_user, username, password, role, fullname,
+                               owner=dialog, loading=button_frame, on_success=registered,
+                               on_error=lambda e: messagebox.showerror(
+                                   "❌ Erreur", f"Erreur lors de l'enregistrement: {str(e)}", parent=dialog))
         
         tk.Button(button_frame, text="✅ Enregistrer", command=register,
                  font=('Arial', 11, 'bold'), bg='#27ae60', fg='white', 
@@ -443,30 +459,34 @@ class UserManagementUI:
                 messagebox.showerror("❌ Erreur", "Veuillez remplir le nom complet et le rôle")
                 return
             
-            # Mettre à jour les informations de base
-            success, message = self.auth_manager.update_user(user_id, role, fullname)
-            if not success:
-                messagebox.showerror("❌ Erreur", message)
-                return
-            
-            # Vérifier si un nouveau mot de passe a été saisi
+            # Vérifier si un nouveau mot de passe a été saisi, avant toute écriture
             new_password = password_entry.get()
             confirm_password = confirm_entry.get()
             
-            if new_password:
-                if new_password != confirm_password:
-                    messagebox.showerror("❌ Erreur", "Les mots de passe ne correspondent pas")
-                    return
-                
-                # Mettre à jour le mot de passe (en tant qu'admin, pas besoin de l'ancien mot de passe)
-                success, message = self.auth_manager.change_password(user_id, "", new_password)
+            if new_password and new_password != confirm_password:
+                messagebox.showerror("❌ Erreur", "Les mots de passe ne correspondent pas")
+                return
+            
+            def enregistrer():
+                # Mettre à jour les informations de base
+                success, message = self.auth_manager.update_user(user_id, role, fullname)
+                if success and new_password:
+                    # Mettre à jour le mot de passe (en tant qu'admin, pas besoin de l'ancien mot de passe)
+                    success, message = self.auth_manager.change_password(user_id, "", new_password)
+                return success, message
+            
+            def updated(resultat):
+                success, message = resultat
                 if not success:
-                    messagebox.showerror("❌ Erreur", message)
+                    messagebox.showerror("❌ Erreur", message, parent=dialog)
                     return
+                messagebox.showinfo("✅ Succès", "Utilisateur mis à jour avec succès")
+                dialog.destroy()
+                self.load_users()  # Rafraîchir la liste des utilisateurs
             
-            messagebox.showinfo("✅ Succès", "Utilisateur mis à jour avec succès")
-            dialog.destroy()
-            self.load_users()  # Rafraîchir la liste des utilisateurs
+            self.worker.submit(enregistrer, owner=dialog, loading=button_frame, on_success=updated,
+                               on_error=lambda e: messagebox.showerror(
+                                   "❌ Erreur", f"Erreur lors de la mise à jour: {str(e)}", parent=dialog))
         
         tk.Button(button_frame, text="✅ Mettre à jour", command=update_user,
                  font=('Arial', 11, 'bold'), bg='#3498db', fg='white',
@@ -499,10 +519,16 @@ class UserManagementUI:
         if not confirm:
             return
         
+        def deleted(resultat):
+            success, message = resultat
+            if success:
+                messagebox.showinfo("✅ Succès", message)
+                self.load_users()  # Rafraîchir la liste des utilisateurs
+            else:
+                messagebox.showerror("❌ Erreur", message, parent=self.window)
+        
         # Supprimer l'utilisateur
-        success, message = self.auth_manager.delete_user(user_id)
-        if success:
-            messagebox.showinfo("✅ Succès", message)
-            self.load_users()  # Rafraîchir la liste des utilisateurs
-        else:
-            messagebox.showerror("❌ Erreur", message)
+        self.worker.submit(self.auth_manager.delete_user, user_id, owner=self.window, loading=self.users_tree,
+                           on_success=deleted,
+                           on_error=lambda e: messagebox.showerror(
+                               "❌ Erreur", f"Erreur lors de la suppression: {str(e)}", parent=self.window))
@@ -0,0 +1,352 @@
+# ui/virtual_table.py
+"""Treeview virtuel : seules les lignes affichées sont lues et insérées.
+
+Le Treeview ne contient que la fenêtre visible, mise à jour par différence
+(ui.table_sync) à chaque défilement à partir d'un tampon de quelques pages lues par clé
+(database.pagination) dans l'exécuteur de chargement. Ouvrir une table ne
+lit qu'une page, quelle que soit sa taille ; le nombre de lignes, qui ne sert
+qu'à la barre de défilement, est compté ensuite. Le tri se fait dans la base,
+par un clic sur un en-tête.
+"""
+import tkinter as tk
+from tkinter import ttk
+from database.pagination import PAGE_SIZE
+from ui.table_sync import sync_tree
+
+# Lignes gardées en mémoire autour de la fenêtre affichée
+BUFFER_ROWS = 3 * PAGE_SIZE
+# Une page est lue d'avance quand il reste moins de lignes que cela dans le tampon
+PREFETCH_ROWS = PAGE_SIZE // 2
+# Hauteur approximative de la ligne d'en-têtes, en pixels
+HEADING_HEIGHT = 24
+WHEEL_ROWS = 3
+
+
+class VirtualTable:
+    """Pilote un Treeview et sa barre de défilement verticale à partir d'une PagedQuery.
+
+    ``format_row(values)`` retourne (values, tags) pour une ligne lue ; l'identifiant
+    des lignes du Treeview est leur clé. La sélection est conservée au défilement.
+    Rien n'est lu avant le premier appel de ``reload`` ou ``set_query``.
+    """
+
+    def __init__(self, tree, scrollbar, query, worker, sort, descending=False, format_row=None, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.query = query
+        self.worker = worker
+        self.sort = sort
+        self.descending = descending
+        self.default_sort = (sort, descending)
+        self.format_row = format_row or (lambda values: (values, ()))
+        self.on_error = on_error
+
+        self.rows = []          # tampon : lignes lues, terminées par leur ancre (tri, clé)
+        self.start = 0          # rang de la première ligne du tampon
+        self.top = 0            # rang de la première ligne affichée
+        self.total = None       # nombre de lignes, une fois compté
+        self.at_end = False     # le tampon contient la dernière ligne
+        self.visible = max(1, int(tree.cget("height")))
+        self.selected_key = None
+        self._select_index = None
+        self._task = None
+        self._task_kind = None
+        self._headings = {}
+
+        scrollbar.configure(command=self.yview)
+        tree.configure(yscrollcommand="")
+        for column in query.sort_columns:
+            self._headings[column] = tree.heading(column, "text")
+            tree.heading(column, command=lambda c=column: self.sort_by(c))
+        self._show_sort()
+
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<MouseWheel>", lambda e: self._scroll(-WHEEL_ROWS if e.delta > 0 else WHEEL_ROWS))
+        tree.bind("<Button-4>", lambda e: self._scroll(-WHEEL_ROWS))
+        tree.bind("<Button-5>", lambda e: self._scroll(WHEEL_ROWS))
+        tree.bind("<Prior>", lambda e: self._scroll(-self.visible))
+        tree.bind("<Next>", lambda e: self._scroll(self.visible))
+        tree.bind("<Home>", lambda e: self._scroll(-self.top))
+        tree.bind("<End>", self._on_end)
+        tree.bind("<Up>", self._on_up)
+        tree.bind("<Down>", self._on_down)
+
+    # --- Requête et tri ---
+
+    def set_query(self, query, sort=None):
+        """Remplace la requête (filtre) et revient en haut de la table.
+
+        ``sort`` impose un tri croissant, par exemple sur une colonne de tri sans
+        en-tête ; un tri que la nouvelle requête n'offre pas revient au tri initial.
+        """
+        self.query = query
+        if sort is not None:
+            self.sort, self.descending = sort, False
+            self._show_sort()
+        elif self.sort not in query.sort_columns:
+            self.sort, self.descending = self.default_sort
+            self._show_sort()
+        self.reload()
+
+    def reload(self, keep_position=False):
+        """Relit la requête, depuis le début ou depuis la première ligne affichée"""
+        anchor, index = None, 0
+        if keep_position and 0 <= self.top - self.start < len(self.rows):
+            anchor, index = self.rows[self.top - self.start][-2:], self.top
+        self.top, self.total = index, None
+        self._submit("reset", self._read_from, anchor, on_success=lambda rows: self._on_reset(index, rows))
+        self.worker.submit(self._count, self.query, key=("total", str(self.tree)),
+                           owner=self.tree, on_success=self._on_total)
+
+    def sort_by(self, column):
+        """Trie sur une colonne ; un second clic inverse l'ordre"""
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = column, False
+        self._show_sort()
+        self.reload()
+
+    def _show_sort(self):
+        for column, text in self._headings.items():
+            if column == self.sort:
+                text += " ▼" if self.descending else " ▲"
+            self.tree.heading(column, text=text)
+
+    def show(self, key, done=None):
+        """Fait défiler jusqu'à la ligne de clé ``key`` et la sélectionne ; ``done(trouvée)`` ensuite"""
+        def on_success(result):
+            if result is None:
+                if done:
+                    done(False)
+                return
+            rank, rows = result
+            self.selected_key = str(rows[0][-1])
+            self.rows, self.start, self.at_end = rows, rank, len(rows) < PAGE_SIZE
+            # Ligne trouvée au milieu de la fenêtre : la page précédente est lue au besoin
+            self._goto(rank - self.visible // 2)
+            if done:
+                done(True)
+        self._submit("key", self._read_key, key, on_success=on_success)
+
+    # --- Lectures, exécutées hors du thread Tk ---
+
+    def _count(self, query):
+        with self.worker.db.get_connection() as conn:
+            return query.count(conn)
+
+    def _read_from(self, query, sort, descending, anchor):
+        with self.worker.db.get_connection() as conn:
+            return query.page(conn, sort, descending, anchor, inclusive=True)
+
+    def _read_after(self, query, sort, descending, anchor):
+        with self.worker.db.get_connection() as conn:
+            return query.page(conn, sort, descending, anchor)
+
+    def _read_before(self, query, sort, descending, anchor):
+        with self.worker.db.get_connection() as conn:
+            return query.page_before(conn, sort, descending, anchor)
+
+    def _read_at(self, query, sort, descending, index, total, visible):
+        """Saut direct : ancre de la ligne ``index`` par OFFSET depuis l'extrémité la plus proche"""
+        with self.worker.db.get_connection() as conn:
+            if total is None:
+                total = query.count(conn)
+            index = max(0, min(index, total - visible))
+            if index > total // 2:
+                anchor = query.anchor_at(conn, sort, not descending, total - 1 - index)
+            else:
+                anchor = query.anchor_at(conn, sort, descending, index)
+            rows = query.page(conn, sort, descending, anchor, inclusive=True) if anchor else []
+            return index, rows, total
+
+    def _read_key(self, query, sort, descending, key):
+        with self.worker.db.get_connection() as conn:
+            anchor = query.anchor_of(conn, key, sort)
+            if anchor is None:
+                return None
+            return query.rank(conn, sort, descending, anchor), query.page(conn, sort, descending, anchor, inclusive=True)
+
+    def _submit(self, kind, fonction, *args, on_success):
+        self._task_kind = kind
+        self._task = self.worker.submit(
+            fonction, self.query, self.sort, self.descending, *args,
+            key=("page", str(self.tree)), owner=self.tree, on_success=on_success, on_error=self.on_error,
+            # Les lectures d'avance ne signalent pas de chargement
+            loading=self.tree if kind in ("reset", "jump", "key") else None,
+        )
+
+    def _loading(self, kind=None):
+        pending = self._task is not None and not self._task.done and not self._task.cancelled
+        return pending and (kind is None or self._task_kind == kind)
+
+    # --- Résultats, dans le thread Tk ---
+
+    def _on_reset(self, index, rows):
+        self.rows, self.start = rows, index
+        self.at_end = len(rows) < PAGE_SIZE
+        if self.at_end:
+            self.total = self.start + len(rows)
+        self._goto(self.top)
+
+    def _on_total(self, total):
+        if not self.at_end:
+            self.total = total
+        self._goto(self.top)
+
+    def _on_after(self, rows):
+        self.rows.extend(rows)
+        if len(rows) < PAGE_SIZE:
+            self.at_end = True
+            self.total = self.start + len(self.rows)
+        # Lignes les plus éloignées de la fenêtre affichée retirées du tampon
+        excess = min(len(self.rows) - BUFFER_ROWS, self.top - self.start)
+        if excess > 0:
+            del self.rows[:excess]
+            self.start += excess
+        self._goto(self.top)
+
+    def _on_before(self, rows):
+        start = self.start - len(rows)
+        if len(rows) < PAGE_SIZE or start < 0:
+            # Début atteint : les rangs, décalés par des écritures concurrentes, sont recalés
+            self.top -= start
+            if self.total is not None:
+                self.total -= start
+            start = 0
+        self.rows[:0] = rows
+        self.start = start
+        excess = min(len(self.rows) - BUFFER_ROWS, self.start + len(self.rows) - self.top - self.visible)
+        if excess > 0:
+            del self.rows[-excess:]
+            self.at_end = False
+        self._goto(self.top)
+
+    def _on_jump(self, result):
+        index, rows, total = result
+        # self.top garde la dernière position demandée, bornée par _goto
+        self.rows, self.start, self.total = rows, index, total
+        self.at_end = index + len(rows) >= total
+        self._goto(self.top)
+
+    # --- Défilement ---
+
+    def _goto(self, index):
+        """Affiche les lignes à partir du rang ``index``, en lisant les pages manquantes"""
+        end = self.start + len(self.rows)
+        if self.at_end:
+            index = min(index, end - self.visible)
+        elif self.total is not None:
+            index = min(index, self.total - self.visible)
+        index = max(0, index)
+        self.top = index
+        if self._loading() and self._task_kind in ("reset", "jump", "key"):
+            # Le tampon va être remplacé : la position est reprise à son arrivée
+            return
+
+        if index < self.start:
+            if index >= self.start - PAGE_SIZE and self.rows:
+                if not self._loading("before"):
+                    self._submit("before", self._read_before, self.rows[0][-2:], on_success=self._on_before)
+            else:
+                self._jump(index)
+        elif index + self.visible > end and not self.at_end:
+            if index + self.visible <= end + PAGE_SIZE and self.rows:
+                if not self._loading("after"):
+                    self._submit("after", self._read_after, self.rows[-1][-2:], on_success=self._on_after)
+            else:
+                self._jump(index)
+        else:
+            self._render()
+            self._prefetch()
+
+    def _jump(self, index):
+        self.top = index
+        self._submit("jump", self._read_at, index, self.total, self.visible, on_success=self._on_jump)
+
+    def _prefetch(self):
+        if self._loading() or not self.rows:
+            return
+        if not self.at_end and self.start + len(self.rows) - (self.top + self.visible) < PREFETCH_ROWS:
+            self._submit("after", self._read_after, self.rows[-1][-2:], on_success=self._on_after)
+        elif self.start > 0 and self.top - self.start < PREFETCH_ROWS:
+            self._submit("before", self._read_before, self.rows[0][-2:], on_success=self._on_before)
+
+    def _scroll(self, delta):
+        self._goto(self.top + delta)
+        return "break"
+
+    def yview(self, *args):
+        """Commande de la barre de défilement : saut direct ou défilement par lignes et pages"""
+        if args[0] == "moveto":
+            self._goto(int(float(args[1]) * self._estimated_total()))
+        elif args[0] == "scroll":
+            self._scroll(int(args[1]) * (self.visible if args[2] == "pages" else 1))
+
+    def _estimated_total(self):
+        if self.total is not None:
+            return self.total
+        return self.start + len(self.rows) + (0 if self.at_end else PAGE_SIZE)
+
+    def _on_up(self, event):
+        children = self.tree.get_children()
+        if children and self.tree.focus() == children[0] and self.top > 0:
+            self._select_index = self.top - 1
+            return self._scroll(-1)
+
+    def _on_down(self, event):
+        children = self.tree.get_children()
+        if children and self.tree.focus() == children[-1]:
+            self._select_index = self.top + len(children)
+            return self._scroll(1)
+
+    def _on_end(self, event):
+        self._jump(self.total if self.total is not None else self._estimated_total() + PAGE_SIZE)
+        return "break"
+
+    def _on_configure(self, event):
+        try:
+            rowheight = int(ttk.Style().lookup(self.tree.cget("style") or "Treeview", "rowheight"))
+        except (ValueError, tk.TclError):
+            rowheight = 20
+        visible = max(1, (event.height - HEADING_HEIGHT) // rowheight)
+        if visible != self.visible:
+            self.visible = visible
+            self._goto(self.top)
+
+    # --- Affichage ---
+
+    def _render(self):
+        if not self.tree.winfo_exists():
+            return
+        first = self.top - self.start
+        rows = self.rows[first:first + self.visible]
+        shown = self.tree.get_children()
+        selection = self.tree.selection()
+        if selection:
+            self.selected_key = selection[0]
+        elif self.selected_key in shown:
+            self.selected_key = None
+
+        # Seules les lignes entrées, sorties ou modifiées touchent le Treeview
+        sync_tree(self.tree, ((row[-1],) + tuple(self.format_row(row[:-2])) for row in rows))
+        if (self.selected_key is not None and self.tree.exists(self.selected_key)
+                and self.selected_key not in self.tree.selection()):
+            self.tree.selection_set(self.selected_key)
+            self.tree.focus(self.selected_key)
+
+        # Déplacement au clavier au-delà de la fenêtre : la ligne suivante est sélectionnée
+        if self._select_index is not None:
+            children = self.tree.get_children()
+            position = self._select_index - self.top
+            if 0 <= position < len(children):
+                self.tree.selection_set(children[position])
+                self.tree.focus(children[position])
+            self._select_index = None
+
+        total = self._estimated_total()
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + len(rows)) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
@@ -0,0 +1,238 @@
+# ui/worker.py
+"""Exécution des chargements de données hors du thread Tk.
+
+Les fonctions soumises s'exécutent sur un petit pool de threads ; leurs
+résultats sont déposés dans une file que le thread Tk relève par ``after()``
+pour appeler les callbacks, seul endroit où les widgets sont touchés.
+
+Chaque tâche emprunte sa connexion au pool de ``Database`` avant de
+s'exécuter : les requêtes qu'elle lance réutilisent cette connexion, sur
+laquelle un gestionnaire de progression interrompt la requête en cours dès
+que la tâche est annulée (fenêtre fermée, rechargement plus récent).
+"""
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from database.db import Database
+
+# Threads de chargement : le pool de connexions en garde pour les écritures du thread Tk
+WORKER_THREADS = 3
+# Relève des résultats : une image à 60 i/s
+POLL_MS = 16
+# Instructions SQLite entre deux vérifications de l'annulation
+PROGRESS_STEPS = 10000
+# Lignes insérées par image dans un Treeview
+ROWS_PER_TICK = 500
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def worker_for(widget):
+    """Retourne l'exécuteur partagé de la fenêtre racine de ``widget``"""
+    root = widget._root()
+    with _workers_lock:
+        worker = _workers.get(root)
+        if worker is None:
+            worker = _workers[root] = UIWorker(root)
+        return worker
+
+
+class Task:
+    """Chargement soumis à l'exécuteur"""
+
+    def __init__(self, fonction, args, on_success, on_error, owner, loading, key):
+        self.fonction = fonction
+        self.args = args
+        self.on_success = on_success
+        self.on_error = on_error
+        self.owner = owner
+        self.loading = loading
+        self.key = key
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        """Annule la tâche : la requête en cours est interrompue, les callbacks ne seront pas appelés"""
+        self.cancelled = True
+
+
+class LoadingIndicator:
+    """Mention « Chargement… » posée sur un widget et curseur d'attente, tant qu'une tâche le concerne"""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.count = 0
+        self.label = None
+
+    def show(self):
+        self.count += 1
+        if self.count > 1 or not self.widget.winfo_exists():
+            return
+        self.label = tk.Label(self.widget.master, text="⏳ Chargement…", font=('Arial', 11, 'bold'),
+                              bg='#343a40', fg='white', padx=12, pady=6)
+        self.label.place(in_=self.widget, relx=0.5, rely=0.5, anchor='center')
+        self.widget.winfo_toplevel().configure(cursor='watch')
+
+    def hide(self):
+        self.count = max(0, self.count - 1)
+        if self.count:
+            return
+        if self.label is not None and self.label.winfo_exists():
+            self.label.destroy()
+        self.label = None
+        try:
+            self.widget.winfo_toplevel().configure(cursor='')
+        except tk.TclError:
+            pass
+
+
+class UIWorker:
+    """Exécuteur de chargements en arrière-plan, relié à une fenêtre racine Tk"""
+
+    def __init__(self, root, db=None, threads=WORKER_THREADS):
+        self.root = root
+        self.db = db or Database()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ui-worker")
+        self._results = queue.Queue()
+        self._pending = set()
+        self._by_key = {}
+        self._by_owner = {}
+        self._indicators = {}
+        self._polling = False
+
+    def submit(self, fonction, *args, on_success=None, on_error=None, owner=None, loading=None, key=None):
+        """Exécute ``fonction(*args)`` en arrière-plan ; les callbacks reçoivent le résultat ou l'exception.
+
+        ``owner`` : widget dont la destruction annule la tâche.
+        ``loading`` : widget sur lequel afficher l'indicateur de chargement.
+        ``key`` : une nouvelle tâche de même clé annule la précédente.
+        Doit être appelée depuis le thread Tk.
+        """
+        task = Task(fonction, args, on_success, on_error, owner, loading, key)
+        if key is not None:
+            previous = self._by_key.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._by_key[key] = task
+        if owner is not None:
+            self._watch(owner, task)
+        if loading is not None:
+            indicator = self._indicators.get(loading)
+            if indicator is None:
+                indicator = self._indicators[loading] = LoadingIndicator(loading)
+            indicator.show()
+        self._pending.add(task)
+        self._executor.submit(self._run, task)
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+        return task
+
+    def cancel_owner(self, owner):
+        """Annule toutes les tâches d'un widget"""
+        for task in self._by_owner.pop(str(owner), ()):
+            task.cancel()
+
+    def _watch(self, owner, task):
+        name = str(owner)
+        tasks = self._by_owner.get(name)
+        if tasks is None:
+            tasks = self._by_owner[name] = set()
+
+            def on_destroy(event):
+                if event.widget is owner:
+                    self.cancel_owner(owner)
+            owner.bind("<Destroy>", on_destroy, add="+")
+        tasks.add(task)
+
+    def _run(self, task):
+        """Exécute la tâche dans un thread du pool, sur une connexion interruptible"""
+        if task.cancelled:
+            self._results.put((task, None, None))
+            return
+        try:
+            with self.db.get_connection() as conn:
+                conn.set_progress_handler(lambda: task.cancelled, PROGRESS_STEPS)
+                try:
+                    result = task.fonction(*task.args)
+                finally:
+                    conn.set_progress_handler(None, 0)
+            self._results.put((task, result, None))
+        except Exception as e:
+            self._results.put((task, None, e))
+
+    def _poll(self):
+        """Relève les résultats disponibles et appelle les callbacks, dans le thread Tk"""
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(task)
+            if task.cancelled or (task.owner is not None and not task.owner.winfo_exists()):
+                continue
+            try:
+                if error is None:
+                    if task.on_success:
+                        task.on_success(result)
+                elif task.on_error:
+                    task.on_error(error)
+                else:
+                    print(f"Erreur dans un chargement en arrière-plan: {error}")
+            except Exception as e:
+                print(f"Erreur dans un callback de chargement: {e}")
+
+        if self._pending:
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _finish(self, task):
+        task.done = True
+        self._pending.discard(task)
+        if task.key is not None and self._by_key.get(task.key) is task:
+            del self._by_key[task.key]
+        if task.owner is not None:
+            tasks = self._by_owner.get(str(task.owner))
+            if tasks is not None:
+                tasks.discard(task)
+        if task.loading is not None:
+            indicator = self._indicators.get(task.loading)
+            if indicator is not None:
+                indicator.hide()
+                if not indicator.count:
+                    del self._indicators[task.loading]
+
+    def fill_tree(self, tree, rows, owner=None, done=None):
+        """Insère des lignes (values, tags) dans un Treeview par paquets, une image à la fois.
+
+        Retourne une tâche annulable ; un remplissage plus récent du même
+        Treeview annule le précédent.
+        """
+        task = Task(None, (), None, None, owner or tree, None, ("fill", str(tree)))
+        previous = self._by_key.get(task.key)
+        if previous is not None:
+            previous.cancel()
+        self._by_key[task.key] = task
+        iterator = iter(rows)
+
+        def step():
+            if task.cancelled or not tree.winfo_exists():
+                return
+            for _ in range(ROWS_PER_TICK):
+                try:
+                    values, tags = next(iterator)
+                except StopIteration:
+                    if self._by_key.get(task.key) is task:
+                        del self._by_key[task.key]
+                    task.done = True
+                    if done:
+                        done()
+                    return
+                tree.insert("", tk.END, values=values, tags=tags)
+            self.root.after(1, step)
+
+        step()
+        return task